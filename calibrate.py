@@ -0,0 +1,279 @@
+"""
+离线校准模块
+功能：读取 roi_recorder 录制的价格数字截图与探测点像素颜色，
+    1. 以现有数字模板为初始中心，按归一化相关系数对截图块聚类并标注数字，用各类成员的平均图像生成新模板
+    2. 为每个数字选择使正负样本间隔最大的匹配度阈值，为每个探测点选择使颜色距离间隔最大的阈值
+    3. 写入带版本号的校准模板包 image/templates_calibrated.bin，运行时优先使用
+
+用法：
+    python calibrate.py logs/roi_*.bin [--probes logs/probe_*.bin] [--workers N] [--dry-run]
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy_import import lazy_module
+import roi_recorder
+import template_bundle
+
+np = lazy_module('numpy')
+
+# 与某数字模板的匹配度不低于此值的截图块才归入该类，其余视为过渡帧/空白帧，只作为负样本
+MIN_MEMBER_SCORE = 0.8
+# 聚类最多迭代次数
+MAX_ITERATIONS = 10
+# 每个进程一次处理的截图块数
+CHUNK_SIZE = 20000
+# 数字阈值的取值范围：正样本由聚类(MIN_MEMBER_SCORE)自行标注，不能据此把阈值降到运行时默认值以下，
+# 校准只会让阈值更严格，不会增加误识别(误购买)的风险
+DIGIT_THRESHOLD_RANGE = (template_bundle.DIGIT_THRESHOLD, 0.99)
+
+
+def load_crops(paths: list[str]):
+    """
+    读取录制文件并切分为十万位与万位截图块
+
+    返回:
+        np.ndarray: (N, h, w) uint8
+    """
+    digit_shape = template_bundle.load_bundle().digits[0].shape
+    height, width = digit_shape
+    crops = []
+    for path in paths:
+        header, frames = roi_recorder.read_frames(path)
+        if header.get('scale', 1.0) != 1.0 or tuple(header['shape'])[0] != height:
+            # 模板按标定分辨率生成，缩放布局下录制的截图不参与校准
+            print(f"跳过 {path}：录制时布局缩放比例为{header.get('scale')}，帧尺寸{header['shape']}")
+            continue
+        count = 0
+        for _, frame in frames:
+            crops.append(frame[:, :width])
+            crops.append(frame[:, -width:])
+            count += 1
+        print(f"读取 {path}：{count}帧")
+    if not crops:
+        return np.empty((0, height, width), dtype=np.uint8)
+    return np.stack(crops)
+
+
+def normalize_rows(x):
+    """每行零均值、单位范数；全为常数的行保持为0"""
+    x = x.astype(np.float32)
+    x -= x.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return np.divide(x, norms, out=np.zeros_like(x), where=norms > 0)
+
+
+def score_chunk(chunk, templates_norm):
+    """
+    进程池任务：计算一批截图块与各模板的匹配度
+
+    截图块与模板同尺寸时 TM_CCOEFF_NORMED 等于零均值单位向量的点积，可整批矩阵乘法计算。
+
+    参数:
+        chunk: np.ndarray - (n, h, w) uint8 截图块
+        templates_norm: np.ndarray - (10, h*w) 归一化模板
+
+    返回:
+        np.ndarray: (n, 10) float32 匹配度
+    """
+    return normalize_rows(chunk.reshape(len(chunk), -1)) @ templates_norm.T
+
+
+def score_all(crops, templates, executor: ProcessPoolExecutor | None):
+    """计算全部截图块与各模板的匹配度，给出进程池时分块并行"""
+    templates_norm = normalize_rows(templates.reshape(len(templates), -1))
+    chunks = [crops[i:i + CHUNK_SIZE] for i in range(0, len(crops), CHUNK_SIZE)]
+    if executor is None or len(chunks) == 1:
+        results = [score_chunk(chunk, templates_norm) for chunk in chunks]
+    else:
+        results = list(executor.map(score_chunk, chunks, [templates_norm] * len(chunks)))
+    return np.concatenate(results) if results else np.empty((0, len(templates)), dtype=np.float32)
+
+
+def cluster(crops, templates, executor: ProcessPoolExecutor | None):
+    """
+    以现有模板为初始中心的聚类（相关系数意义下的 k-means）
+
+    返回:
+        tuple: (新模板 (10, h, w) uint8, 标签 (N,) 其中 -1 表示未归类, 匹配度矩阵 (N, 10), 迭代次数)
+    """
+    labels = None
+    for iteration in range(1, MAX_ITERATIONS + 1):
+        scores = score_all(crops, templates, executor)
+        new_labels = np.where(scores.max(axis=1) >= MIN_MEMBER_SCORE, scores.argmax(axis=1), -1)
+        if labels is not None and np.array_equal(labels, new_labels):
+            return templates, labels, scores, iteration
+        labels = new_labels
+        updated = templates.copy()
+        for digit in range(len(templates)):
+            members = crops[labels == digit]
+            if len(members):
+                updated[digit] = np.clip(np.rint(members.mean(axis=0)), 0, 255).astype(np.uint8)
+        templates = updated
+    return templates, labels, score_all(crops, templates, executor), MAX_ITERATIONS
+
+
+def choose_digit_thresholds(labels, scores) -> dict[int, dict]:
+    """
+    为每个数字选择阈值：取该类成员最低匹配度与其余截图块最高匹配度的中点，使两侧间隔最大，
+    结果限制在 DIGIT_THRESHOLD_RANGE 内(不低于运行时默认阈值)
+
+    返回:
+        dict: 数字 -> {'threshold', 'margin', 'members'}
+    """
+    result = {}
+    for digit in range(scores.shape[1]):
+        positive = scores[labels == digit, digit]
+        negative = scores[labels != digit, digit]
+        if not len(positive) or not len(negative):
+            result[digit] = {'threshold': template_bundle.DIGIT_THRESHOLD, 'margin': None,
+                             'members': int(len(positive))}
+            continue
+        low, high = float(negative.max()), float(positive.min())
+        margin = high - low
+        if margin <= 0:
+            # 正负样本重叠，保留默认阈值
+            threshold = template_bundle.DIGIT_THRESHOLD
+        else:
+            threshold = min(max((low + high) / 2, DIGIT_THRESHOLD_RANGE[0]), DIGIT_THRESHOLD_RANGE[1])
+        result[digit] = {'threshold': round(threshold, 4), 'margin': round(margin, 4),
+                         'members': int(len(positive))}
+    return result
+
+
+def choose_probe_threshold(colors, target, default: float) -> dict:
+    """
+    为探测点选择颜色距离阈值
+
+    当前阈值两侧都有样本(既有判为目标颜色的，也有判为背景的)时才调整：将样本到目标颜色的距离排序，
+    在 [默认阈值/2, 默认阈值×2] 内寻找最大的间隔（两类单链接聚类，间隔两端截断到该范围），阈值取间隔中点；
+    只有一类样本或范围内没有间隔时保留默认阈值。远处的背景样本不会把阈值推大，聚在一起的目标样本也不会把阈值压小。
+
+    参数:
+        colors: np.ndarray - (N, 3) RGB 样本
+        target: tuple - 目标颜色(RGB)
+        default: float - 当前阈值
+
+    返回:
+        dict: {'threshold', 'margin', 'samples'}
+    """
+    distances = np.unique(np.linalg.norm(colors.astype(np.float32) - np.array(target, np.float32), axis=1))
+    floor, cap = default / 2, default * 2
+    best = None
+    if len(distances) and distances[0] <= default < distances[-1]:
+        for low, high in zip(distances, distances[1:]):
+            if low >= cap:
+                break
+            if high <= floor:
+                continue
+            low, high = max(float(low), floor), min(float(high), cap)
+            if best is None or high - low > best[1] - best[0]:
+                best = (low, high)
+    if best is None:
+        return {'threshold': default, 'margin': None, 'samples': int(len(colors))}
+    threshold = min(max((best[0] + best[1]) / 2, floor), cap)
+    return {'threshold': round(threshold, 2), 'margin': round(best[1] - best[0], 2),
+            'samples': int(len(colors))}
+
+
+def calibrate_probes(paths: list[str]) -> dict:
+    """按文件名 probe_<名称>_时间戳.bin 归并探测点录制并逐个选择阈值"""
+    samples: dict[str, list] = {}
+    for path in paths:
+        name = next((n for n in template_bundle.PROBES if os.path.basename(path).startswith(f'probe_{n}_')), None)
+        if name is None:
+            print(f"跳过 {path}：无法从文件名识别探测点")
+            continue
+        _, frames = roi_recorder.read_frames(path)
+        samples.setdefault(name, []).extend(frame for _, frame in frames)
+
+    probes = {}
+    for name, frames in samples.items():
+        probe = template_bundle.PROBES[name]
+        chosen = choose_probe_threshold(np.stack(frames), probe['color'], probe['threshold'])
+        probes[name] = {'threshold': chosen['threshold']}
+        print(f"探测点{name}：{chosen['samples']}个样本，阈值 {probe['threshold']} -> {chosen['threshold']}"
+              f"(间隔{chosen['margin']})")
+    return probes
+
+
+def next_pack_version(path: str = template_bundle.CALIBRATED_PATH) -> int:
+    try:
+        header, _ = template_bundle.read_header(path)
+        return int(header.get('pack_version') or 0) + 1
+    except (OSError, ValueError):
+        return 1
+
+
+def build_pack(templates, digit_result: dict, probes: dict, summary: dict,
+               path: str = template_bundle.CALIBRATED_PATH) -> int:
+    """写入校准模板包，返回版本号"""
+    arrays, meta = template_bundle.decode_sources()
+    for digit, template in enumerate(templates):
+        name = f'digit_{digit}'
+        arrays[name] = np.ascontiguousarray(template)
+        arrays[f'{name}_norm'] = template_bundle.normalize(template)
+        meta[name] = meta[f'{name}_norm'] = {'roi': template_bundle.DIGIT_ROI,
+                                             'threshold': digit_result[digit]['threshold']}
+    version = next_pack_version(path)
+    template_bundle.write_bundle(arrays, meta, path, extra={
+        'pack_version': version,
+        'probes': probes,
+        'calibration': summary,
+    })
+    return version
+
+
+def expand_paths(patterns: list[str]) -> list[str]:
+    """展开通配符（Windows 命令行不会自动展开）"""
+    return sorted({path for pattern in patterns for path in glob.glob(pattern)})
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="由录制截图校准数字模板与识别阈值")
+    parser.add_argument('recordings', nargs='+', help="roi_recorder 录制的价格数字截图文件，支持通配符")
+    parser.add_argument('--probes', nargs='*', default=[], help="探测点像素颜色录制文件 probe_<名称>_*.bin")
+    parser.add_argument('--workers', type=int, default=None, help="进程数，默认为CPU核数")
+    parser.add_argument('--output', default=template_bundle.CALIBRATED_PATH, help="校准模板包输出路径")
+    parser.add_argument('--dry-run', action='store_true', help="只输出结果，不写入模板包")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    crops = load_crops(expand_paths(args.recordings))
+    if not len(crops):
+        print("没有可用的截图")
+        return 1
+
+    initial = np.stack([template_bundle.load_bundle().digits[i] for i in range(10)])
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        templates, labels, scores, iterations = cluster(crops, initial, executor)
+
+    digit_result = choose_digit_thresholds(labels, scores)
+    unlabeled = int((labels == -1).sum())
+    print(f"共{len(crops)}个截图块，聚类迭代{iterations}次，未归类{unlabeled}个")
+    for digit, entry in digit_result.items():
+        print(f"数字{digit}：{entry['members']}个样本，阈值{entry['threshold']}，间隔{entry['margin']}")
+
+    probes = calibrate_probes(expand_paths(args.probes))
+    summary = {
+        'crops': int(len(crops)),
+        'unlabeled': unlabeled,
+        'iterations': iterations,
+        'digits': {str(d): e for d, e in digit_result.items()},
+    }
+    if args.dry_run:
+        print(f"未写入模板包，耗时{time.perf_counter() - started:.1f}秒")
+        return 0
+    version = build_pack(templates, digit_result, probes, summary, args.output)
+    print(f"校准模板包 v{version} 已写入 {args.output}，耗时{time.perf_counter() - started:.1f}秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
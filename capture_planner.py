@@ -0,0 +1,319 @@
+"""
+截图计划模块
+功能：各使用方按分组登记需要读取的区域(价格数字区域、探测像素)，启动时测量本机单次截图的固定开销与每像素开销，
+据此把同一分组的区域划分为若干截图矩形，使每个节拍的总截图耗时最小，计划按布局缓存
+
+    单次截图耗时 ≈ overhead + per_pixel × 面积
+    相距较近的区域合并为一个外接矩形可省去一次固定开销；相距很远的区域合并后面积过大则分开截取。
+    区域数不超过 EXACT_LIMIT 时枚举全部划分求最优，否则从逐个截取开始贪心合并收益最大的两组
+
+分组：
+    monitor   单客户端检测级联每帧读取的探测点与价格数字区域
+    refresh   刷新流程每轮判断界面状态的探测点
+截取按需进行：首次读取某个区域时才截取其所在矩形，检测级联在探测点命中后不会截取价格数字区域所在的矩形。
+
+用法：
+    python capture_planner.py    测量本机截图开销并输出各分组的截图计划
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+
+from lazy_import import lazy_module
+import detect_money
+import layout
+
+np = lazy_module('numpy')
+
+# 区域数不超过此值时枚举全部划分(贝尔数，8个区域共4140种)，否则贪心合并
+EXACT_LIMIT = 8
+# 测量截图开销使用的边长(像素)
+MEASURE_SIZES = (1, 32, 128, 384)
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """单次截图耗时模型(秒)：overhead + per_pixel × 面积"""
+    overhead: float = 0.001
+    per_pixel: float = 5e-9
+    measured: bool = False
+
+    def cost(self, rect: tuple[int, int, int, int]) -> float:
+        left, top, right, bottom = rect
+        return self.overhead + self.per_pixel * (right - left) * (bottom - top)
+
+    def describe(self) -> str:
+        source = "实测" if self.measured else "默认值"
+        return (f"截图开销({source})：固定{self.overhead * 1000:.3f}ms/次，"
+                f"{self.per_pixel * 1e6 * 1e3:.3f}ms/百万像素")
+
+
+def measure(grab=None, rounds: int = 20, origin: tuple[int, int] = (0, 0)) -> CostModel:
+    """
+    测量当前线程截图实例的开销，对各边长取耗时中位数后按最小二乘拟合 耗时 = 固定开销 + 每像素开销 × 面积
+
+    参数:
+        grab: callable - 接收 mss 区域字典并截图，默认使用 detect_money.get_sct().grab
+        rounds: int - 每个边长的测量次数
+        origin: tuple - 测量区域左上角的屏幕坐标
+    """
+    grab = grab or detect_money.get_sct().grab
+    areas, seconds = [], []
+    for size in MEASURE_SIZES:
+        region = {"left": origin[0], "top": origin[1], "width": size, "height": size}
+        grab(region)  # 首次截图含初始化开销，不计入
+        samples = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            np.asarray(grab(region))
+            samples.append(time.perf_counter() - started)
+        areas.append(size * size)
+        seconds.append(float(np.median(samples)))
+    per_pixel, overhead = np.polyfit(np.array(areas, dtype=float), np.array(seconds), 1)
+    return CostModel(max(float(overhead), 0.0), max(float(per_pixel), 0.0), measured=True)
+
+
+def _union(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> tuple[int, int, int, int]:
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def _bounds(rects) -> tuple[int, int, int, int]:
+    rects = list(rects)
+    bounds = rects[0]
+    for rect in rects[1:]:
+        bounds = _union(bounds, rect)
+    return bounds
+
+
+def _plan_exact(keys: list, rects: dict, model: CostModel) -> list[list]:
+    """枚举全部划分(分支定界)：各组外接矩形的截图耗时之和最小"""
+    best = [float('inf'), None]
+    blocks: list[list] = []
+    bounds: list[tuple[int, int, int, int]] = []
+
+    def search(index: int, cost: float):
+        # 已分配部分的耗时只会随后续区域加入而增加
+        if cost >= best[0]:
+            return
+        if index == len(keys):
+            best[0], best[1] = cost, [list(block) for block in blocks]
+            return
+        key = keys[index]
+        rect = rects[key]
+        for i in range(len(blocks)):
+            previous = bounds[i]
+            merged = _union(previous, rect)
+            blocks[i].append(key)
+            bounds[i] = merged
+            search(index + 1, cost - model.cost(previous) + model.cost(merged))
+            bounds[i] = previous
+            blocks[i].pop()
+        blocks.append([key])
+        bounds.append(rect)
+        search(index + 1, cost + model.cost(rect))
+        blocks.pop()
+        bounds.pop()
+
+    search(0, 0.0)
+    return best[1]
+
+
+def _plan_greedy(keys: list, rects: dict, model: CostModel) -> list[list]:
+    """从逐个截取开始，每次合并节省耗时最多的两组，直到合并不再节省"""
+    groups = [([key], rects[key]) for key in keys]
+    while len(groups) > 1:
+        best_saving, best_pair = 0.0, None
+        for i in range(len(groups)):
+            for j in range(i + 1, len(groups)):
+                merged = _union(groups[i][1], groups[j][1])
+                saving = model.cost(groups[i][1]) + model.cost(groups[j][1]) - model.cost(merged)
+                if saving > best_saving:
+                    best_saving, best_pair = saving, (i, j)
+        if best_pair is None:
+            break
+        i, j = best_pair
+        merged = (groups[i][0] + groups[j][0], _union(groups[i][1], groups[j][1]))
+        groups = [g for k, g in enumerate(groups) if k not in best_pair] + [merged]
+    return [g[0] for g in groups]
+
+
+class CapturePlan:
+    """
+    一个分组在某个布局下的截图计划
+
+    参数:
+        rects: dict - 区域键 -> 屏幕矩形 (left, top, right, bottom)
+        model: CostModel - 截图耗时模型
+        merge: bool - False 时每个区域单独截取(与未使用截图计划时相同)
+    """
+
+    def __init__(self, rects: dict, model: CostModel, merge: bool = True):
+        keys = list(rects)
+        if not merge:
+            blocks = [[key] for key in keys]
+        elif len(keys) <= EXACT_LIMIT:
+            blocks = _plan_exact(keys, rects, model)
+        else:
+            blocks = _plan_greedy(keys, rects, model)
+        self.model = model
+        self.rects = [_bounds(rects[key] for key in block) for block in blocks]
+        self.regions = [{"left": r[0], "top": r[1], "width": r[2] - r[0], "height": r[3] - r[1]}
+                        for r in self.rects]
+        # 区域键 -> (所在截图矩形序号, 矩形内的切片)
+        self.index = {}
+        for i, block in enumerate(blocks):
+            left, top = self.rects[i][0], self.rects[i][1]
+            for key in block:
+                r = rects[key]
+                self.index[key] = (i, (slice(r[1] - top, r[3] - top), slice(r[0] - left, r[2] - left)))
+        self.cost = sum(model.cost(r) for r in self.rects)
+        self.separate_cost = sum(model.cost(r) for r in rects.values())
+        self.bounding_cost = model.cost(_bounds(rects.values())) if rects else 0.0
+
+    def grab(self, eager: bool = False) -> PlannedFrame:
+        """
+        返回本节拍的帧
+
+        参数:
+            eager: bool - True 立即截取全部矩形(供其他线程读取)，False 在首次读取时由当前线程截取
+        """
+        frame = PlannedFrame(self)
+        if eager:
+            for i in range(len(self.rects)):
+                frame.block(i)
+        return frame
+
+    def describe(self) -> str:
+        rects = "，".join(f"({r[0]},{r[1]}) {r[2] - r[0]}x{r[3] - r[1]}" for r in self.rects)
+        return (f"{len(self.index)}个区域合并为{len(self.rects)}次截图[{rects}]，预计每节拍{self.cost * 1000:.3f}ms"
+                f"(逐个截取{self.separate_cost * 1000:.3f}ms，整体外接矩形{self.bounding_cost * 1000:.3f}ms)")
+
+
+class PlannedFrame:
+    """一个节拍的截图结果，按区域键读取 BGRA 子图或像素"""
+
+    def __init__(self, plan: CapturePlan):
+        self.plan = plan
+        self._blocks = [None] * len(plan.rects)
+
+    def block(self, i: int):
+        image = self._blocks[i]
+        if image is None:
+            image = self._blocks[i] = np.asarray(detect_money.get_sct().grab(self.plan.regions[i]))
+        return image
+
+    def __contains__(self, key) -> bool:
+        return key in self.plan.index
+
+    def region(self, key):
+        """区域的 BGRA 子图"""
+        i, (rows, cols) = self.plan.index[key]
+        return self.block(i)[rows, cols]
+
+    def pixel(self, key) -> tuple[int, int, int]:
+        """区域左上角像素的颜色(RGB)，用于探测点"""
+        i, (rows, cols) = self.plan.index[key]
+        b, g, r = self.block(i)[rows.start, cols.start, :3]
+        return int(r), int(g), int(b)
+
+
+# --- 登记与缓存 ---
+# 分组 -> {区域键: 标定坐标 (x, y, width, height)}
+_registry: dict[str, dict] = {}
+# (分组, 布局) -> 截图计划
+_plans: dict[tuple, CapturePlan] = {}
+_model = CostModel()
+_merge = True
+_lock = threading.Lock()
+
+
+def register(group: str, key, x: int, y: int, width: int = 1, height: int = 1) -> None:
+    """
+    登记分组中的一个区域(标定坐标)；探测点的宽高为1，键通常为探测点名称或标定坐标
+
+    同一分组登记变化后，该分组已缓存的计划失效
+    """
+    with _lock:
+        rois = _registry.setdefault(group, {})
+        if rois.get(key) != (x, y, width, height):
+            rois[key] = (x, y, width, height)
+            for cached in [k for k in _plans if k[0] == group]:
+                del _plans[cached]
+
+
+def configure(config) -> None:
+    """从配置文件 [capture] 读取：是否合并截图区域"""
+    global _merge
+    with _lock:
+        _merge = config.getboolean('capture', 'merge_regions', fallback=True)
+        _plans.clear()
+
+
+def calibrate(rounds: int = 20) -> CostModel:
+    """测量本机截图开销并替换耗时模型(在预热阶段调用)，测量失败时保留默认值"""
+    global _model
+    try:
+        model = measure(rounds=rounds)
+    except Exception as e:
+        print(f"测量截图开销失败，使用默认值: {e}")
+        return _model
+    with _lock:
+        _model = model
+        _plans.clear()
+    return model
+
+
+def model() -> CostModel:
+    return _model
+
+
+def set_model(model: CostModel) -> None:
+    """使用已知的截图耗时模型(如会话检查点中保存的实测值)，不再测量"""
+    global _model
+    with _lock:
+        _model = model
+        _plans.clear()
+
+
+def plan_rects(rects: dict) -> CapturePlan:
+    """按当前耗时模型为任意一组屏幕矩形 (left, top, right, bottom) 生成截图计划（不缓存）"""
+    return CapturePlan(rects, _model, _merge)
+
+
+def plan(group: str, current: layout.Layout | None = None) -> CapturePlan:
+    """返回分组在指定布局(默认当前布局)下的截图计划，按 (分组, 布局) 缓存"""
+    current = current or layout.current()
+    key = (group, current)
+    cached = _plans.get(key)
+    if cached is not None:
+        return cached
+    with _lock:
+        rects = {}
+        for name, (x, y, width, height) in _registry.get(group, {}).items():
+            left, top, w, h = current.rect(x, y, width, height)
+            rects[name] = (left, top, left + w, top + h)
+        cached = _plans[key] = CapturePlan(rects, _model, _merge)
+    print(f"截图计划[{group}]：{cached.describe()}")
+    return cached
+
+
+def grab(group: str) -> PlannedFrame:
+    """按分组的截图计划开始一个节拍，区域在首次读取时截取"""
+    return plan(group).grab()
+
+
+def _main():
+    # 以模块名导入，使登记与计划落在 main 使用的同一个模块实例上
+    import capture_planner
+    import main as app
+
+    app.register_capture_regions()
+    print(capture_planner.calibrate().describe())
+    for group in list(capture_planner._registry):
+        capture_planner.plan(group)
+
+
+if __name__ == "__main__":
+    _main()
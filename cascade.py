@@ -0,0 +1,150 @@
+"""
+检测级联模块
+功能：每帧按顺序运行各检测阶段，首个命中的阶段决定本帧界面状态，其余阶段不再运行；
+统计每个阶段的耗时与命中率，运行中按 耗时/命中率 重新排序，使大多数帧由最便宜的检测给出结论
+
+各界面状态互斥(同一帧只会出现一种)，因此各阶段的先后顺序不影响结果，只影响每帧的平均耗时：
+对在首个命中处结束的互斥检测，按 耗时/命中率 从小到大排列时期望耗时最低。
+"""
+from __future__ import annotations
+
+import time
+
+import metrics
+
+# 耗时与命中率的指数滑动平均系数
+EWMA_ALPHA = 0.05
+# 排序时命中率的下限，避免很少命中的阶段因除以接近0的数被排到最后
+MIN_HIT_RATE = 0.01
+
+
+class Stage:
+    """
+    一个检测阶段
+
+    参数:
+        name: str - 阶段名，与界面事件类型一致
+        fn: callable - 无参数，返回 (是否命中, 附带数据)
+        last: bool - 固定排在最后（如数字识别：只在各探测点都已排除其他状态时才运行）
+    """
+
+    def __init__(self, name: str, fn, last: bool = False):
+        self.name = name
+        self.fn = fn
+        self.last = last
+        self.calls = 0
+        self.hits = 0
+        self.total_seconds = 0.0
+        self.cost: float | None = None   # 单次耗时的滑动平均(秒)
+        self.hit_rate = 0.5              # 命中率的滑动平均，初始不偏向任何阶段
+
+    def run(self):
+        started = time.perf_counter()
+        hit, data = self.fn()
+        elapsed = time.perf_counter() - started
+        self.calls += 1
+        self.total_seconds += elapsed
+        self.cost = elapsed if self.cost is None else self.cost + EWMA_ALPHA * (elapsed - self.cost)
+        self.hit_rate += EWMA_ALPHA * ((1.0 if hit else 0.0) - self.hit_rate)
+        if hit:
+            self.hits += 1
+        metrics.watcher_seconds.observe(elapsed, self.name)
+        return hit, data
+
+    def rank(self) -> float:
+        """期望代价排序键：耗时/命中率，未运行过的阶段排在最前以尽快测得耗时"""
+        if self.cost is None:
+            return 0.0
+        return self.cost / max(self.hit_rate, MIN_HIT_RATE)
+
+
+class Cascade:
+    """
+    检测级联
+
+    参数:
+        stages: list - 检测阶段，初始顺序即给出的顺序
+        reorder_every: int - 每多少帧按统计重新排序，0表示固定顺序
+    """
+
+    def __init__(self, stages: list[Stage], reorder_every: int = 100):
+        self.stages = list(stages)
+        self.reorder_every = reorder_every
+        self.frames = 0
+        self.stage_runs = 0
+        self.resolved = {stage.name: 0 for stage in self.stages}
+        self.resolved[None] = 0
+        self.reorders = 0
+
+    def evaluate(self) -> tuple[str | None, object]:
+        """
+        运行一帧
+
+        返回:
+            tuple: (命中阶段名或None, 附带数据)；None 表示所有阶段均未命中
+        """
+        self.frames += 1
+        if self.reorder_every and self.frames % self.reorder_every == 0:
+            self._reorder()
+        for stage in self.stages:
+            self.stage_runs += 1
+            hit, data = stage.run()
+            if hit:
+                self.resolved[stage.name] += 1
+                metrics.cascade_resolved.inc(stage.name)
+                return stage.name, data
+        self.resolved[None] += 1
+        metrics.cascade_resolved.inc('none')
+        return None, None
+
+    def _reorder(self) -> None:
+        ordered = sorted(self.stages, key=lambda s: (s.last, s.rank()))
+        if [s.name for s in ordered] != [s.name for s in self.stages]:
+            self.reorders += 1
+        # 整体替换列表，本帧之后生效
+        self.stages = ordered
+
+    def order(self) -> list[str]:
+        return [stage.name for stage in self.stages]
+
+    def state(self) -> dict:
+        """各阶段统计与当前顺序的快照，供会话检查点保存"""
+        return {
+            'order': self.order(),
+            'frames': self.frames,
+            'stage_runs': self.stage_runs,
+            'reorders': self.reorders,
+            'resolved': {name or 'none': count for name, count in self.resolved.items()},
+            'stages': {s.name: {'calls': s.calls, 'hits': s.hits, 'total_seconds': s.total_seconds,
+                                'cost': s.cost, 'hit_rate': s.hit_rate} for s in self.stages},
+        }
+
+    def restore(self, state: dict) -> None:
+        """从会话检查点恢复各阶段统计与顺序，只恢复名称一致的阶段"""
+        by_name = {stage.name: stage for stage in self.stages}
+        for name, saved in state.get('stages', {}).items():
+            stage = by_name.get(name)
+            if stage is not None:
+                stage.calls, stage.hits = saved['calls'], saved['hits']
+                stage.total_seconds, stage.cost, stage.hit_rate = saved['total_seconds'], saved['cost'], saved['hit_rate']
+        order = {name: i for i, name in enumerate(state.get('order', []))}
+        self.stages = sorted(self.stages, key=lambda s: (s.last, order.get(s.name, len(order))))
+        self.frames = state.get('frames', 0)
+        self.stage_runs = state.get('stage_runs', 0)
+        self.reorders = state.get('reorders', 0)
+        for name, count in state.get('resolved', {}).items():
+            key = None if name == 'none' else name
+            if key in self.resolved:
+                self.resolved[key] = count
+
+    def report(self, label: str = "检测级联") -> str:
+        """各阶段耗时、命中率与由该阶段给出结论的帧占比"""
+        frames = max(self.frames, 1)
+        lines = [f"{label}：{self.frames}帧，平均每帧运行{self.stage_runs / frames:.2f}个阶段，"
+                 f"当前顺序 {' > '.join(self.order())}，重新排序{self.reorders}次，"
+                 f"均未命中{self.resolved[None] / frames:.1%}"]
+        for stage in self.stages:
+            mean = stage.total_seconds / stage.calls * 1000 if stage.calls else 0.0
+            lines.append(f"- {stage.name}：运行{stage.calls}次，平均耗时{mean:.3f}ms，"
+                         f"命中率{stage.hits / max(stage.calls, 1):.1%}，给出结论{self.resolved[stage.name] / frames:.1%}")
+        return "\n".join(lines)
@@ -0,0 +1,170 @@
+"""
+会话检查点模块
+功能：运行中定期及结束时把会话状态(开始时间、初始资金、刷新计时、窗口布局、截图开销、数字识别先验、
+检测级联统计、槽位与价格统计)写入一个小的JSON快照；进程重启时若存在未结束且未过期的快照，
+跳过预热、定时等待、资金识别与槽位点击，直接按快照恢复会话，运行时长跨重启连续统计，
+结束时的消耗按快照中最初的资金与结束时的余额计算(快照不保存消耗)
+
+快照内容由调用方在主线程两次决策之间收集(poll)，本模块只负责周期写入、原子替换与恢复条件判断。
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.path.join(BASE_DIR, 'cache', 'session_checkpoint.json')
+# 快照格式版本，格式不兼容时加1，旧快照不再恢复
+CHECKPOINT_VERSION = 1
+
+
+class Checkpointer:
+    """
+    周期写入会话快照
+
+    状态由调用 poll()/stop() 的线程(主线程，在两次决策之间)收集，写入线程只负责序列化与写文件，
+    不读取运行中的会话对象，快照不会读到其他线程更新到一半的统计。
+
+    参数:
+        collect: callable - 无参数，返回可 JSON 序列化的会话状态
+        path: str - 快照文件路径
+        interval: float - 写入间隔(秒)，0表示只在结束时写入
+    """
+
+    def __init__(self, collect, path: str = DEFAULT_PATH, interval: float = 30):
+        self.collect = collect
+        self.path = path
+        self.interval = interval
+        self.saves = 0
+        self.last_save_seconds = 0.0
+        self._next_collect = 0.0
+        self._pending: dict | None = None  # 已收集、等待写入线程写入的状态
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: threading.Thread | None = None
+
+    def _collect(self, finished: bool = False) -> dict | None:
+        try:
+            state = self.collect()
+        except Exception as e:
+            print(f"会话快照收集失败: {e}")
+            return None
+        state.update({'version': CHECKPOINT_VERSION, 'saved_at': time.time(), 'finished': finished})
+        return state
+
+    def _write(self, state: dict) -> None:
+        """原子写入快照"""
+        started = time.perf_counter()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"会话快照写入失败: {e}")
+            return
+        self.saves += 1
+        self.last_save_seconds = time.perf_counter() - started
+
+    def save(self, finished: bool = False) -> None:
+        """
+        在当前线程收集并写入快照
+
+        参数:
+            finished: bool - 会话已正常结束，之后启动不再恢复
+        """
+        state = self._collect(finished)
+        if state is not None:
+            self._write(state)
+
+    def poll(self) -> None:
+        """主线程在两次决策之间调用：到达写入间隔时收集状态并交给写入线程"""
+        if self._thread is None or time.monotonic() < self._next_collect:
+            return
+        self._next_collect = time.monotonic() + self.interval
+        state = self._collect()
+        if state is not None:
+            with self._cond:
+                self._pending = state
+                self._cond.notify()
+
+    def start(self) -> None:
+        if self.interval <= 0:
+            return
+        self._stop = False
+        self._next_collect = time.monotonic() + self.interval
+        self._thread = threading.Thread(target=self._run, name='checkpoint', daemon=True)
+        self._thread.start()
+
+    def stop(self, finished: bool) -> None:
+        """停止写入线程，在当前线程收集并写入最终快照"""
+        with self._cond:
+            self._stop = True
+            self._pending = None
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.save(finished)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stop or self._pending is not None)
+                if self._stop:
+                    return
+                state, self._pending = self._pending, None
+            self._write(state)
+
+    def report(self) -> str:
+        return f"会话快照已保存到 {self.path}（写入{self.saves}次，最近一次耗时{self.last_save_seconds * 1000:.1f}ms）"
+
+
+def load(path: str = DEFAULT_PATH) -> dict | None:
+    """读取快照，文件不存在、损坏或版本不符时返回None"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"会话快照读取失败: {e}")
+        return None
+    if state.get('version') != CHECKPOINT_VERSION:
+        return None
+    return state
+
+
+def load_resumable(config) -> dict | None:
+    """
+    按配置文件 [checkpoint] 判断能否恢复上次会话
+
+    返回:
+        dict 或 None: 快照未正常结束、距保存不超过 max_age 秒且会话尚未到期时返回快照
+    """
+    if not config.getboolean('checkpoint', 'enabled', fallback=True):
+        return None
+    state = load(config.get('checkpoint', 'path', fallback='').strip() or DEFAULT_PATH)
+    if state is None or state.get('finished', True):
+        return None
+    now = time.time()
+    max_age = config.getfloat('checkpoint', 'max_age', fallback=600)
+    if now - state['saved_at'] > max_age:
+        print(f"上次会话快照已超过{max_age:g}秒，不再恢复")
+        return None
+    if now >= state['session']['started_at'] + state['session']['duration']:
+        return None
+    return state
+
+
+def load_checkpointer(config, collect) -> Checkpointer | None:
+    """从配置文件 [checkpoint] 读取参数，未启用时返回None"""
+    if not config.getboolean('checkpoint', 'enabled', fallback=True):
+        return None
+    return Checkpointer(collect,
+                        path=config.get('checkpoint', 'path', fallback='').strip() or DEFAULT_PATH,
+                        interval=config.getfloat('checkpoint', 'interval', fallback=30))
@@ -0,0 +1,190 @@
+"""
+运行时控制模块
+功能：本机 HTTP 控制接口，运行中查询状态并热更新价格区间、收藏点击位置、刷新间隔与暂停状态，
+无需修改 config.ini 重启脚本（重启会重新查找窗口、检测哈夫币位置、OCR余额并预热，且丢失会话统计）
+
+接口：
+    GET  /status   返回当前状态(JSON)
+    POST /config   提交修改(JSON)，可包含 expected_price_1、expected_price_2、x、y、execution_time_single、paused，
+                   例如 {"expected_price_1": 100000, "expected_price_2": 300000, "paused": false}
+
+POST 必须带 Content-Type: application/json 与请求头 X-Control-Token(启动时输出的令牌)：
+本机浏览器中的网页只能跨域发送不带自定义请求头的"简单请求"，其余请求需要预检，本接口不响应预检，
+因此网页无法修改价格区间或解除暂停。
+
+修改由 HTTP 线程校验后合并进待应用的修改，主线程在两次决策之间一次性取出并整体替换，
+监测线程不读取这些修改，识别路径上没有任何锁竞争。
+"""
+from __future__ import annotations
+
+import hmac
+import json
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 可修改的字段及类型
+FIELDS = {
+    'expected_price_1': int,
+    'expected_price_2': int,
+    'x': int,
+    'y': int,
+    'execution_time_single': int,
+    'paused': bool,
+}
+# 请求体大小上限(字节)
+MAX_BODY = 4096
+# 携带令牌的请求头
+TOKEN_HEADER = 'X-Control-Token'
+
+
+def validate(changes: dict, current: dict) -> dict:
+    """
+    校验提交的修改
+
+    参数:
+        changes: dict - 提交的修改
+        current: dict - 当前生效的配置(含尚未应用的修改)，用于校验价格上下限的组合
+
+    返回:
+        dict: 校验后的修改
+
+    异常:
+        ValueError: 字段未知、类型错误或取值不合法
+    """
+    if not isinstance(changes, dict) or not changes:
+        raise ValueError("请求体必须是非空的JSON对象")
+    unknown = set(changes) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"不支持的字段: {', '.join(sorted(unknown))}")
+    for key, value in changes.items():
+        expected = FIELDS[key]
+        # bool 是 int 的子类，需单独排除
+        if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+            raise ValueError(f"{key} 必须是{'布尔值' if expected is bool else '整数'}")
+
+    merged = {**current, **changes}
+    low, high = merged['expected_price_1'], merged['expected_price_2']
+    for key in ('expected_price_1', 'expected_price_2'):
+        if not 100000 <= merged[key] <= 999999:
+            raise ValueError(f"{key} 必须是六位数")
+    if low > high:
+        raise ValueError("expected_price_1 不能大于 expected_price_2")
+    if merged['execution_time_single'] <= 0:
+        raise ValueError("execution_time_single 必须大于0")
+    if merged['x'] < 0 or merged['y'] < 0:
+        raise ValueError("点击坐标不能为负数")
+    return dict(changes)
+
+
+class ControlServer:
+    """
+    控制接口
+
+    参数:
+        status: callable - 返回状态字典，其中 'config' 为当前生效的可修改字段
+        port: int - 监听端口
+        host: str - 监听地址，只应监听本机
+        token: str - POST 请求须携带的令牌，为空时每次启动随机生成
+    """
+
+    def __init__(self, status, port: int, host: str = '127.0.0.1', token: str | None = None):
+        self._status = status
+        self.port = port
+        self.host = host
+        self.token = token or secrets.token_urlsafe(16)
+        self._lock = threading.Lock()  # 只在 HTTP 线程提交与主线程取出时短暂持有
+        self._pending: dict | None = None
+        self.applied = 0  # 主线程已应用的修改批次数
+        self._server: ThreadingHTTPServer | None = None
+
+    def status(self) -> dict:
+        with self._lock:
+            pending = dict(self._pending) if self._pending else {}
+        return {**self._status(), 'pending': pending, 'applied': self.applied}
+
+    def submit(self, changes: dict) -> dict:
+        """校验并合并一次修改，返回合并后待应用的全部修改；取值不合法时抛出 ValueError"""
+        current = self._status()['config']
+        with self._lock:
+            pending = self._pending or {}
+            checked = validate(changes, {**current, **pending})
+            self._pending = {**pending, **checked}
+            return dict(self._pending)
+
+    def take(self) -> dict | None:
+        """主线程调用：取出待应用的修改，没有修改时返回None"""
+        if self._pending is None:
+            # 绝大多数节拍没有修改，读取一次属性即返回，不加锁
+            return None
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending:
+            self.applied += 1
+        return pending
+
+    def start(self) -> None:
+        handler = type('ControlHandler', (_ControlHandler,), {'control': self})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        threading.Thread(target=self._server.serve_forever, name='control_server', daemon=True).start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _ControlHandler(BaseHTTPRequestHandler):
+    control: ControlServer = None
+
+    def _reply(self, code: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/status':
+            self.send_error(404)
+            return
+        self._reply(200, self.control.status())
+
+    def do_POST(self):
+        if self.path.split('?')[0] != '/config':
+            self.send_error(404)
+            return
+        content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._reply(415, {'error': "Content-Type 必须是 application/json"})
+            return
+        if not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ''), self.control.token):
+            self._reply(403, {'error': f"缺少或错误的 {TOKEN_HEADER}"})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            self._reply(413, {'error': "请求体过大"})
+            return
+        try:
+            changes = json.loads(self.rfile.read(length) or b'null')
+            pending = self.control.submit(changes)
+        except ValueError as e:
+            # json.JSONDecodeError 也是 ValueError
+            self._reply(400, {'error': str(e)})
+            return
+        print(f"控制接口收到修改，将在下一个节拍应用：{json.dumps(changes, ensure_ascii=False)}")
+        self._reply(202, {'pending': pending})
+
+    def log_message(self, format, *args):
+        # 不把每次请求写入日志
+        pass
+
+
+def load_control_server(config, status) -> ControlServer | None:
+    """从配置文件 [control] 读取参数，未启用时返回None"""
+    if not config.getboolean('control', 'enabled', fallback=False):
+        return None
+    return ControlServer(status, config.getint('control', 'port', fallback=9210),
+                         token=config.get('control', 'token', fallback='').strip() or None)
@@ -0,0 +1,590 @@
+"""
+多机协调模块
+功能：多台机器(不同账号)各自运行监控时，由一个轻量协调服务统一分配监控槽位与价格区间、
+汇总各节点的事件日志与统计，并按(槽位, 价格)对购买意图去重，避免多个节点抢同一件物品
+
+协议：TCP 上每行一个 JSON 对象，节点发送请求，协调服务逐行应答
+    hello     {"type": "hello", "node": 名称}                          -> assign
+    heartbeat {"type": "heartbeat", "node": 名称, "stats": {...}, "journal": [...]} -> assign
+    intent    {"type": "intent", "node": 名称, "slot": 槽位名, "price": 价格}  -> {"type": "intent", "granted": bool}
+    bye       {"type": "bye", "node": 名称}                            -> {"type": "bye"}
+    assign    {"type": "assign", "epoch": 分配版本, "slots": [槽位...]}
+
+用法：
+    python coordinator.py serve [--port 9200]          按 config.ini 的监控列表启动协调服务
+    python coordinator.py simulate [--nodes 4] [--seconds 10]  本机用同一组挂单模拟多个节点，对比使用与不使用协调服务的检查速率与重复购买
+"""
+from __future__ import annotations
+
+import argparse
+import configparser
+import datetime
+import json
+import os
+import random
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict
+
+from watchlist import WatchSlot, Watchlist, PRICE_UNIT, load_watchlist
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOURNAL_DIR = os.path.join(BASE_DIR, 'logs', 'coordinator')
+
+DEFAULT_PORT = 9200
+# 同一(槽位, 价格)的购买意图在此时间(秒)内只批准一次
+INTENT_TTL = 5.0
+# 超过此时间(秒)没有心跳的节点视为离线，重新分配其槽位
+NODE_TIMEOUT = 10.0
+# 购买意图的连接与应答超时(秒)，超时按本地判断放行，不拖慢购买
+INTENT_TIMEOUT = 0.15
+# 连接失败后的重连退避(秒)：从最小值开始每次失败加倍，不超过最大值
+RECONNECT_BACKOFF_MIN = 0.5
+RECONNECT_BACKOFF_MAX = 30.0
+# 节点积压事件日志的上限(条)，协调服务长时间不可达时丢弃最早的事件
+JOURNAL_LIMIT = 5000
+
+
+def assign_slots(slots: list[WatchSlot], nodes: list[str]) -> dict[str, list[WatchSlot]]:
+    """
+    将槽位分配给节点
+
+    槽位数不少于节点数时按轮询分配，每个槽位只由一个节点监控；
+    节点多于槽位时，多出的节点与已有节点共享槽位，同一槽位的价格区间按万位切分给共享它的各节点，
+    同一件物品只会落在其中一个节点的区间内。
+
+    返回:
+        dict: 节点名 -> 槽位列表
+    """
+    result = {node: [] for node in nodes}
+    if not nodes:
+        return result
+    if len(slots) >= len(nodes):
+        for i, slot in enumerate(slots):
+            result[nodes[i % len(nodes)]].append(slot)
+        return result
+
+    for i, slot in enumerate(slots):
+        sharing = nodes[i::len(slots)]
+        low_bucket, high_bucket = slot.price_low // PRICE_UNIT, slot.price_high // PRICE_UNIT
+        buckets = high_bucket - low_bucket + 1
+        for j, node in enumerate(sharing):
+            start = low_bucket + buckets * j // len(sharing)
+            end = low_bucket + buckets * (j + 1) // len(sharing) - 1
+            if end < start:
+                continue
+            result[node].append(WatchSlot(slot.name, slot.x, slot.y, start * PRICE_UNIT, end * PRICE_UNIT))
+    return result
+
+
+class Coordinator:
+    """协调服务状态，所有方法线程安全"""
+
+    def __init__(self, slots: list[WatchSlot], journal_dir: str | None = JOURNAL_DIR):
+        self.slots = list(slots)
+        self.journal_dir = journal_dir
+        self.epoch = 0
+        self.assignment: dict[str, list[WatchSlot]] = {}
+        self.nodes: dict[str, float] = {}  # 节点名 -> 最近心跳时间
+        self.stats: dict[str, dict] = {}
+        self.intents = {'granted': 0, 'duplicate': 0}
+        self._recent_intents: dict[tuple[str, int], tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _reassign(self) -> None:
+        self.epoch += 1
+        self.assignment = assign_slots(self.slots, sorted(self.nodes))
+
+    def _expire_nodes(self, now: float) -> None:
+        expired = [node for node, seen in self.nodes.items() if now - seen > NODE_TIMEOUT]
+        for node in expired:
+            del self.nodes[node]
+        if expired:
+            print(f"节点离线：{', '.join(expired)}，重新分配槽位")
+            self._reassign()
+
+    def _assign_message(self, node: str) -> dict:
+        return {'type': 'assign', 'epoch': self.epoch,
+                'slots': [asdict(s) for s in self.assignment.get(node, [])]}
+
+    def hello(self, node: str) -> dict:
+        with self._lock:
+            now = time.time()
+            self._expire_nodes(now)
+            if node not in self.nodes:
+                self.nodes[node] = now
+                self._reassign()
+                print(f"节点加入：{node}，当前{len(self.nodes)}个节点")
+            self.nodes[node] = now
+            return self._assign_message(node)
+
+    def heartbeat(self, node: str, stats: dict | None, journal: list | None) -> dict:
+        if journal:
+            self._write_journal(node, journal)
+        with self._lock:
+            now = time.time()
+            if node not in self.nodes:
+                self.nodes[node] = now
+                self._reassign()
+            self.nodes[node] = now
+            if stats is not None:
+                self.stats[node] = stats
+            self._expire_nodes(now)
+            return self._assign_message(node)
+
+    def intent(self, node: str, slot: str, price: int) -> bool:
+        """同一(槽位, 价格)在 INTENT_TTL 内只批准第一个节点"""
+        with self._lock:
+            now = time.time()
+            key = (slot, int(price))
+            previous = self._recent_intents.get(key)
+            if previous is not None and now - previous[1] < INTENT_TTL and previous[0] != node:
+                self.intents['duplicate'] += 1
+                return False
+            self._recent_intents[key] = (node, now)
+            self.intents['granted'] += 1
+            # 顺便清理过期记录，保持字典大小有界
+            if len(self._recent_intents) > 1024:
+                self._recent_intents = {k: v for k, v in self._recent_intents.items() if now - v[1] < INTENT_TTL}
+            return True
+
+    def bye(self, node: str) -> None:
+        with self._lock:
+            if self.nodes.pop(node, None) is not None:
+                print(f"节点退出：{node}")
+                self._reassign()
+
+    def _write_journal(self, node: str, journal: list) -> None:
+        if self.journal_dir is None:
+            return
+        try:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            path = os.path.join(self.journal_dir, f"{node}.jsonl")
+            with open(path, 'a', encoding='utf-8') as f:
+                for event in journal:
+                    f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"节点事件日志写入失败({node}): {e}")
+
+    def handle(self, message: dict) -> dict:
+        kind, node = message.get('type'), str(message.get('node', ''))
+        if kind == 'hello':
+            return self.hello(node)
+        if kind == 'heartbeat':
+            return self.heartbeat(node, message.get('stats'), message.get('journal'))
+        if kind == 'intent':
+            return {'type': 'intent', 'granted': self.intent(node, str(message['slot']), int(message['price']))}
+        if kind == 'bye':
+            self.bye(node)
+            return {'type': 'bye'}
+        return {'type': 'error', 'error': f'未知消息类型: {kind}'}
+
+    def report(self) -> str:
+        with self._lock:
+            lines = [f"协调服务：{len(self.nodes)}个在线节点，分配版本{self.epoch}，"
+                     f"批准购买意图{self.intents['granted']}次，拒绝重复{self.intents['duplicate']}次"]
+            for node, stats in sorted(self.stats.items()):
+                lines.append(f"- {node}: {json.dumps(stats, ensure_ascii=False)}")
+        return "\n".join(lines)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        coordinator: Coordinator = self.server.coordinator
+        for line in self.rfile:
+            try:
+                reply = coordinator.handle(json.loads(line))
+            except (ValueError, KeyError, TypeError) as e:
+                reply = {'type': 'error', 'error': str(e)}
+            self.wfile.write((json.dumps(reply, ensure_ascii=False) + "\n").encode('utf-8'))
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(coordinator: Coordinator, host: str = '127.0.0.1', port: int = DEFAULT_PORT) -> socketserver.ThreadingTCPServer:
+    """在后台线程启动协调服务，返回服务器对象(port=0 时由系统分配端口)"""
+    server = _Server((host, port), _Handler)
+    server.coordinator = coordinator
+    threading.Thread(target=server.serve_forever, name='coordinator', daemon=True).start()
+    return server
+
+
+class CoordinatorBackoff(ConnectionError):
+    """连接处于重连退避期，本次请求未尝试连接"""
+
+
+class _Connection:
+    """
+    到协调服务的一个连接，请求-应答串行进行(持有锁)
+
+    连接或请求失败后关闭连接并按指数退避，退避期间的请求直接抛出 CoordinatorBackoff，
+    协调服务不可达时不会每次请求都等待一次连接超时。
+    """
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.failures = 0  # 连续失败次数
+        self._retry_at = 0.0
+        self._sock: socket.socket | None = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def request(self, message: dict) -> dict:
+        with self._lock:
+            if self._sock is None:
+                if time.monotonic() < self._retry_at:
+                    raise CoordinatorBackoff("协调服务重连退避中")
+                try:
+                    self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+                except OSError:
+                    self._fail()
+                    raise
+                self._file = self._sock.makefile('rwb')
+            try:
+                self._file.write((json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8'))
+                self._file.flush()
+                line = self._file.readline()
+                if not line:
+                    raise ConnectionError("协调服务断开连接")
+                reply = json.loads(line)
+            except (OSError, ValueError):
+                # 超时后迟到的应答会错位到下一次请求，连接必须丢弃
+                self._close()
+                self._fail()
+                raise
+            self.failures = 0
+            return reply
+
+    def _fail(self) -> None:
+        self.failures += 1
+        backoff = min(RECONNECT_BACKOFF_MIN * 2 ** (self.failures - 1), RECONNECT_BACKOFF_MAX)
+        self._retry_at = time.monotonic() + backoff
+
+    def _close(self) -> None:
+        for closable in (self._file, self._sock):
+            try:
+                if closable is not None:
+                    closable.close()
+            except OSError:
+                pass
+        self._file = self._sock = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+class CoordinatorClient:
+    """
+    节点侧客户端
+
+    控制连接(hello/心跳/bye)与购买意图连接分开：心跳携带积压的事件日志，可能较慢，
+    购买意图使用独立连接与短超时(intent_timeout)，不会等待心跳。
+    连接失败时 request_intent 默认放行，协调服务故障不会让节点停止购买。
+    """
+
+    def __init__(self, host: str, port: int, node: str, timeout: float = 2.0,
+                 intent_timeout: float = INTENT_TIMEOUT):
+        self.host, self.port, self.node, self.timeout = host, port, node, timeout
+        self.epoch = -1
+        self.slots: list[WatchSlot] = []
+        self._journal: deque = deque(maxlen=JOURNAL_LIMIT)
+        self._journal_lock = threading.Lock()
+        self.journal_dropped = 0  # 积压超过上限被丢弃的事件数
+        self._control = _Connection(host, port, timeout)
+        self._intent = _Connection(host, port, intent_timeout)
+        self.intents = 0
+        self.intent_seconds = 0.0
+        self.intent_fallbacks = 0  # 协调服务不可达或超时、按本地判断放行的次数
+
+    def _request(self, message: dict) -> dict:
+        return self._control.request({**message, 'node': self.node})
+
+    def _apply(self, reply: dict) -> bool:
+        """应用分配结果，返回分配是否变化"""
+        if reply.get('type') != 'assign' or reply['epoch'] == self.epoch:
+            return False
+        self.epoch = reply['epoch']
+        self.slots = [WatchSlot(**s) for s in reply['slots']]
+        return True
+
+    def hello(self) -> bool:
+        return self._apply(self._request({'type': 'hello'}))
+
+    def record(self, event: dict) -> None:
+        """记录一条事件，随下一次心跳发送；积压达到 JOURNAL_LIMIT 时丢弃最早的一条"""
+        with self._journal_lock:
+            if len(self._journal) == self._journal.maxlen:
+                self.journal_dropped += 1
+            self._journal.append({'ts': time.time(), **event})
+
+    def heartbeat(self, stats: dict | None = None) -> bool:
+        """发送统计与积压的事件日志，返回分配是否变化"""
+        with self._journal_lock:
+            journal = list(self._journal)
+            self._journal.clear()
+        stats = {**(stats or {}), 'journal_dropped': self.journal_dropped, 'intent_fallbacks': self.intent_fallbacks}
+        try:
+            return self._apply(self._request({'type': 'heartbeat', 'stats': stats, 'journal': journal}))
+        except (OSError, ValueError):
+            # 发送失败的事件放回队首，合并后仍超过上限时丢弃最早的
+            with self._journal_lock:
+                merged = journal + list(self._journal)
+                overflow = max(0, len(merged) - JOURNAL_LIMIT)
+                self.journal_dropped += overflow
+                self._journal = deque(merged[overflow:], maxlen=JOURNAL_LIMIT)
+            raise
+
+    def request_intent(self, slot: str, price: int) -> bool:
+        """申请购买意图，协调服务不可达、超时或处于重连退避时放行"""
+        started = time.perf_counter()
+        try:
+            reply = self._intent.request({'type': 'intent', 'node': self.node, 'slot': slot, 'price': int(price)})
+            return bool(reply.get('granted', True))
+        except CoordinatorBackoff:
+            self.intent_fallbacks += 1
+            return True
+        except (OSError, ValueError) as e:
+            self.intent_fallbacks += 1
+            print(f"协调服务不可用，按本地判断继续: {e}")
+            return True
+        finally:
+            self.intents += 1
+            self.intent_seconds += time.perf_counter() - started
+
+    def close(self) -> None:
+        try:
+            self._request({'type': 'bye'})
+        except (OSError, ValueError):
+            pass
+        self._control.close()
+        self._intent.close()
+
+    def report(self) -> str:
+        average = self.intent_seconds / self.intents * 1000 if self.intents else 0.0
+        return (f"协调服务客户端：购买意图{self.intents}次(平均{average:.1f}ms)，"
+                f"不可达按本地判断放行{self.intent_fallbacks}次，事件日志积压超限丢弃{self.journal_dropped}条")
+
+    def watchlist(self) -> Watchlist | None:
+        return Watchlist(self.slots) if self.slots else None
+
+
+def load_coordinator_client(config, default_node: str | None = None) -> CoordinatorClient | None:
+    """从配置文件 [coordinator] 读取参数，未启用时返回None"""
+    if not config.getboolean('coordinator', 'enabled', fallback=False):
+        return None
+    return CoordinatorClient(
+        config.get('coordinator', 'host', fallback='127.0.0.1'),
+        config.getint('coordinator', 'port', fallback=DEFAULT_PORT),
+        config.get('coordinator', 'node', fallback='').strip() or default_node or socket.gethostname(),
+        intent_timeout=config.getfloat('coordinator', 'intent_timeout', fallback=INTENT_TIMEOUT),
+    )
+
+
+# --- 本机模拟 ---
+class _Market:
+    """
+    模拟交易行：按固定随机种子预先生成各槽位的挂单序列，同一槽位同时只有一件，到期下架
+
+    购买需要 buy_seconds 完成，完成前其他节点仍能看到该挂单；同一挂单被多个节点购买即为重复购买，
+    只有第一个节点能买到，其余节点白白执行一次购买流程。
+    """
+
+    def __init__(self, slots: list[WatchSlot], seconds: float, seed: int, buy_seconds: float,
+                 in_range_ratio: float = 0.3):
+        rng = random.Random(seed)
+        self.buy_seconds = buy_seconds
+        self.listings: dict[str, list[tuple[float, float, int]]] = {}  # 槽位名 -> [(上架, 下架, 价格)]
+        self.in_range = 0
+        for slot in slots:
+            listings = self.listings[slot.name] = []
+            t = 0.0
+            while t < seconds:
+                lasts = rng.uniform(0.5, 2.0)
+                if rng.random() < in_range_ratio:
+                    price = rng.randrange(slot.price_low, slot.price_high + 1, PRICE_UNIT)
+                    self.in_range += 1
+                else:
+                    price = rng.randrange(slot.price_high + PRICE_UNIT, slot.price_high * 2, PRICE_UNIT)
+                listings.append((t, t + lasts, price))
+                t += lasts
+        self.buyers: dict[tuple[str, int], list[str]] = {}  # (槽位名, 挂单序号) -> 购买的节点
+        self._sold_at: dict[tuple[str, int], float] = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def current(self, slot: str) -> tuple[int, int] | None:
+        """槽位当前可见的挂单 (序号, 价格)，没有时返回None"""
+        now = time.time() - self.started
+        for i, (appears, expires, price) in enumerate(self.listings[slot]):
+            if appears <= now < expires:
+                sold_at = self._sold_at.get((slot, i))
+                return None if sold_at is not None and now >= sold_at else (i, price)
+        return None
+
+    def buy(self, slot: str, index: int, node: str) -> None:
+        with self._lock:
+            key = (slot, index)
+            self.buyers.setdefault(key, []).append(node)
+            self._sold_at.setdefault(key, time.time() - self.started + self.buy_seconds)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {'in_range': self.in_range, 'bought': len(self.buyers),
+                    'duplicates': sum(len(b) - 1 for b in self.buyers.values())}
+
+
+def _simulate_node(name: str, port: int | None, slots: list[WatchSlot], market: _Market, stop: threading.Event,
+                   results: dict, frame_seconds: float) -> None:
+    """
+    模拟节点：轮询监控的槽位，看到区间内挂单时(使用协调服务时先申请购买意图)执行购买
+
+    每次检查的本地耗时为 frame_seconds(截图与识别)，购买意图的往返耗时与购买耗时计入节点本身的节奏；
+    心跳在单独线程中进行，与主程序相同。port 为 None 时不使用协调服务，按本地监控列表运行。
+    """
+    client = None
+    heartbeat_stop = threading.Event()
+    checked = purchases = rejected = 0
+    if port is not None:
+        client = CoordinatorClient('127.0.0.1', port, name)
+        client.hello()
+
+        def heartbeat():
+            while not heartbeat_stop.wait(0.5):
+                try:
+                    client.heartbeat({'checked': checked, 'purchases': purchases, 'rejected': rejected})
+                except (OSError, ValueError):
+                    pass
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+    index = random.randrange(len(slots))  # 各节点从不同槽位开始轮询
+    while not stop.is_set():
+        watched = client.slots if client is not None else slots
+        if watched:
+            slot = watched[index % len(watched)]
+            index += 1
+            checked += 1
+            listing = market.current(slot.name)
+            if listing is not None and slot.price_low <= listing[1] <= slot.price_high:
+                if client is None or client.request_intent(slot.name, listing[1]):
+                    purchases += 1
+                    market.buy(slot.name, listing[0], name)
+                    if client is not None:
+                        client.record({'kind': 'purchase', 'slot': slot.name, 'price': listing[1]})
+                    stop.wait(market.buy_seconds)
+                else:
+                    rejected += 1
+        stop.wait(frame_seconds)
+    heartbeat_stop.set()
+    if client is not None:
+        try:
+            client.heartbeat({'checked': checked, 'purchases': purchases, 'rejected': rejected})
+        except (OSError, ValueError):
+            pass
+        client.close()
+    results[name] = {'checked': checked, 'purchases': purchases, 'rejected': rejected,
+                     'intent_ms': client.intent_seconds / client.intents * 1000 if client and client.intents else 0.0}
+
+
+def simulate(nodes: int, seconds: float, slots: list[WatchSlot], coordinated: bool = True, seed: int = 1,
+             frame_seconds: float = 0.05, buy_seconds: float = 0.3) -> dict:
+    """
+    在本机用同一组挂单(固定随机种子)模拟若干节点
+
+    coordinated 为 True 时启动协调服务，各节点只监控分配到的槽位与价格区间并申请购买意图；
+    为 False 时各节点都按完整监控列表独立运行，看到同一件物品的节点都会购买。
+
+    返回:
+        dict: 节点数、每分钟检查次数、区间内挂单数、买到件数、重复购买次数、拒绝重复意图次数、意图平均往返(ms)
+    """
+    server = None
+    port = None
+    if coordinated:
+        server = serve(Coordinator(slots, journal_dir=None), port=0)
+        port = server.server_address[1]
+    market = _Market(slots, seconds, seed, buy_seconds)
+    stop = threading.Event()
+    results: dict[str, dict] = {}
+    threads = [threading.Thread(target=_simulate_node,
+                                args=(f'node{i + 1}', port, slots, market, stop, results, frame_seconds),
+                                daemon=True) for i in range(nodes)]
+    for t in threads:
+        t.start()
+    stop.wait(seconds)
+    stop.set()
+    for t in threads:
+        t.join(timeout=5.0)
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    checked = sum(r['checked'] for r in results.values())
+    intent_ms = [r['intent_ms'] for r in results.values() if r['intent_ms']]
+    return {
+        'nodes': nodes,
+        'checked_per_minute': round(checked / seconds * 60, 1),
+        **market.summary(),
+        'rejected_duplicates': sum(r['rejected'] for r in results.values()),
+        'intent_ms': round(sum(intent_ms) / len(intent_ms), 2) if intent_ms else 0.0,
+    }
+
+
+def _load_slots(path: str) -> list[WatchSlot]:
+    config = configparser.ConfigParser()
+    with open(path, encoding='utf-8') as f:
+        config.read_file(f)
+    return load_watchlist(config, config.getint('click_location', 'x'), config.getint('click_location', 'y'),
+                          config.getint('limit', 'expected_price_1'), config.getint('limit', 'expected_price_2')).slots
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="多机协调服务")
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve_parser = sub.add_parser('serve', help="启动协调服务")
+    serve_parser.add_argument('--host', default='0.0.0.0')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--config', default=os.path.join(BASE_DIR, 'config.ini'))
+    sim_parser = sub.add_parser('simulate', help="本机模拟多个节点")
+    sim_parser.add_argument('--nodes', type=int, nargs='+', default=[1, 2, 4])
+    sim_parser.add_argument('--slots', type=int, default=4)
+    sim_parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        coordinator = Coordinator(_load_slots(args.config))
+        server = serve(coordinator, args.host, args.port)
+        print(f"协调服务已启动 {args.host}:{server.server_address[1]}，共{len(coordinator.slots)}个槽位")
+        try:
+            while True:
+                time.sleep(60)
+                print(coordinator.report())
+        except KeyboardInterrupt:
+            server.shutdown()
+        return 0
+
+    slots = [WatchSlot(f"槽位{i + 1}", 660 + 440 * (i % 3), 240 + 160 * (i // 3), 100000, 400000)
+             for i in range(args.slots)]
+    print(f"{datetime.datetime.now():%H:%M:%S} 模拟{args.slots}个槽位，每次{args.seconds}秒")
+    for nodes in args.nodes:
+        alone = simulate(nodes, args.seconds, slots, coordinated=False)
+        result = simulate(nodes, args.seconds, slots)
+        print(f"{nodes}个节点，区间内挂单{result['in_range']}件：")
+        print(f"  不使用协调服务：检查{alone['checked_per_minute']}次/分钟，买到{alone['bought']}件，"
+              f"重复购买{alone['duplicates']}次")
+        print(f"  使用协调服务：检查{result['checked_per_minute']}次/分钟，买到{result['bought']}件，"
+              f"重复购买{result['duplicates']}次，拒绝重复意图{result['rejected_duplicates']}次，"
+              f"意图往返平均{result['intent_ms']}ms")
+        print(f"  避免重复购买{alone['duplicates'] - result['duplicates']}次")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
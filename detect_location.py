@@ -3,16 +3,42 @@
 功能：检测游戏界面中哈夫币图标和数量的位置，用于后续截图和识别
 """
 import time
-import pyautogui
-import cv2
 import os
-import numpy as np
+import json
+
+from lazy_import import lazy_module
+import template_bundle
+import detect_money
+import metrics
+import layout
+
+# 重量级依赖延迟到首次使用时导入
+pyautogui = lazy_module('pyautogui')
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
 
 # 获取脚本所在目录
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-# 加载模板图像
-template_path = os.path.join(BASE_DIR, 'image', 'coin_template.png')
-template = cv2.imread(template_path)
+# 按窗口几何信息缓存的检测结果
+CACHE_PATH = os.path.join(BASE_DIR, 'cache', 'location_cache.json')
+# 在缓存位置复核时截图区域向四周扩展的像素数，以及复核通过所需的匹配度
+VERIFY_MARGIN = 2
+VERIFY_THRESHOLD = 0.8
+# 哈夫币图标模板在首次检测时从模板包加载
+template = None
+# 按布局缩放比例缓存的模板
+_scaled_templates = {}
+
+def get_template(scale=1.0):
+    """返回哈夫币图标模板(BGR)，首次调用时从模板包加载；scale非1时返回缩放后的模板"""
+    global template
+    if template is None:
+        template = template_bundle.load_bundle().coin
+    if scale == 1.0:
+        return template
+    if scale not in _scaled_templates:
+        _scaled_templates[scale] = layout.scale_template(template, scale)
+    return _scaled_templates[scale]
 
 def detect_coin_location():
     """
@@ -28,7 +54,9 @@ def detect_coin_location():
     # 设置截图的区域 (屏幕坐标)
     # 该区域是通过实验确定的哈夫币图标可能出现的位置范围
     # 在游戏界面的右上角区域，宽度300像素足够包含完整的哈夫币图标
-    x, y, width, height = 1450, 44, 300, 17
+    # 标定坐标按当前布局换算为屏幕坐标
+    current_layout = layout.current()
+    x, y, width, height = current_layout.rect(1450, 44, 300, 17)
     region = (x, y, width, height)
 
     # 截取屏幕特定区域
@@ -37,7 +65,7 @@ def detect_coin_location():
     screenshot = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
 
     # 模板匹配 - 使用归一化互相关系数方法(TM_CCOEFF_NORMED)
-    result = cv2.matchTemplate(screenshot, template, cv2.TM_CCOEFF_NORMED)
+    result = cv2.matchTemplate(screenshot, get_template(current_layout.scale), cv2.TM_CCOEFF_NORMED)
 
     # 找到最佳匹配位置
     min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
@@ -67,7 +95,8 @@ def detect_money_location():
     """
     # 设置截图的区域 (屏幕坐标)
     # 与上一个函数不同，这里识别的是当鼠标移动至上一个函数所识别到的哈夫币图标时，所出现的更详细界面中的哈夫币图标
-    x, y, width, height = 1400, 249, 240, 17
+    current_layout = layout.current()
+    x, y, width, height = current_layout.rect(1400, 249, 240, 17)
     region = (x, y, width, height)
 
     # 截取屏幕特定区域
@@ -75,7 +104,7 @@ def detect_money_location():
     screenshot = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
 
     # 模板匹配
-    result = cv2.matchTemplate(screenshot, template, cv2.TM_CCOEFF_NORMED)
+    result = cv2.matchTemplate(screenshot, get_template(current_layout.scale), cv2.TM_CCOEFF_NORMED)
 
     # 找到最佳匹配位置
     min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
@@ -88,18 +117,58 @@ def detect_money_location():
     # +16表示向右偏移16像素(文本在图标右侧)
     # +19表示向下偏移19像素(文本在图标右下方)
     # 宽度110确保能包含完整的数字，高度17覆盖文本的垂直范围
-    region_2 = top_left_screen[0] + 16, top_left_screen[1] + 19, 110, 17
+    # 以上像素值均为标定分辨率下的长度，按布局缩放比例换算
+    region_2 = (top_left_screen[0] + current_layout.length(16), top_left_screen[1] + current_layout.length(19),
+                current_layout.length(110), current_layout.length(17))
 
     return region_2
 
-def main():
+def _load_cache() -> dict:
+    try:
+        with open(CACHE_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_cache(cache: dict):
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    tmp_path = CACHE_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, CACHE_PATH)
+
+def verify_coin_location(location) -> float:
     """
-    主函数，执行位置检测并返回结果
+    在缓存的图标位置截取略大于模板的小区域做一次模板匹配
 
-    功能：
-        1. 检测哈夫币图标位置
-        2. 检测哈夫币数量区域
-        3. 输出检测结果
+    参数:
+        location: tuple - 缓存的哈夫币图标左上角坐标(x, y)
+
+    返回:
+        float: 匹配度，截图失败返回0
+    """
+    tpl = get_template(layout.current().scale)
+    h, w = tpl.shape[:2]
+    region = {"left": location[0] - VERIFY_MARGIN, "top": location[1] - VERIFY_MARGIN,
+              "width": w + 2 * VERIFY_MARGIN, "height": h + 2 * VERIFY_MARGIN}
+    try:
+        screenshot = np.array(detect_money.get_sct().grab(region))[:, :, :3]  # BGRA -> BGR
+    except Exception:
+        return 0.0
+    result = cv2.matchTemplate(np.ascontiguousarray(screenshot), tpl, cv2.TM_CCOEFF_NORMED)
+    return float(cv2.minMaxLoc(result)[1])
+
+def invalidate(geometry):
+    """删除指定窗口几何信息的缓存（例如缓存区域OCR失败时）"""
+    if geometry is None:
+        return
+    cache = _load_cache()
+    if cache.pop(geometry, None) is not None:
+        _save_cache(cache)
+
+def detect():
+    """
+    完整检测：搜索图标、悬停后搜索数量区域
 
     返回:
         tuple: (location, region) 包含图标位置和数量区域
@@ -110,8 +179,58 @@ def main():
     region = detect_money_location()
 
     pyautogui.hotkey('alt', 'tab')
+    return location, region
+
+def locate(geometry=None):
+    """
+    带缓存的位置检测
+
+    功能：
+        1. 若给出窗口几何信息且有缓存，在缓存位置做一次匹配复核，通过则直接返回缓存结果
+        2. 否则检测哈夫币图标位置与数量区域，并按窗口几何信息写入缓存
+
+    参数:
+        geometry: str 或 None - 窗口几何信息（窗口矩形与屏幕分辨率），None表示不使用缓存
+
+    返回:
+        tuple: (location, region, from_cache)
+    """
+    if geometry is not None:
+        entry = _load_cache().get(geometry)
+        if entry is not None:
+            location, region = tuple(entry['location']), tuple(entry['region'])
+            score = verify_coin_location(location)
+            if score >= VERIFY_THRESHOLD:
+                metrics.cache_hits.inc('location')
+                print(f'哈夫币位置缓存命中(匹配度{score:.2f})：{location}  数量区域：{region}')
+                return location, region, True
+            print(f'哈夫币位置缓存复核失败(匹配度{score:.2f})，重新检测')
+        metrics.cache_misses.inc('location')
+
+    location, region = detect()
     print(f'哈夫币图标位置区域：{location}  哈夫币数量位置区域：{region}')
 
+    if geometry is not None:
+        cache = _load_cache()
+        cache[geometry] = {'location': [int(v) for v in location], 'region': [int(v) for v in region]}
+        try:
+            _save_cache(cache)
+        except OSError as e:
+            print(f'哈夫币位置缓存写入失败: {e}')
+
+    return location, region, False
+
+def main(geometry=None):
+    """
+    主函数，执行位置检测并返回结果
+
+    参数:
+        geometry: str 或 None - 窗口几何信息，给出时优先使用已复核的缓存
+
+    返回:
+        tuple: (location, region) 包含图标位置和数量区域
+    """
+    location, region, _ = locate(geometry)
     return location, region
 
 if __name__ == "__main__":
@@ -2,21 +2,146 @@
 价格数字识别模块
 功能：识别六位数价格的十万位和万位，剩余位数补0
 """
-import mss
-import cv2
+from __future__ import annotations
+
+import math
 import os
-import numpy as np
+import sys
+import threading
 from typing import Sequence
 from concurrent.futures import ThreadPoolExecutor
 import time
 
+from lazy_import import lazy_module
+import template_bundle
+import layout
+import metrics
+
+# 重量级依赖延迟到首次使用时导入
+mss = lazy_module('mss')
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+
 # 获取脚本所在目录
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-# 预加载数字模板图像
-templates = {
-    i: cv2.imread(os.path.join(BASE_DIR, 'image', f'{i}_gray_image.png'), cv2.IMREAD_GRAYSCALE)
-    for i in range(10)
-}
+# 模板包与数字模板在首次识别时加载
+bundle: template_bundle.TemplateBundle | None = None
+templates: dict | None = None
+# 各数字的匹配度阈值，校准模板包中按数字分别给出
+digit_thresholds: dict | None = None
+# 按布局缩放比例缓存的数字模板
+_scaled_templates: dict[float, dict] = {}
+_templates_lock = threading.Lock()
+# 每个线程复用自己的 mss 实例，避免每次截图都重新创建
+_local = threading.local()
+# 按布局缩放比例缓存的提前结束匹配度下限
+_early_exit_bounds: dict[float, float] = {}
+# 浮点误差余量：matchTemplate 内部以 float32 计算，下限上再加一点余量保证与全量扫描一致
+EARLY_EXIT_EPSILON = 1e-4
+# 可选的截图区域录制器，由 main 根据配置设置
+recorder = None
+
+
+class DigitPrior:
+    """
+    单个数位的识别先验
+
+    收藏物品的价格高位在两次刷新之间很少变化：先试上次识别出的数字，
+    其余按本次会话各数字出现的次数降序排列，次数相同按数字大小。
+    """
+
+    def __init__(self):
+        self.last: int | None = None
+        self.counts = [0] * 10
+        self._order = list(range(10))
+
+    def order(self) -> list[int]:
+        return self._order
+
+    def observe(self, num: int) -> None:
+        self.last = num
+        self.counts[num] += 1
+        self._order = sorted(range(10), key=lambda d: (d != num, -self.counts[d], d))
+
+    def state(self) -> dict:
+        return {'last': self.last, 'counts': list(self.counts)}
+
+    def restore(self, state: dict) -> None:
+        self.last = state['last']
+        self.counts = list(state['counts'])
+        self._order = sorted(range(10), key=lambda d: (d != self.last, -self.counts[d], d))
+
+
+# 十万位与万位各自的先验
+priors = (DigitPrior(), DigitPrior())
+
+
+def reset_priors() -> None:
+    """开始新的会话时清空先验"""
+    global priors
+    priors = (DigitPrior(), DigitPrior())
+
+
+def priors_state() -> list[dict]:
+    """十万位与万位先验的快照，供会话检查点保存"""
+    return [prior.state() for prior in priors]
+
+
+def restore_priors(state: list[dict]) -> None:
+    """从会话检查点恢复先验，恢复后的进程第一帧即按上次会话的数字顺序匹配"""
+    global priors
+    restored = (DigitPrior(), DigitPrior())
+    for prior, saved in zip(restored, state):
+        prior.restore(saved)
+    priors = restored
+
+
+def get_templates(scale: float = 1.0) -> dict:
+    """
+    返回数字模板（数字 -> 灰度图像），首次调用时从模板包加载
+
+    参数:
+        scale: float - 布局缩放比例，非1时返回按比例缩放并缓存的模板
+    """
+    global templates
+    if templates is None:
+        templates = get_bundle().digits
+    if scale == 1.0:
+        return templates
+    scaled = _scaled_templates.get(scale)
+    if scaled is None:
+        scaled = {num: layout.scale_template(t, scale) for num, t in templates.items()}
+        _scaled_templates[scale] = scaled
+    return scaled
+
+
+def get_bundle() -> template_bundle.TemplateBundle:
+    """返回已加载的模板包（存在校准模板包时为校准版本）"""
+    global bundle, digit_thresholds
+    if bundle is None:
+        with _templates_lock:
+            if bundle is None:
+                loaded = template_bundle.load_bundle()
+                digit_thresholds = {i: loaded.threshold(f'digit_{i}', template_bundle.DIGIT_THRESHOLD)
+                                    for i in range(10)}
+                if loaded.pack_version is not None:
+                    print(f"使用校准模板包 v{loaded.pack_version}")
+                bundle = loaded
+    return bundle
+
+
+def get_digit_thresholds() -> dict:
+    """数字 -> 匹配度阈值"""
+    get_bundle()
+    return digit_thresholds
+
+
+def get_sct():
+    """返回当前线程的 mss 截图实例"""
+    sct = getattr(_local, 'sct', None)
+    if sct is None:
+        sct = _local.sct = mss.mss()
+    return sct
 
 
 def is_color_similar(a, b, target_color, threshold=30):
@@ -25,11 +150,11 @@ def is_color_similar(a, b, target_color, threshold=30):
     读取失败返回 False。
     """
     try:
-        with mss.mss() as sct:
-            region = {"top": b, "left": a, "width": 1, "height": 1}
-            img = np.array(sct.grab(region))  # BGRA
-            bgr = img[0, 0, :3]
-            pixel_color = (int(bgr[2]), int(bgr[1]), int(bgr[0]))  # 转 RGB
+        a, b = layout.current().point(a, b)  # 标定坐标换算为屏幕坐标
+        region = {"top": b, "left": a, "width": 1, "height": 1}
+        img = np.array(get_sct().grab(region))  # BGRA
+        bgr = img[0, 0, :3]
+        pixel_color = (int(bgr[2]), int(bgr[1]), int(bgr[0]))  # 转 RGB
     except Exception:
         return False
 
@@ -39,6 +164,34 @@ def is_color_similar(a, b, target_color, threshold=30):
     return (dr * dr + dg * dg + db * db) ** 0.5 < threshold
 
 
+def early_exit_bound(digit_templates: dict) -> float:
+    """
+    提前结束匹配所需的匹配度下限
+
+    截图块与模板同尺寸时，TM_CCOEFF_NORMED 就是两者零均值向量的夹角余弦。
+    若模板两两之间的最大相关系数为 c，任意两个模板的夹角不小于 arccos(c)；
+    截图块与某模板的夹角小于 arccos(c)/2 时，由三角不等式，它与其余模板的夹角都更大，
+    该模板必然是全量扫描的最大值。对应的下限为 cos(arccos(c)/2) = sqrt((1+c)/2)。
+
+    参数:
+        digit_templates: dict - 数字 -> 灰度模板
+
+    返回:
+        float: 匹配度超过此值即可提前结束
+    """
+    normalized = [template_bundle.normalize(t).ravel() for t in digit_templates.values()]
+    max_corr = max(float(np.dot(a, b)) for i, a in enumerate(normalized) for b in normalized[i + 1:])
+    return math.sqrt((1.0 + max_corr) / 2.0) + EARLY_EXIT_EPSILON
+
+
+def get_early_exit_bound(scale: float = 1.0) -> float:
+    """返回指定布局缩放比例下模板的提前结束下限（缓存）"""
+    bound = _early_exit_bounds.get(scale)
+    if bound is None:
+        bound = _early_exit_bounds[scale] = early_exit_bound(get_templates(scale))
+    return bound
+
+
 def match_template(image: np.ndarray, template: np.ndarray) -> tuple[float, Sequence[int]]:
     """
     执行模板匹配，返回最佳匹配度和匹配位置
@@ -55,13 +208,61 @@ def match_template(image: np.ndarray, template: np.ndarray) -> tuple[float, Sequ
     return max_val, max_loc
 
 
-def find_best_match(image_part: np.ndarray, threshold: float = 0.95) -> tuple[None, float] | tuple[int, float]:
+def find_best_match_ordered(image_part: np.ndarray, prior: DigitPrior, bound: float, threshold: float = 0.95,
+                            digit_templates: dict | None = None,
+                            thresholds: dict | None = None) -> tuple[None, float] | tuple[int, float]:
+    """
+    按先验顺序逐个匹配数字模板，匹配度超过 bound 时提前结束，否则补齐剩余模板后取最大值
+
+    结果与 find_best_match 的全量扫描完全一致（见 early_exit_bound）；
+    截图块与模板尺寸不同时（滑动匹配）下限不再成立，直接退回全量扫描。
+
+    参数:
+        image_part: np.ndarray - 待识别的图像部分
+        prior: DigitPrior - 该数位的先验，识别成功后更新
+        bound: float - 提前结束的匹配度下限
+        threshold: float - 匹配度阈值，默认0.95
+        digit_templates: dict - 数字模板，默认使用标定分辨率的模板
+        thresholds: dict - 按数字分别指定的阈值，未给出的数字使用 threshold
+
+    返回:
+        tuple: (识别的数字或None, 匹配度) 当匹配度低于阈值时返回None
+    """
+    digit_templates = digit_templates or get_templates()
+    if image_part.shape != digit_templates[0].shape:
+        metrics.digit_matches.inc('full_scan')
+        return find_best_match(image_part, threshold, digit_templates, thresholds)
+
+    scores = {}
+    for num in prior.order():
+        score = match_template(image_part, digit_templates[num])[0]
+        scores[num] = score
+        if score > bound:
+            metrics.digit_matches.inc('early_exit')
+            break
+    else:
+        metrics.digit_matches.inc('full_scan')
+    metrics.digit_comparisons.inc(amount=len(scores))
+
+    # 与全量扫描相同的取值方式：按数字顺序取最大值
+    best_num = max(sorted(scores), key=lambda num: scores[num])
+    best_score = scores[best_num]
+    if best_score < (thresholds or {}).get(best_num, threshold):
+        return None, best_score
+    prior.observe(best_num)
+    return best_num, best_score
+
+
+def find_best_match(image_part: np.ndarray, threshold: float = 0.95, digit_templates: dict | None = None,
+                    thresholds: dict | None = None) -> tuple[None, float] | tuple[int, float]:
     """
-    在图像部分中找到最佳匹配的数字模板
+    在图像部分中找到最佳匹配的数字模板（全量扫描全部10个模板）
 
     参数:
         image_part: np.ndarray - 待识别的图像部分
         threshold: float - 匹配度阈值，默认0.95
+        digit_templates: dict - 数字模板，默认使用标定分辨率的模板
+        thresholds: dict - 按数字分别指定的阈值，未给出的数字使用 threshold
 
     返回:
         tuple: (识别的数字或None, 匹配度) 当匹配度低于阈值时返回None
@@ -74,11 +275,11 @@ def find_best_match(image_part: np.ndarray, threshold: float = 0.95) -> tuple[No
 
     # 使用线程池并行化模板匹配，并行处理10个数字模板的匹配
     with ThreadPoolExecutor() as executor:
-        match_values = list(executor.map(match, templates.items()))
+        match_values = list(executor.map(match, (digit_templates or get_templates()).items()))
 
     # 找到最佳匹配（匹配度最高的数字）
     best_match = max(match_values, key=lambda item: item[1])
-    if best_match[1] < threshold:  # 如果最佳匹配度小于阈值
+    if best_match[1] < (thresholds or {}).get(best_match[0], threshold):  # 如果最佳匹配度小于该数字的阈值
         return None, best_match[1]  # 返回None表示无法可靠识别
     return best_match[0], best_match[1]  # 返回识别的数字和匹配度
 
@@ -93,50 +294,141 @@ def capture_with_mss(region):
     返回:
         np.ndarray: 灰度处理后的截图图像
     """
-    with mss.mss() as sct:
-        # 将简化的 region 转换为 mss 所需的字典格式
-        region_dict = {"top": region[0], "left": region[1], "width": region[2], "height": region[3]}
-        screenshot = sct.grab(region_dict)  # 执行截图
-        img = np.array(screenshot)[:, :, :3]  # 去掉 alpha 通道，只保留RGB三个通道
-        return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)  # 返回灰度图像
+    # 将简化的 region 转换为 mss 所需的字典格式
+    region_dict = {"top": region[0], "left": region[1], "width": region[2], "height": region[3]}
+    screenshot = get_sct().grab(region_dict)  # 执行截图
+    img = np.array(screenshot)[:, :, :3]  # 去掉 alpha 通道，只保留RGB三个通道
+    return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)  # 返回灰度图像
 
 
-def match_image_templates_six_digits_hundred_thousands_and_ten_thousands() -> tuple[tuple[int | None, float], tuple[int | None, float]]:
+def match_image_templates_six_digits_hundred_thousands_and_ten_thousands(frame=None) -> tuple[tuple[int | None, float], tuple[int | None, float]]:
     """
     识别六位数价格中的十万位和万位
+
+    参数:
+        frame: capture_planner.PlannedFrame - 本节拍的截图计划帧，含 'digits' 区域时从中读取，否则单独截图
+
     返回: ((十万位或None, 分数), (万位或None, 分数))
     """
     # 使用新区域并分割为左右两部分：左=十万位，右=万位
-    region = (176, 299, 24, 17)
-    img = capture_with_mss(region)
+    # 区域与模板均按当前布局换算；只读取一次布局，避免中途切换导致尺寸不一致
+    current_layout = layout.current()
+    if frame is not None and 'digits' in frame:
+        # 灰度转换与 capture_with_mss 一致
+        img = cv2.cvtColor(np.ascontiguousarray(frame.region('digits')[:, :, :3]), cv2.COLOR_RGB2GRAY)
+    else:
+        img = capture_with_mss(current_layout.region(*template_bundle.DIGIT_ROI))
+    if recorder is not None:
+        recorder.write(img)
+    return match_digits(img, current_layout.scale)
 
-    left_part = img[:, :11]     # 十万位
-    right_part = img[:, -11:]   # 万位
 
-    hundred_thousands_detected = find_best_match(left_part)
-    ten_thousands_detected = find_best_match(right_part)
+def match_digits(img: np.ndarray, scale: float = 1.0, ordered: bool = True,
+                 digit_priors: tuple[DigitPrior, DigitPrior] | None = None):
+    """
+    识别截图区域中的十万位与万位
+
+    参数:
+        img: np.ndarray - 价格区域灰度截图
+        scale: float - 布局缩放比例
+        ordered: bool - True 按先验顺序提前结束匹配，False 全量扫描
+        digit_priors: tuple - 十万位与万位的先验，默认使用模块级先验（多客户端模式下每个客户端各自一份）
+
+    返回:
+        tuple: ((十万位或None, 分数), (万位或None, 分数))
+    """
+    digit_templates = get_templates(scale)
+    thresholds = get_digit_thresholds()
+    width = digit_templates[0].shape[1]
+
+    left_part = img[:, :width]     # 十万位
+    right_part = img[:, -width:]   # 万位
+
+    if not ordered:
+        return (find_best_match(left_part, digit_templates=digit_templates, thresholds=thresholds),
+                find_best_match(right_part, digit_templates=digit_templates, thresholds=thresholds))
+
+    bound = get_early_exit_bound(scale)
+    hundred_thousands_prior, ten_thousands_prior = digit_priors or priors
+    hundred_thousands_detected = find_best_match_ordered(left_part, hundred_thousands_prior, bound,
+                                                         digit_templates=digit_templates, thresholds=thresholds)
+    ten_thousands_detected = find_best_match_ordered(right_part, ten_thousands_prior, bound,
+                                                     digit_templates=digit_templates, thresholds=thresholds)
 
     return hundred_thousands_detected, ten_thousands_detected
 
 
-def detect_six_digits_hundred_thousands_and_ten_thousands() -> int | None:
+def detect_six_digits_hundred_thousands_and_ten_thousands(frame=None) -> int | None:
     """
     返回价格（十万位和万位组成，剩余位数为0）。识别失败返回None。
     若界面不存在数字，返回0（沿用原颜色判断逻辑）。
     """
-    ht, tt = match_image_templates_six_digits_hundred_thousands_and_ten_thousands()
+    ht, tt = match_image_templates_six_digits_hundred_thousands_and_ten_thousands(frame)
     if ht[0] is None or tt[0] is None:
         return None
     return int(ht[0]) * 100000 + int(tt[0]) * 10000
 
 
-def main():
+def warm_up(rounds: int = 3) -> None:
+    """
+    预热：导入依赖、加载模板包、创建当前线程的截图实例，并执行几次完整识别，
+    使 OpenCV 与截图的首次初始化开销不落在正式监测的第一帧上
+    """
+    get_bundle()
+    get_templates()
+    get_early_exit_bound(layout.current().scale)
+    for _ in range(rounds):
+        detect_six_digits_hundred_thousands_and_ten_thousands()
+
+
+def main(frame=None):
     """
     识别六位数的十万位与万位
+
+    参数:
+        frame: capture_planner.PlannedFrame - 本节拍的截图计划帧，None 时单独截取价格数字区域
     """
-    return detect_six_digits_hundred_thousands_and_ten_thousands()
+    return detect_six_digits_hundred_thousands_and_ten_thousands(frame)
+
+
+def verify_recording(path: str) -> bool:
+    """
+    离线校验：对录制文件中的每一帧分别按先验顺序匹配与全量扫描，要求数字与匹配度完全一致
+
+    参数:
+        path: str - roi_recorder 录制的文件
+
+    返回:
+        bool: 全部一致返回True
+    """
+    import roi_recorder
+
+    header, frames = roi_recorder.read_frames(path)
+    scale = header.get('scale', 1.0)
+    reset_priors()
+    total = mismatches = 0
+    comparisons_before = metrics.digit_comparisons.value()
+    early_before = metrics.digit_matches.value('early_exit')
+    for ts, frame in frames:
+        ordered = match_digits(frame, scale, ordered=True)
+        full = match_digits(frame, scale, ordered=False)
+        total += 1
+        if ordered != full:
+            mismatches += 1
+            print(f"不一致 ts={ts:.3f}: 提前结束 {ordered} / 全量扫描 {full}")
+
+    comparisons = metrics.digit_comparisons.value() - comparisons_before
+    early = metrics.digit_matches.value('early_exit') - early_before
+    if total:
+        print(f"共{total}帧，不一致{mismatches}帧；平均每个数位比较{comparisons / (2 * total):.2f}个模板"
+              f"(全量扫描为10个)，提前结束占比{early / (2 * total):.1%}")
+    else:
+        print("录制文件中没有帧")
+    return mismatches == 0
 
 
 if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == 'verify':
+        sys.exit(0 if verify_recording(sys.argv[2]) else 1)
     time.sleep(3)
     print(main())
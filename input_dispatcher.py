@@ -0,0 +1,218 @@
+"""
+输入调度模块
+功能：所有鼠标键盘操作都由同一个调度线程按优先级依次执行，避免连点线程与主线程同时操作输入
+
+优先级：购买 > 刷新/界面导航 > 连点
+    - 高优先级手势提交时，丢弃队列中尚未执行的连点手势
+    - 每个手势是一次后端提交（SendInput），正在执行的手势很短，高优先级手势最多等待一个手势的时间
+    - exclusive() 期间拒绝低优先级提交，保证购买/刷新的多步操作之间不会插入连点
+    - 连点按目标(key)合并：同一目标已有待执行的连点时不再提交，不同目标(如多客户端)互不影响
+    - run() 等待手势执行完毕（确认）后才返回
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import metrics
+
+PRIORITY_PURCHASE = 0
+PRIORITY_NAVIGATION = 1
+PRIORITY_CLICK = 2
+
+PRIORITY_NAMES = {PRIORITY_PURCHASE: 'purchase', PRIORITY_NAVIGATION: 'navigation', PRIORITY_CLICK: 'click'}
+
+
+class Ticket:
+    """一次已提交的手势，done 在执行完毕或被丢弃时置位"""
+
+    def __init__(self, priority, fn, args, kwargs, key=None):
+        self.priority = priority
+        self.key = key  # 连点目标，用于按目标合并待执行的连点
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.cancelled = False
+        self.result = None
+        self.error: BaseException | None = None
+
+    def wait(self, timeout: float | None = None):
+        """等待确认，返回手势结果；手势抛出的异常在此重新抛出"""
+        if not self.done.wait(timeout):
+            raise TimeoutError("输入手势等待超时")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class InputDispatcher:
+    def __init__(self, controller):
+        self.controller = controller
+        self._heap: list[tuple[int, int, Ticket]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._floors: list[int] = []  # exclusive() 设置的优先级下限栈
+        self._queued_clicks: Counter = Counter()  # 连点目标 -> 待执行的连点数
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self.thread_init = None  # 调度线程启动时调用 thread_init('input')，用于绑核与设置优先级
+
+    # --- 生命周期 ---
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='input_dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    # --- 提交 ---
+    def _drop_below(self, priority: int) -> None:
+        """丢弃队列中优先级低于 priority 的手势（调用方持有锁）"""
+        kept = []
+        for item in self._heap:
+            ticket = item[2]
+            if ticket.priority > priority:
+                ticket.cancelled = True
+                ticket.done.set()
+                if ticket.priority == PRIORITY_CLICK:
+                    self._release_click(ticket)
+                metrics.input_preempted.inc(PRIORITY_NAMES[ticket.priority])
+            else:
+                kept.append(item)
+        if len(kept) != len(self._heap):
+            heapq.heapify(kept)
+            self._heap = kept
+
+    def _release_click(self, ticket: Ticket) -> None:
+        """连点出队或被丢弃时减少该目标的待执行计数（调用方持有锁）"""
+        self._queued_clicks[ticket.key] -= 1
+        if self._queued_clicks[ticket.key] <= 0:
+            del self._queued_clicks[ticket.key]
+
+    def submit(self, priority: int, fn, *args, **kwargs) -> Ticket:
+        """
+        提交手势，不等待执行
+
+        返回:
+            Ticket: 被 exclusive() 拒绝时返回已取消的 Ticket
+        """
+        return self._submit(Ticket(priority, fn, args, kwargs))
+
+    def _submit(self, ticket: Ticket) -> Ticket:
+        priority = ticket.priority
+        with self._cond:
+            if self._floors and priority > min(self._floors):
+                ticket.cancelled = True
+                ticket.done.set()
+                return ticket
+            if not self._running:
+                # 调度线程未启动时直接在调用线程执行
+                self._execute(ticket)
+                return ticket
+            self._drop_below(priority)
+            heapq.heappush(self._heap, (priority, next(self._seq), ticket))
+            if priority == PRIORITY_CLICK:
+                self._queued_clicks[ticket.key] += 1
+            self._cond.notify()
+        return ticket
+
+    def submit_click(self, fn, *args, key=None, **kwargs) -> bool:
+        """
+        提交连点手势；同一目标已有待执行的连点或处于 exclusive() 期间时不提交
+
+        参数:
+            key: 连点目标，多客户端模式下为客户端序号；不同目标的连点各自合并，互不阻挡
+
+        返回:
+            bool: 成功入队返回True
+        """
+        with self._cond:
+            if self._queued_clicks[key] > 0 or (self._floors and PRIORITY_CLICK > min(self._floors)):
+                return False
+        return not self._submit(Ticket(PRIORITY_CLICK, fn, args, kwargs, key)).cancelled
+
+    def run(self, priority: int, fn, *args, **kwargs):
+        """提交手势并等待执行完毕，返回手势结果；在调度线程内调用时直接执行"""
+        if threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)
+        return self.submit(priority, fn, *args, **kwargs).wait()
+
+    @contextmanager
+    def exclusive(self, priority: int):
+        """期间拒绝并丢弃低于 priority 的手势，用于购买、刷新等多步操作"""
+        with self._cond:
+            self._floors.append(priority)
+            self._drop_below(priority)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._floors.remove(priority)
+
+    def view(self, priority: int) -> "DispatchedController":
+        """返回以指定优先级提交所有操作的控制器视图"""
+        return DispatchedController(self, priority)
+
+    # --- 调度线程 ---
+    def _execute(self, ticket: Ticket) -> None:
+        metrics.input_dispatch_seconds.observe(time.perf_counter() - ticket.submitted, PRIORITY_NAMES[ticket.priority])
+        try:
+            ticket.result = ticket.fn(*ticket.args, **ticket.kwargs)
+        except Exception as e:
+            ticket.error = e
+        finally:
+            ticket.done.set()
+
+    def _run(self):
+        if self.thread_init is not None:
+            self.thread_init('input')
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    # 退出时释放所有等待者
+                    for _, _, ticket in self._heap:
+                        ticket.cancelled = True
+                        ticket.done.set()
+                    self._heap.clear()
+                    self._queued_clicks.clear()
+                    return
+                _, _, ticket = heapq.heappop(self._heap)
+                if ticket.priority == PRIORITY_CLICK:
+                    self._release_click(ticket)
+            self._execute(ticket)
+
+
+class DispatchedController:
+    """
+    控制器视图：调用方式与 MouseKeyboardController 相同，
+    每个方法都以固定优先级提交给调度线程并等待确认
+    """
+
+    def __init__(self, dispatcher: InputDispatcher, priority: int):
+        self._dispatcher = dispatcher
+        self._priority = priority
+
+    def __getattr__(self, name):
+        method = getattr(self._dispatcher.controller, name)
+        if not callable(method):
+            return method
+
+        def dispatched(*args, **kwargs):
+            return self._dispatcher.run(self._priority, method, *args, **kwargs)
+
+        return dispatched
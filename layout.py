@@ -0,0 +1,232 @@
+"""
+界面布局模块
+功能：所有截图区域、探测像素和点击坐标都按 1920x1080 全屏无边框标定；
+窗口化、偏移或非 1080p 运行时，先在游戏窗口内用图像金字塔由粗到细搜索锚点模板，
+求出偏移与缩放比例，之后所有坐标经当前布局换算到屏幕坐标
+"""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, asdict
+
+from lazy_import import lazy_module
+
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(BASE_DIR, 'cache', 'layout_cache.json')
+
+# 标定坐标所用的分辨率
+REFERENCE_WIDTH = 1920
+REFERENCE_HEIGHT = 1080
+
+# 锚点：哈夫币图标在标定分辨率下的出现范围 (x, y, width, height)，与 detect_location 一致
+ANCHOR_REFERENCE_RECT = (1450, 44, 300, 17)
+# 锚点匹配度低于此值视为未找到
+ANCHOR_THRESHOLD = 0.7
+# 粗搜索与细搜索的缩放步长，以及相对窗口尺寸估计值的搜索范围
+COARSE_STEP = 0.05
+FINE_STEP = 0.01
+SCALE_SEARCH_RANGE = 0.15
+# 窗口尺寸估计的缩放比例处匹配度与最佳值相差不超过此值时，优先采用窗口尺寸估计值
+SCALE_HINT_TOLERANCE = 0.03
+# 粗搜索层模板的最小边长(像素)
+MIN_COARSE_TEMPLATE = 8
+
+
+@dataclass(frozen=True)
+class Layout:
+    """标定坐标 -> 屏幕坐标：screen = offset + reference * scale"""
+    offset_x: int = 0
+    offset_y: int = 0
+    scale: float = 1.0
+
+    @property
+    def is_identity(self) -> bool:
+        return self.offset_x == 0 and self.offset_y == 0 and self.scale == 1.0
+
+    def length(self, value: int) -> int:
+        """换算长度/相对位移"""
+        return int(round(value * self.scale))
+
+    def point(self, x: int, y: int) -> tuple[int, int]:
+        """换算点坐标"""
+        return self.offset_x + self.length(x), self.offset_y + self.length(y)
+
+    def rect(self, x: int, y: int, width: int, height: int) -> tuple[int, int, int, int]:
+        """换算 (x, y, width, height) 区域"""
+        left, top = self.point(x, y)
+        return left, top, max(1, self.length(width)), max(1, self.length(height))
+
+    def region(self, top: int, left: int, width: int, height: int) -> tuple[int, int, int, int]:
+        """换算 detect_money 使用的 (top, left, width, height) 区域"""
+        left, top, width, height = self.rect(left, top, width, height)
+        return top, left, width, height
+
+    def to_reference(self, x: int, y: int) -> tuple[float, float]:
+        """屏幕坐标 -> 标定坐标"""
+        return (x - self.offset_x) / self.scale, (y - self.offset_y) / self.scale
+
+
+# 当前布局，默认即为 1920x1080 全屏
+_current = Layout()
+
+
+def current() -> Layout:
+    return _current
+
+
+def set_current(layout: Layout) -> None:
+    global _current
+    _current = layout
+
+
+def scale_template(template, scale: float):
+    """按比例缩放模板，缩小用 INTER_AREA，放大用 INTER_LINEAR"""
+    if scale == 1.0:
+        return template
+    h, w = template.shape[:2]
+    size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    return cv2.resize(template, size, interpolation=interpolation)
+
+
+def _search(image, template, scales):
+    """在 image 中按给定缩放比例搜索模板，返回 (匹配度, 缩放比例, (x, y))"""
+    best = (-1.0, 1.0, (0, 0))
+    for scale in scales:
+        tpl = scale_template(template, scale)
+        if tpl.shape[0] > image.shape[0] or tpl.shape[1] > image.shape[1] or min(tpl.shape[:2]) < 3:
+            continue
+        result = cv2.matchTemplate(image, tpl, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_val > best[0]:
+            best = (float(max_val), scale, max_loc)
+    return best
+
+
+def _frange(start: float, stop: float, step: float) -> list[float]:
+    count = int(round((stop - start) / step))
+    return [round(start + i * step, 4) for i in range(count + 1)]
+
+
+def search_anchor(image, template, scale_hint: float):
+    """
+    由粗到细的金字塔搜索
+
+    1. 粗搜索：在半分辨率图像上（模板过小时为原分辨率），以 COARSE_STEP 为步长搜索 scale_hint 附近的缩放比例
+    2. 细搜索：回到原分辨率，只在粗搜索命中点附近的小区域内以 FINE_STEP 为步长细化
+
+    参数:
+        image: np.ndarray - 窗口客户区灰度截图
+        template: np.ndarray - 标定分辨率下的锚点灰度模板
+        scale_hint: float - 由窗口尺寸估计的缩放比例
+
+    返回:
+        tuple: (匹配度, 缩放比例, (x, y)窗口内坐标)
+    """
+    low, high = max(0.3, scale_hint - SCALE_SEARCH_RANGE), scale_hint + SCALE_SEARCH_RANGE
+    coarse_scales = _frange(low, high, COARSE_STEP)
+    # 模板缩小一半后仍不小于 MIN_COARSE_TEMPLATE 像素时才在半分辨率图像上粗搜
+    factor = 2 if min(template.shape[:2]) * low / 2 >= MIN_COARSE_TEMPLATE else 1
+    coarse_image = cv2.pyrDown(image) if factor == 2 else image
+    score, scale, (cx, cy) = _search(coarse_image, template, [s / factor for s in coarse_scales])
+    scale, cx, cy = scale * factor, cx * factor, cy * factor
+
+    # 细搜索区域：粗命中点周围留出模板尺寸+若干像素余量
+    th, tw = template.shape[:2]
+    margin = int(max(th, tw) * (scale + COARSE_STEP)) + 8
+    x0, y0 = max(0, cx - margin), max(0, cy - margin)
+    x1, y1 = min(image.shape[1], cx + margin * 2), min(image.shape[0], cy + margin * 2)
+    fine_scales = _frange(max(0.3, scale - COARSE_STEP), scale + COARSE_STEP, FINE_STEP)
+    fine_score, fine_scale, (fx, fy) = _search(image[y0:y1, x0:x1], template, fine_scales)
+    if fine_score >= score:
+        return fine_score, fine_scale, (x0 + fx, y0 + fy)
+    return score, scale, (cx, cy)
+
+
+def _overshoot(value: float, low: float, high: float) -> float:
+    """value 超出 [low, high] 的量，范围内为0"""
+    if value < low:
+        return value - low
+    if value > high:
+        return value - high
+    return 0.0
+
+
+def discover_layout(client_rect: tuple[int, int, int, int], image, anchor_template) -> Layout | None:
+    """
+    根据窗口客户区截图求出布局
+
+    参数:
+        client_rect: tuple - 客户区屏幕坐标 (left, top, width, height)
+        image: np.ndarray - 客户区灰度截图
+        anchor_template: np.ndarray - 锚点灰度模板（哈夫币图标）
+
+    返回:
+        Layout 或 None: 未找到锚点时返回None
+    """
+    left, top, width, height = client_rect
+    scale_hint = min(width / REFERENCE_WIDTH, height / REFERENCE_HEIGHT)
+    score, scale, (ax, ay) = search_anchor(image, anchor_template, scale_hint)
+    if score < ANCHOR_THRESHOLD:
+        print(f"布局识别失败：锚点匹配度{score:.2f}过低")
+        return None
+
+    # 锚点模板很小，缩放比例分辨率有限；窗口尺寸估计值处匹配度相当时以窗口尺寸为准
+    th, tw = anchor_template.shape[:2]
+    margin = max(th, tw) + 4
+    x0, y0 = max(0, ax - margin), max(0, ay - margin)
+    hint_score, _, (hx, hy) = _search(image[y0:ay + margin * 2, x0:ax + margin * 2], anchor_template, [scale_hint])
+    if hint_score >= score - SCALE_HINT_TOLERANCE:
+        score, scale, (ax, ay) = hint_score, scale_hint, (x0 + hx, y0 + hy)
+
+    # 初始偏移：画面按缩放比例居中于客户区(宽高比与 16:9 不同时两侧或上下留黑边)；
+    # 锚点在标定范围内的位置随余额位数左右移动，只有落在范围之外时，横向与纵向各自用超出量修正偏移
+    offset_x = left + (width - REFERENCE_WIDTH * scale) / 2
+    offset_y = top + (height - REFERENCE_HEIGHT * scale) / 2
+    ref_x = (left + ax - offset_x) / scale
+    ref_y = (top + ay - offset_y) / scale
+    ref_left, ref_top = ANCHOR_REFERENCE_RECT[0], ANCHOR_REFERENCE_RECT[1]
+    ref_right = ANCHOR_REFERENCE_RECT[0] + ANCHOR_REFERENCE_RECT[2] - anchor_template.shape[1]
+    ref_bottom = ANCHOR_REFERENCE_RECT[1] + ANCHOR_REFERENCE_RECT[3] - anchor_template.shape[0]
+    offset_x += _overshoot(ref_x, ref_left, ref_right) * scale
+    offset_y += _overshoot(ref_y, ref_top, ref_bottom) * scale
+    layout = Layout(int(round(offset_x)), int(round(offset_y)), scale)
+    print(f"布局识别完成：偏移({layout.offset_x},{layout.offset_y}) 缩放{layout.scale:.2f} 锚点匹配度{score:.2f}")
+    return layout
+
+
+def load_cached(geometry: str | None) -> Layout | None:
+    """读取按窗口几何信息缓存的布局"""
+    if geometry is None:
+        return None
+    try:
+        with open(CACHE_PATH, encoding='utf-8') as f:
+            entry = json.load(f).get(geometry)
+    except (OSError, ValueError):
+        return None
+    return Layout(**entry) if entry else None
+
+
+def save_cached(geometry: str | None, layout: Layout) -> None:
+    """按窗口几何信息缓存布局"""
+    if geometry is None:
+        return
+    try:
+        with open(CACHE_PATH, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache[geometry] = asdict(layout)
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        tmp_path = CACHE_PATH + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError as e:
+        print(f"布局缓存写入失败: {e}")
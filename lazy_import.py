@@ -0,0 +1,53 @@
+"""
+延迟导入模块
+功能：首次访问属性时才真正导入模块，缩短脚本启动时间
+"""
+import importlib
+import threading
+
+_import_lock = threading.Lock()
+
+
+class LazyModule:
+    """
+    模块代理对象
+
+    用法：cv2 = lazy_module('cv2')，之后照常使用 cv2.matchTemplate(...)；
+    第一次访问属性时才导入 cv2，之后直接转发到已导入的模块。
+    """
+
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with _import_lock:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "已导入" if self.__dict__['_module'] is not None else "未导入"
+        return f"<LazyModule {self.__dict__['_name']} ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    """返回延迟导入的模块代理"""
+    return LazyModule(name)
+
+
+def preload(*modules: LazyModule) -> None:
+    """立即导入给定的延迟模块，用于预热阶段"""
+    for module in modules:
+        if isinstance(module, LazyModule):
+            module._load()
@@ -0,0 +1,107 @@
+"""
+监测线程生命周期模块
+功能：运行 / 挂起 / 停止 三种状态。暂停与刷新流程期间挂起监测线程，
+挂起的线程在条件变量上等待(不截图、不识别、不占用CPU与GIL)，恢复后立即继续下一帧
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+import metrics
+
+RUNNING = 'running'
+SUSPENDED = 'suspended'
+STOPPED = 'stopped'
+
+
+class Lifecycle:
+    """
+    监测线程的生命周期
+
+    各监测线程每帧开始前调用 wait_running()：运行态直接返回 True(不加锁)；
+    挂起态在条件变量上等待到恢复或停止；停止态返回 False，线程随即退出。
+
+    参数:
+        workers: int - 监测线程数，suspend() 等待全部线程停在等待点后返回
+    """
+
+    def __init__(self, workers: int = 0):
+        self.workers = workers
+        self.state = RUNNING
+        self.epoch = 0  # 每次恢复加1，监测线程据此丢弃挂起前的计数状态
+        self.suspends = 0
+        self.suspended_seconds = 0.0
+        self._suspended_at = 0.0
+        self._parked = 0
+        self._cond = threading.Condition()
+
+    @property
+    def running(self) -> bool:
+        return self.state == RUNNING
+
+    def wait_running(self) -> bool:
+        """
+        监测线程每帧开始前调用
+
+        返回:
+            bool: False 表示已停止，线程应退出
+        """
+        if self.state == RUNNING:
+            return True
+        with self._cond:
+            if self.state == SUSPENDED:
+                self._parked += 1
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: self.state != SUSPENDED)
+                self._parked -= 1
+            return self.state != STOPPED
+
+    def suspend(self, reason: str, wake=None, timeout: float = 0.5) -> bool:
+        """
+        挂起监测线程，等待各线程完成当前帧后返回
+
+        参数:
+            reason: str - 挂起原因，计入指标(pause/refresh)
+            wake: callable - 状态切换后调用，用于唤醒在其他条件上等待的线程
+            timeout: float - 等待各线程停下的最长时间(秒)
+
+        返回:
+            bool: 本次是否由运行态转为挂起态
+        """
+        with self._cond:
+            if self.state != RUNNING:
+                return False
+            self.state = SUSPENDED
+            self.suspends += 1
+            self._suspended_at = time.perf_counter()
+        metrics.monitor_suspends.inc(reason)
+        metrics.monitor_suspended.set(1)
+        if wake is not None:
+            wake()
+        with self._cond:
+            self._cond.wait_for(lambda: self._parked >= self.workers, timeout=timeout)
+        return True
+
+    def resume(self) -> bool:
+        """恢复监测线程，返回本次是否由挂起态转为运行态"""
+        with self._cond:
+            if self.state != SUSPENDED:
+                return False
+            self.suspended_seconds += time.perf_counter() - self._suspended_at
+            self.epoch += 1
+            self.state = RUNNING
+            self._cond.notify_all()
+        metrics.monitor_suspended.set(0)
+        return True
+
+    def stop(self) -> None:
+        with self._cond:
+            if self.state == SUSPENDED:
+                self.suspended_seconds += time.perf_counter() - self._suspended_at
+            self.state = STOPPED
+            self._cond.notify_all()
+        metrics.monitor_suspended.set(0)
+
+    def report(self) -> str:
+        return f"监测线程挂起{self.suspends}次，共{self.suspended_seconds:.1f}秒"
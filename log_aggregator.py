@@ -0,0 +1,177 @@
+"""
+日志聚合模块
+功能：合并重复的日志行，减少长时间运行时的日志量与写入次数
+    1. 连续重复：与上一行完全相同(模板与数值都相同)的行不再逐条输出，改为在重复结束时输出一行"重复N次"及时间跨度
+    2. 汇总：匹配指定关键字的高频行(如"不在范围内")不逐条输出，按模板(数字替换为占位)计数，
+       每隔 summary_interval 秒输出一行汇总，给出次数与各数值的范围
+    3. 立即输出：包含指定关键字的行(购买、错误等)从不合并，即使与上一行完全相同也逐条输出
+其余行立即输出；汇总行与立即输出的行都会结束正在计数的连续重复。
+"""
+from __future__ import annotations
+
+import datetime
+import re
+import threading
+import time
+
+# 日志行中的数值，按模板归并时替换为占位
+_NUMBER = re.compile(r'\d+')
+# 从不合并的日志关键字(购买与错误)
+DEFAULT_IMMEDIATE_PATTERNS = ('识别到价格', '购买', '失败', '错误', '异常', 'Traceback')
+
+
+def split_template(line: str) -> tuple[str, tuple[int, ...]]:
+    """将日志行拆分为模板与数值，如 "槽位1识别到价格50000" -> ("槽位{}识别到价格{}", (1, 50000))"""
+    values = tuple(int(v) for v in _NUMBER.findall(line))
+    return _NUMBER.sub('{}', line.replace('{', '{{').replace('}', '}}')), values
+
+
+def format_time(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts).strftime('%H:%M:%S.%f')[:-3]
+
+
+class _Summary:
+    """一个模板在当前汇总周期内的计数与各数值范围"""
+
+    def __init__(self, values: tuple[int, ...], ts: float):
+        self.count = 0
+        self.first_ts = ts
+        self.last_ts = ts
+        self.low = list(values)
+        self.high = list(values)
+
+    def add(self, values: tuple[int, ...], ts: float) -> None:
+        self.count += 1
+        self.last_ts = ts
+        for i, value in enumerate(values[:len(self.low)]):
+            self.low[i] = min(self.low[i], value)
+            self.high[i] = max(self.high[i], value)
+
+    def render(self, template: str) -> str:
+        ranges = [str(low) if low == high else f"{low}~{high}" for low, high in zip(self.low, self.high)]
+        try:
+            text = template.format(*ranges)
+        except (IndexError, ValueError):
+            text = template
+        return (f"[汇总] {text} ×{self.count}"
+                f"（{format_time(self.first_ts)} ~ {format_time(self.last_ts)}）")
+
+
+class LogAggregator:
+    """
+    日志聚合器，线程安全
+
+    参数:
+        emit: callable - 输出一行日志(不含换行)，由调用方加时间戳并写入
+        patterns: list - 需要汇总的关键字，日志行包含任一关键字即参与汇总
+        summary_interval: float - 汇总输出间隔(秒)
+        immediate_patterns: list - 从不合并的关键字，日志行包含任一关键字(且不参与汇总)时逐条立即输出
+    """
+
+    def __init__(self, emit, patterns: list[str] | None = None, summary_interval: float = 60,
+                 immediate_patterns: list[str] | None = None):
+        self.emit = emit
+        self.patterns = list(patterns or [])
+        self.summary_interval = summary_interval
+        self.immediate_patterns = list(DEFAULT_IMMEDIATE_PATTERNS if immediate_patterns is None
+                                       else immediate_patterns)
+        self._lock = threading.RLock()
+        self._last_line: str | None = None
+        self._repeats = 0
+        self._repeat_first = self._repeat_last = 0.0
+        self._summaries: dict[str, _Summary] = {}
+        self._last_summary = time.time()
+        self.lines_in = 0
+        self.lines_out = 0
+
+    def configure(self, patterns: list[str], summary_interval: float,
+                  immediate_patterns: list[str] | None = None) -> None:
+        with self._lock:
+            self.flush()
+            self.patterns = list(patterns)
+            self.summary_interval = summary_interval
+            if immediate_patterns is not None:
+                self.immediate_patterns = list(immediate_patterns)
+
+    def add(self, line: str) -> None:
+        """处理一行日志"""
+        now = time.time()
+        with self._lock:
+            self.lines_in += 1
+            if any(p in line for p in self.patterns):
+                template, values = split_template(line)
+                summary = self._summaries.get(template)
+                if summary is None:
+                    summary = self._summaries[template] = _Summary(values, now)
+                summary.add(values, now)
+                # 汇总行打断连续重复：之后再出现与之前相同的行时重新输出
+                self._flush_repeats()
+                self._last_line = None
+            elif any(p in line for p in self.immediate_patterns):
+                self._flush_repeats()
+                self._last_line = None
+                self._emit(line)
+            elif line == self._last_line:
+                if self._repeats == 0:
+                    self._repeat_first = now
+                self._repeats += 1
+                self._repeat_last = now
+            else:
+                self._flush_repeats()
+                self._last_line = line
+                self._emit(line)
+            if now - self._last_summary >= self.summary_interval:
+                self.flush_summaries(now)
+
+    def _emit(self, line: str) -> None:
+        self.lines_out += 1
+        self.emit(line)
+
+    def _flush_repeats(self) -> None:
+        if self._repeats:
+            self._emit(f"（上一条重复{self._repeats}次，{format_time(self._repeat_first)} ~ "
+                       f"{format_time(self._repeat_last)}）")
+            self._repeats = 0
+
+    def flush_summaries(self, now: float | None = None) -> None:
+        """输出并清空本周期的汇总"""
+        with self._lock:
+            self._last_summary = time.time() if now is None else now
+            if not self._summaries:
+                return
+            self._flush_repeats()
+            summaries, self._summaries = self._summaries, {}
+            for template, summary in summaries.items():
+                self._emit(summary.render(template))
+            # 汇总行之后再出现与汇总前相同的行时重新输出
+            self._last_line = None
+
+    def tick(self) -> None:
+        """定期调用：到达汇总间隔时输出汇总，日志较少时汇总也能按时出现"""
+        with self._lock:
+            if time.time() - self._last_summary >= self.summary_interval:
+                self.flush_summaries()
+
+    def flush(self) -> None:
+        """输出所有未输出的重复计数与汇总（退出前调用）"""
+        with self._lock:
+            self._flush_repeats()
+            self.flush_summaries()
+
+    def report(self) -> str:
+        return (f"日志聚合：共{self.lines_in}行，实际输出{self.lines_out}行"
+                f"(减少{1 - self.lines_out / max(self.lines_in, 1):.1%})")
+
+
+def _patterns(config, option: str, default: str) -> list[str]:
+    raw = config.get('log', option, fallback=default)
+    return [p.strip() for p in raw.splitlines() if p.strip()]
+
+
+def load_log_aggregation(config) -> tuple[list[str], float, list[str]] | None:
+    """从配置文件 [log] 读取 (汇总关键字, 汇总间隔, 立即输出关键字)，未启用时返回None"""
+    if not config.getboolean('log', 'aggregate', fallback=True):
+        return None
+    return (_patterns(config, 'summary_patterns', '不在范围内'),
+            config.getfloat('log', 'summary_interval', fallback=60),
+            _patterns(config, 'immediate_patterns', '\n'.join(DEFAULT_IMMEDIATE_PATTERNS)))
@@ -2,30 +2,60 @@
 三角洲买装备脚本
 功能：通过高频刷新交易行界面监控装备价格，截取低价装备购买
 """
-import mss
-import numpy as np
-import win32gui
-import win32process
-import psutil
-import win32con
-from PIL import ImageDraw
-import detect_money
-import detect_location
+import time
+
+# 进程启动时间，用于统计冷启动到首次决策的耗时
+PROCESS_START = time.perf_counter()
+
 import threading
 import queue
-import time
-import schedule
 import configparser
-import pyautogui
-import pytesseract
 import os
 import sys
 import datetime
-import keyboard
-from dataclasses import dataclass
-from mouse_keyboard_controller import MouseKeyboardController
+from dataclasses import dataclass, field, asdict
+from lazy_import import lazy_module, preload
+import detect_money
+import detect_location
+import metrics
+import layout
+import template_bundle
+import multi_client
+import capture_planner
+from mouse_keyboard_controller import MouseKeyboardController, RecordingBackend, create_backend
+from input_dispatcher import InputDispatcher, PRIORITY_PURCHASE, PRIORITY_NAVIGATION
+from watchlist import load_watchlist
+from refresh_policy import load_refresh_policy
+from resource_sampler import load_resource_sampler
+from roi_recorder import load_roi_recorder
+from price_stats import load_price_stats
+from sampling_profiler import load_profiler
+from coordinator import load_coordinator_client
+from scheduling import JitterStats, load_thread_policy, sleep_until
+from cascade import Cascade, Stage
+from control_server import load_control_server
+from lifecycle import Lifecycle
+from checkpoint import load_checkpointer, load_resumable
+from log_aggregator import LogAggregator, load_log_aggregation
+
+# 重量级依赖延迟到首次使用时导入
+np = lazy_module('numpy')
+cv2 = lazy_module('cv2')
+win32gui = lazy_module('win32gui')
+win32process = lazy_module('win32process')
+win32con = lazy_module('win32con')
+psutil = lazy_module('psutil')
+ImageDraw = lazy_module('PIL.ImageDraw')
+schedule = lazy_module('schedule')
+pyautogui = lazy_module('pyautogui')
+pytesseract = lazy_module('pytesseract')
+keyboard = lazy_module('keyboard')
 
 controller = MouseKeyboardController()
+# 所有输入经同一调度线程按优先级执行：购买 > 刷新/导航 > 连点
+dispatcher = InputDispatcher(controller)
+purchase_input = dispatcher.view(PRIORITY_PURCHASE)
+nav_input = dispatcher.view(PRIORITY_NAVIGATION)
 
 # 获取脚本所在目录
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -33,21 +63,28 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 config_path = os.path.join(BASE_DIR, 'config.ini')
 
 config = configparser.ConfigParser()
-# 显式指定 UTF-8 编码来读取文件
-with open(config_path, encoding='utf-8') as f:
-    config.read_file(f)
-
-# --- 配置参数 ---
-game_name = config['window']['game_window_name']  # 游戏窗口名称
-min_width = int(config['window']['min_width'])  # 最小窗口宽度
-min_height = int(config['window']['min_height'])  # 最小窗口高度
-expected_price_1 = int(config['limit']['expected_price_1']) # 价格下限
-expected_price_2 = int(config['limit']['expected_price_2'])  # 价格上限
-x = int(config['click_location']['x'])  # 收藏物品X坐标
-y = int(config['click_location']['y'])  # 收藏物品Y坐标
-execution_time = config['schedule']['execution_time']  # 脚本执行时间
-execution_time_single = int(config['schedule']['execution_time_single'])  # 单次执行时长(秒)
-duration = int(config['schedule']['duration'])  # 总运行时长(秒)
+
+# --- 配置参数（由 load_config 填充） ---
+game_name = None  # 游戏窗口名称
+min_width = min_height = 0  # 最小窗口宽度/高度
+expected_price_1 = expected_price_2 = 0  # 价格下限/上限
+x = y = 0  # 收藏物品X/Y坐标
+execution_time = None  # 脚本执行时间
+execution_time_single = 0  # 单次执行时长(秒)
+duration = 0  # 总运行时长(秒)
+pre_arm_seconds = 15  # 提前开始准备的时间(秒)，0表示到点后才开始准备
+watchlist = None  # 多槽位监控列表
+refresh_policy = None  # 自适应刷新策略
+profiler = None  # 采样分析器
+profiler_hotkey = ''  # 采样分析器热键
+profile_on_run = False  # 每次任务开始时自动启动采样分析
+multi_client_enabled = False  # 多客户端模式
+coordinator_client = None  # 多机协调服务客户端
+coordinator_heartbeat = 5.0  # 向协调服务发送心跳的间隔(秒)
+control_server = None  # 本机运行时控制接口
+thread_policy = None  # 调度策略：线程绑核、优先级与混合定时器
+monitor_mode = 'cascade'  # 界面状态监测方式：cascade 单线程检测级联，parallel 三个监测线程并行
+cascade_reorder_every = 100  # 检测级联每多少帧按耗时/命中率重新排序
 
 # --- 控制标志 ---
 paused = False  # 控制脚本暂停/恢复
@@ -55,6 +92,12 @@ should_exit = False  # 标记主程序的运行与结束
 thread_pause_click = False  # 控制连点线程的暂停
 thread_running = True  # 控制主程序运行与结束时子线程的运行与结束
 game_window_hwnd = None  # 游戏主窗口句柄
+game_window_pid = None  # 游戏主窗口所属进程PID
+probe_recorders = {}  # 探测点名称 -> 像素颜色录制器，仅在启用录制时非空
+CLICK_INTERVAL = 0.2  # 连点间隔(秒)
+click_cadence = JitterStats(CLICK_INTERVAL)  # 连点节奏统计，每次任务重新创建
+decision_latency = JitterStats()  # 截图到决策完成的延迟统计，每次任务重新创建
+session_start = None  # 本次任务开始时间，任务运行之外为None
 
 # --- 线程通信 ---
 color_check_result = False  # 线程安全变量，存储颜色检测结果
@@ -63,6 +106,63 @@ color_check_lock = threading.Lock()  # 颜色检测结果的线程锁
 # --- 统计数据 ---
 start_time_single = time.time()  # 计时器初始值
 consumption = initial_money = end_money = 0  # 消耗的哈夫币统计
+duration_session = 0  # 当前会话的总运行时长(秒)，写入会话快照
+
+
+def load_config(path=config_path):
+    """
+    读取配置文件并填充全局配置参数
+
+    参数:
+        path: str - 配置文件路径
+    """
+    global game_name, min_width, min_height, expected_price_1, expected_price_2, x, y, \
+        execution_time, execution_time_single, duration, watchlist, refresh_policy, \
+        profiler, profiler_hotkey, profile_on_run, multi_client_enabled, coordinator_client, coordinator_heartbeat, \
+        thread_policy, monitor_mode, cascade_reorder_every, pre_arm_seconds
+
+    # 显式指定 UTF-8 编码来读取文件
+    with open(path, encoding='utf-8') as f:
+        config.read_file(f)
+
+    game_name = config['window']['game_window_name']  # 游戏窗口名称
+    min_width = int(config['window']['min_width'])  # 最小窗口宽度
+    min_height = int(config['window']['min_height'])  # 最小窗口高度
+    expected_price_1 = int(config['limit']['expected_price_1']) # 价格下限
+    expected_price_2 = int(config['limit']['expected_price_2'])  # 价格上限
+    x = int(config['click_location']['x'])  # 收藏物品X坐标
+    y = int(config['click_location']['y'])  # 收藏物品Y坐标
+    execution_time = config['schedule']['execution_time']  # 脚本执行时间
+    execution_time_single = int(config['schedule']['execution_time_single'])  # 单次执行时长(秒)
+    duration = int(config['schedule']['duration'])  # 总运行时长(秒)
+    # 提前多少秒完成窗口、布局、资金识别与监测预热，到 execution_time 时精确开始监测，0表示到点才开始准备
+    pre_arm_seconds = config.getfloat('schedule', 'pre_arm_seconds', fallback=15)
+    # 多槽位监控列表，未配置 [watchlist] 时退回 [click_location] + [limit] 单槽位
+    watchlist = load_watchlist(config, x, y, expected_price_1, expected_price_2)
+    # 自适应刷新策略，execution_time_single 作为刷新间隔上限
+    refresh_policy = load_refresh_policy(config)
+    # 采样分析器：热键或配置触发，运行中定位耗时函数
+    profiler, profiler_hotkey, profile_on_run = load_profiler(config)
+    # 多客户端模式：同时监控所有符合条件的游戏窗口
+    multi_client_enabled = config.getboolean('multi', 'enabled', fallback=False)
+    # 多机协调：由协调服务分配槽位与价格区间，并对购买意图去重
+    coordinator_client = load_coordinator_client(config)
+    coordinator_heartbeat = config.getfloat('coordinator', 'heartbeat_interval', fallback=5.0)
+    # 调度策略：监测线程、输入调度线程、连点线程绑核与优先级，连点使用混合定时器
+    thread_policy = load_thread_policy(config)
+    dispatcher.thread_init = thread_policy.apply
+    # 界面状态监测方式：默认检测级联，先检测单像素探测点，均未命中才识别价格数字
+    monitor_mode = config.get('monitor', 'mode', fallback='cascade').strip()
+    if monitor_mode not in ('cascade', 'parallel'):
+        raise ValueError(f"未知的监测方式 [monitor] mode = {monitor_mode}，可选 cascade、parallel")
+    cascade_reorder_every = config.getint('monitor', 'reorder_every', fallback=100)
+    # 截图计划：按本机实测截图开销合并各探测点与价格数字区域的截图
+    capture_planner.configure(config)
+    # 输入后端：默认 Windows 使用 SendInput，可配置为只记录不执行的 recording
+    backend_name = config.get('input', 'backend', fallback='').strip() or None
+    record_path = config.get('input', 'record_path', fallback='').strip() or None
+    if backend_name is not None or record_path is not None:
+        controller.backend = create_backend(backend_name, record_path)
 
 
 class Tee:
@@ -95,6 +195,42 @@ class Tee:
         self.original_excepthook = sys.excepthook
         sys.excepthook = self.exception_handler
 
+        # 日志聚合器，启用后按整行合并重复日志（见 enable_aggregation）
+        self.aggregator = None
+        self._pending = threading.local()  # 各线程尚未写完的半行
+        self._lock = threading.Lock()
+
+    def enable_aggregation(self, patterns, summary_interval, immediate_patterns=None):
+        """
+        启用日志聚合：连续重复的行合并为一行计数，匹配关键字的高频行按周期汇总
+
+        参数:
+            patterns: list - 需要周期汇总的关键字
+            summary_interval: float - 汇总间隔(秒)
+            immediate_patterns: list - 从不合并、逐条立即输出的关键字(购买与错误)
+        """
+        if self.aggregator is not None:
+            self.aggregator.configure(patterns, summary_interval, immediate_patterns)
+            return
+        self.aggregator = LogAggregator(self._write_line, patterns, summary_interval, immediate_patterns)
+
+        # 日志较少时也按时输出汇总
+        def tick():
+            while self.aggregator is not None:
+                time.sleep(1)
+                aggregator = self.aggregator
+                if aggregator is not None:
+                    aggregator.tick()
+
+        threading.Thread(target=tick, name='log-aggregator', daemon=True).start()
+
+    def close_aggregation(self):
+        """输出未输出的重复计数与汇总，并停用聚合（退出前调用）"""
+        aggregator, self.aggregator = self.aggregator, None
+        if aggregator is not None:
+            aggregator.flush()
+            self._write_line(aggregator.report())
+
     def write(self, message):
         """
         写入消息到标准输出和日志文件
@@ -102,14 +238,32 @@ class Tee:
         参数:
             message: str - 要写入的消息
         """
+        aggregator = self.aggregator
+        if aggregator is None:
+            self._write_raw(message)
+            return
+        # print 会分多次写入内容与换行，按线程拼成整行后再交给聚合器
+        text = getattr(self._pending, 'text', '') + message
+        *lines, self._pending.text = text.split('\n')
+        for line in lines:
+            if line.strip():
+                aggregator.add(line)
+            else:
+                self._write_raw(line + '\n')
+
+    def _write_line(self, line):
+        self._write_raw(f"{line}\n")
+
+    def _write_raw(self, message):
         # 获取当前时间戳，精确到毫秒
         timestamp = f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] "
         # 在每条日志前添加时间戳
         if message.strip():  # 仅对非空行添加时间戳
             message = f"{timestamp}{message}"  # 确保时间戳格式完整
-        self.stdout.write(message)  # 在 CMD 窗口打印
-        self.file.write(message)  # 同时写入文件
-        self.flush()  # 确保日志信息立即写入文件
+        with self._lock:
+            self.stdout.write(message)  # 在 CMD 窗口打印
+            self.file.write(message)  # 同时写入文件
+            self.flush()  # 确保日志信息立即写入文件
 
     def flush(self):
         """确保日志即时写入文件和标准输出"""
@@ -141,17 +295,21 @@ class Tee:
 class PurchaseEvent:
     kind: str              # 'six_digits' | 'no_items' | 'seven_sep'
     data: int | None = None
+    ts: float = field(default_factory=time.perf_counter)  # 截图开始的时间，监测线程在截图前取得并传入
 
 class PurchaseStateMonitor:
     """
     并行监测三种状态，任一命中产生事件；随后进入失效态，
     待检测到“三种状态均不命中”连续 N 次后再重武装。
+    暂停与刷新流程期间通过 suspend()/resume() 挂起监测线程，恢复时重置为失效态，
+    由恢复后的首个清空帧重新武装，不会投递挂起前画面产生的事件。
     """
-    def __init__(self, poll_interval: float = 0, rearm_clear_consecutive: int = 1):
+    def __init__(self, poll_interval: float = 0, rearm_clear_consecutive: int = 1, thread_init=None):
         self.poll_interval = poll_interval
         self.rearm_clear_consecutive = rearm_clear_consecutive
+        self.thread_init = thread_init  # 监测线程启动时调用 thread_init('capture')，用于绑核与设置优先级
 
-        self._stop = threading.Event()
+        self.lifecycle = Lifecycle()
         self._armed = True
         self._armed_lock = threading.Lock()
 
@@ -160,22 +318,60 @@ class PurchaseStateMonitor:
 
         self._q: "queue.Queue[PurchaseEvent]" = queue.Queue(maxsize=1)
         self._threads: list[threading.Thread] = []
+        # 识别帧期间持有：识别先验与级联统计由监测线程更新，会话检查点在两帧之间读取，快照不会拆开一帧的更新
+        self._state_lock = threading.Lock()
 
     def start(self):
         self._threads = [
-            threading.Thread(target=self._watch_six_digits, daemon=True),
-            threading.Thread(target=self._watch_no_items, daemon=True),
-            threading.Thread(target=self._watch_seven_sep, daemon=True),
-            threading.Thread(target=self._watch_rearm_all_clear, daemon=True),
+            threading.Thread(target=self._run, args=(self._watch_six_digits,), name='watch_six_digits', daemon=True),
+            threading.Thread(target=self._run, args=(self._watch_no_items,), name='watch_no_items', daemon=True),
+            threading.Thread(target=self._run, args=(self._watch_seven_sep,), name='watch_seven_sep', daemon=True),
+            threading.Thread(target=self._run, args=(self._watch_rearm_all_clear,), name='watch_rearm', daemon=True),
         ]
+        self.lifecycle.workers = len(self._threads)
         for t in self._threads:
             t.start()
 
     def stop(self):
-        self._stop.set()
+        self.lifecycle.stop()
         for t in self._threads:
             t.join(timeout=1.0)
 
+    def suspend(self, reason: str) -> None:
+        """挂起监测线程（暂停、刷新期间），各线程完成当前帧后在条件变量上等待"""
+        self.lifecycle.suspend(reason)
+
+    def resume(self) -> None:
+        """
+        恢复监测线程：丢弃挂起期间的事件，进入失效态并视各状态为“命中”，
+        待恢复后各监测线程截取新帧、均不命中时重新武装
+        """
+        with self._armed_lock:
+            while True:
+                try:
+                    self._q.get_nowait()
+                except queue.Empty:
+                    break
+                metrics.queue_drops.inc('cleared')
+            self._armed = False
+        with self._present_lock:
+            self._present = {key: True for key in self._present}
+        metrics.armed.set(0)
+        self.lifecycle.resume()
+
+    def report(self) -> str:
+        return self.lifecycle.report()
+
+    def state(self) -> dict:
+        """监测线程维护的识别状态(数字识别先验)，供会话检查点保存"""
+        with self._state_lock:
+            return {'priors': detect_money.priors_state(), 'cascade': None}
+
+    def _run(self, watch):
+        if self.thread_init is not None:
+            self.thread_init('capture')
+        watch()
+
     def get_event(self, timeout: float | None = None) -> PurchaseEvent:
         return self._q.get(timeout=timeout)
 
@@ -191,12 +387,14 @@ class PurchaseStateMonitor:
                     self._q.get_nowait()
                 except queue.Empty:
                     break
+                metrics.queue_drops.inc('cleared')
     def _emit_if_armed(self, evt: PurchaseEvent) -> bool:
         """
         若当前处于武装态，投递事件并转入失效态；返回 True 表示成功投递（可打印一次性日志）。
         """
         with self._armed_lock:
-            if not self._armed:
+            # 挂起期间完成的帧属于暂停/刷新前的画面，不投递
+            if not self._armed or not self.lifecycle.running:
                 return False
             # 清理可能残留的旧事件，确保只保留最新命中的
             while not self._q.empty():
@@ -204,41 +402,57 @@ class PurchaseStateMonitor:
                     self._q.get_nowait()
                 except queue.Empty:
                     break
+                metrics.queue_drops.inc('superseded')
             self._q.put(evt)
             self._armed = False
-            return True
+        metrics.detections.inc(evt.kind)
+        metrics.last_detection.set(time.time(), evt.kind)
+        metrics.armed.set(0)
+        return True
 
     def _watch_six_digits(self):
-        while not self._stop.is_set():
-            val = detect_money.main()
+        while self.lifecycle.wait_running():
+            captured = time.perf_counter()
+            with self._state_lock, metrics.timed(metrics.watcher_seconds, 'six_digits'):
+                val = detect_money.main()
+            metrics.frames_grabbed.inc('six_digits')
             hit = isinstance(val, int) and 100000 <= val <= 999999
             with self._present_lock:
                 self._present['six'] = hit
             if hit:
-                self._emit_if_armed(PurchaseEvent('six_digits', val))
+                self._emit_if_armed(PurchaseEvent('six_digits', val, ts=captured))
             time.sleep(self.poll_interval)
 
     def _watch_no_items(self):
-        while not self._stop.is_set():
-            hit = is_color_similar(1630, 889, (75, 79, 82), 10)
+        while self.lifecycle.wait_running():
+            captured = time.perf_counter()
+            with metrics.timed(metrics.watcher_seconds, 'no_items'):
+                hit = check_probe('no_items')
+            metrics.frames_grabbed.inc('no_items')
             with self._present_lock:
                 self._present['no'] = hit
             if hit:
-                self._emit_if_armed(PurchaseEvent('no_items', None))
+                self._emit_if_armed(PurchaseEvent('no_items', None, ts=captured))
             time.sleep(self.poll_interval)
 
     def _watch_seven_sep(self):
-        while not self._stop.is_set():
-            hit = is_color_similar(313, 193, (179, 181, 183), 10)
+        while self.lifecycle.wait_running():
+            captured = time.perf_counter()
+            with metrics.timed(metrics.watcher_seconds, 'seven_sep'):
+                hit = check_probe('seven_sep')
+            metrics.frames_grabbed.inc('seven_sep')
             with self._present_lock:
                 self._present['seven'] = hit
             if hit:
-                self._emit_if_armed(PurchaseEvent('seven_sep', None))
+                self._emit_if_armed(PurchaseEvent('seven_sep', None, ts=captured))
             time.sleep(self.poll_interval)
 
     def _watch_rearm_all_clear(self):
         clear_cnt = 0
-        while not self._stop.is_set():
+        epoch = self.lifecycle.epoch
+        while self.lifecycle.wait_running():
+            if epoch != self.lifecycle.epoch:
+                epoch, clear_cnt = self.lifecycle.epoch, 0
             with self._armed_lock:
                 armed = self._armed
             if armed:
@@ -254,12 +468,78 @@ class PurchaseStateMonitor:
                 if clear_cnt >= self.rearm_clear_consecutive:
                     with self._armed_lock:
                         self._armed = True
+                    metrics.rearms.inc()
+                    metrics.armed.set(1)
                     clear_cnt = 0
             else:
                 clear_cnt = 0
             time.sleep(self.poll_interval)
 
 
+class CascadeStateMonitor(PurchaseStateMonitor):
+    """
+    单线程检测级联：每帧先检测开销最小的单像素探测点(暂无/七位分隔符)，
+    两者均未命中时才识别价格数字；探测点之间按实测耗时与命中率动态排序。
+    武装/失效/重武装逻辑与 PurchaseStateMonitor 相同，三种状态均未命中的帧计为清空帧。
+    """
+    def __init__(self, poll_interval: float = 0, rearm_clear_consecutive: int = 1, thread_init=None,
+                 reorder_every: int = 100):
+        super().__init__(poll_interval, rearm_clear_consecutive, thread_init)
+        self._frame = None  # 本帧的截图计划帧，各阶段从中读取自己的区域
+        self.cascade = Cascade([
+            Stage('no_items', lambda: (check_probe('no_items', self._frame), None)),
+            Stage('seven_sep', lambda: (check_probe('seven_sep', self._frame), None)),
+            Stage('six_digits', self._read_price, last=True),
+        ], reorder_every)
+
+    def _read_price(self):
+        val = detect_money.main(self._frame)
+        return isinstance(val, int) and 100000 <= val <= 999999, val
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._run, args=(self._watch_cascade,),
+                                          name='watch_cascade', daemon=True)]
+        self.lifecycle.workers = len(self._threads)
+        for t in self._threads:
+            t.start()
+
+    def _watch_cascade(self):
+        clear_cnt = 0
+        epoch = self.lifecycle.epoch
+        while self.lifecycle.wait_running():
+            if epoch != self.lifecycle.epoch:
+                epoch, clear_cnt = self.lifecycle.epoch, 0
+            # 按截图计划开始本帧：各矩形在首个读取其中区域的阶段截取，探测点命中时不截取价格数字所在矩形
+            captured = time.perf_counter()
+            with self._state_lock:
+                self._frame = capture_planner.grab('monitor')
+                kind, data = self.cascade.evaluate()
+            metrics.frames_grabbed.inc('cascade')
+            if kind is not None:
+                clear_cnt = 0
+                self._emit_if_armed(PurchaseEvent(kind, data, ts=captured))
+            else:
+                with self._armed_lock:
+                    armed = self._armed
+                if not armed:
+                    clear_cnt += 1
+                    if clear_cnt >= self.rearm_clear_consecutive:
+                        with self._armed_lock:
+                            self._armed = True
+                        metrics.rearms.inc()
+                        metrics.armed.set(1)
+                        clear_cnt = 0
+            time.sleep(self.poll_interval)
+
+    def report(self) -> str:
+        return f"{self.cascade.report()}\n{super().report()}"
+
+    def state(self) -> dict:
+        """识别先验与检测级联各阶段统计，供会话检查点保存"""
+        with self._state_lock:
+            return {'priors': detect_money.priors_state(), 'cascade': self.cascade.state()}
+
+
 def take_screenshot(price):
     """
     截取当前屏幕并保存，包含鼠标指针位置
@@ -340,21 +620,13 @@ def get_window_normal_size(hwnd):
         return width, height
 
 
-def find_game_window():
+def enumerate_game_windows():
     """
-    查找游戏窗口，通过尺寸区分游戏本体和启动器
+    枚举标题包含游戏名称的窗口
 
     返回:
-        int: 游戏窗口句柄，若未找到则返回0
-
-    功能:
-        1. 枚举所有窗口，筛选出标题包含游戏名称的窗口
-        2. 获取这些窗口的尺寸和进程信息
-        3. 根据最小尺寸要求筛选出符合条件的窗口
-        4. 选择尺寸最大的窗口作为游戏主窗口
+        tuple: (符合最小尺寸要求的窗口列表(按尺寸降序), 全部匹配的窗口列表)
     """
-    global game_window_hwnd
-
     windows = []
 
     def callback(hwnd, extra):
@@ -364,8 +636,8 @@ def find_game_window():
                 # 获取窗口正常尺寸（即使最小化）
                 width, height = get_window_normal_size(hwnd)
                 # 获取进程信息
+                pid = win32process.GetWindowThreadProcessId(hwnd)[1]
                 try:
-                    pid = win32process.GetWindowThreadProcessId(hwnd)[1]
                     process = psutil.Process(pid)
                     exe_path = process.exe()
                     proc_name = process.name()
@@ -379,6 +651,7 @@ def find_game_window():
                     "width": width,
                     "height": height,
                     "size": width * height,
+                    "pid": pid,
                     "exe_path": exe_path,
                     "process": proc_name
                 })
@@ -387,11 +660,31 @@ def find_game_window():
 
     # 按窗口尺寸排序，筛选出符合最小尺寸条件的窗口
     suitable_windows = [w for w in windows if w["width"] >= min_width and w["height"] >= min_height]
+    suitable_windows.sort(key=lambda w: w["size"], reverse=True)
+    return suitable_windows, windows
+
+
+def find_game_window():
+    """
+    查找游戏窗口，通过尺寸区分游戏本体和启动器
+
+    返回:
+        int: 游戏窗口句柄，若未找到则返回0
+
+    功能:
+        1. 枚举所有窗口，筛选出标题包含游戏名称的窗口
+        2. 获取这些窗口的尺寸和进程信息
+        3. 根据最小尺寸要求筛选出符合条件的窗口
+        4. 选择尺寸最大的窗口作为游戏主窗口
+    """
+    global game_window_hwnd, game_window_pid
+
+    suitable_windows, windows = enumerate_game_windows()
 
     if suitable_windows:
-        # 按尺寸降序排序，选择最大的窗口
-        suitable_windows.sort(key=lambda w: w["size"], reverse=True)
+        # 选择尺寸最大的窗口
         game_window_hwnd = suitable_windows[0]["hwnd"]
+        game_window_pid = suitable_windows[0]["pid"]
         print(f"已找到游戏窗口: '{suitable_windows[0]['title']}'")
         print(f"窗口大小: {suitable_windows[0]['width']}x{suitable_windows[0]['height']}")
         print(f"进程: {suitable_windows[0]['process']} ({suitable_windows[0]['exe_path']})")
@@ -406,6 +699,40 @@ def find_game_window():
         return 0
 
 
+def find_game_windows():
+    """
+    多客户端模式：查找所有符合条件的游戏窗口
+
+    返回:
+        list: 窗口信息列表，按窗口位置(从上到下、从左到右)排序，编号稳定
+    """
+    suitable_windows, windows = enumerate_game_windows()
+    result = []
+    for w in suitable_windows:
+        try:
+            w["rect"] = win32gui.GetWindowRect(w["hwnd"])
+        except Exception as e:
+            print(f"获取窗口位置失败，跳过 '{w['title']}': {e}")
+            continue
+        result.append(w)
+    result.sort(key=lambda w: (w["rect"][1], w["rect"][0]))
+    for i, w in enumerate(result):
+        print(f"客户端{i + 1}: '{w['title']}' ({w['width']}x{w['height']}) 位置{w['rect'][:2]} 进程PID {w['pid']}")
+    if not result:
+        print(f"未找到符合条件的'{game_name}'窗口")
+    return result
+
+
+def activate_window(hwnd):
+    """将窗口切换到前台，使按键发送到该窗口"""
+    try:
+        win32gui.SetForegroundWindow(hwnd)
+        return True
+    except Exception as e:
+        print(f"切换前台窗口失败: {e}")
+        return False
+
+
 def set_window_topmost(hwnd):
     """
     设置窗口置顶，如果窗口最小化则先恢复
@@ -488,8 +815,80 @@ def toggle_pause():
             set_window_topmost(game_window_hwnd)
 
 
-# 监听快捷键 Ctrl+P
-keyboard.add_hotkey('ctrl+p', toggle_pause)
+def warm_up():
+    """
+    预热阶段，在 execution_time 之前执行
+
+    功能:
+        1. 导入延迟加载的依赖
+        2. 加载模板包，执行几次完整的截图+识别，初始化 OpenCV 与截图实例
+    """
+    started = time.perf_counter()
+    preload(np, cv2, win32gui, win32process, win32con, psutil, pyautogui, pytesseract)
+    detect_money.warm_up()
+    detect_location.get_template()
+    is_color_similar(0, 0, (0, 0, 0))
+    # 登记各分组的截图区域并测量本机截图开销，截图计划在首次使用时按布局生成
+    register_capture_regions()
+    print(capture_planner.calibrate().describe())
+    print(f"预热完成，耗时{time.perf_counter() - started:.2f}秒")
+
+
+def register_capture_regions():
+    """
+    向截图计划登记区域(标定坐标)：
+    monitor 为检测级联每帧读取的两个探测点与价格数字区域，refresh 为刷新流程每轮判断界面状态的探测点
+    """
+    bundle = detect_money.get_bundle()
+    for name in template_bundle.PROBES:
+        capture_planner.register('monitor', name, *bundle.probe(name)['point'])
+    top, left, width, height = template_bundle.DIGIT_ROI
+    capture_planner.register('monitor', 'digits', left, top, width, height)
+    for point in REFRESH_PROBES:
+        capture_planner.register('refresh', point, *point)
+
+
+def window_geometry(hwnd):
+    """
+    返回窗口几何信息（窗口矩形与屏幕分辨率），作为哈夫币位置缓存的键
+
+    参数:
+        hwnd: int - 窗口句柄
+
+    返回:
+        str 或 None: 获取失败返回None（不使用缓存）
+    """
+    if not hwnd:
+        return None
+    try:
+        left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+        screen_width, screen_height = pyautogui.size()
+    except Exception as e:
+        print(f"获取窗口几何信息失败: {e}")
+        return None
+    return f"{left},{top},{right},{bottom}@{screen_width}x{screen_height}"
+
+
+def read_balance(hwnd=None):
+    """
+    读取当前哈夫币数量，可在会话中途调用
+
+    优先使用按窗口几何信息缓存且复核通过的位置；缓存区域识别失败时删除缓存并完整检测一次。
+
+    参数:
+        hwnd: int - 窗口句柄，默认使用游戏主窗口
+
+    返回:
+        int 或 None: 识别到的哈夫币数量，识别失败返回None
+    """
+    geometry = window_geometry(hwnd or game_window_hwnd)
+    location, region, from_cache = detect_location.locate(geometry)
+    money = view_money(location, region)
+    if money is None and from_cache:
+        detect_location.invalidate(geometry)
+        location, region, _ = detect_location.locate(geometry)
+        money = view_money(location, region)
+    return money
 
 
 def view_money(location, region):
@@ -524,24 +923,128 @@ def view_money(location, region):
         return None
 
 
-def is_color_similar(a, b, target_color, threshold=30):
+def screen_point(x, y):
+    """标定坐标(1920x1080)按当前布局换算为屏幕坐标"""
+    return layout.current().point(x, y)
+
+
+def screen_length(value):
+    """标定分辨率下的长度/相对位移按当前布局换算"""
+    return layout.current().length(value)
+
+
+def apply_layout(hwnd):
+    """
+    识别并应用游戏窗口的界面布局（偏移与缩放比例）
+
+    参数:
+        hwnd: int - 窗口句柄
+    """
+    layout.set_current(resolve_layout(hwnd))
+
+
+def resolve_layout(hwnd):
+    """
+    识别游戏窗口的界面布局（偏移与缩放比例）
+
+    参数:
+        hwnd: int - 窗口句柄
+
+    返回:
+        layout.Layout: 窗口布局
+
+    功能:
+        1. 优先使用按窗口几何信息缓存的布局
+        2. 客户区恰为 1920x1080 且位于屏幕原点时直接使用标定布局
+        3. 否则截取整个客户区，由粗到细搜索哈夫币图标锚点，求出偏移与缩放比例
+    """
+    if not hwnd or not config.getboolean('window', 'auto_layout', fallback=True):
+        return layout.Layout()
+
+    geometry = window_geometry(hwnd)
+    cached = layout.load_cached(geometry)
+    if cached is not None:
+        metrics.cache_hits.inc('layout')
+        print(f"使用缓存布局：偏移({cached.offset_x},{cached.offset_y}) 缩放{cached.scale:.2f}")
+        return cached
+    metrics.cache_misses.inc('layout')
+
+    try:
+        left, top = win32gui.ClientToScreen(hwnd, (0, 0))
+        _, _, width, height = win32gui.GetClientRect(hwnd)
+    except Exception as e:
+        print(f"获取窗口客户区失败，使用标定布局: {e}")
+        return layout.Layout()
+
+    if (left, top, width, height) == (0, 0, layout.REFERENCE_WIDTH, layout.REFERENCE_HEIGHT):
+        found = layout.Layout()
+    else:
+        region = {"top": top, "left": left, "width": width, "height": height}
+        image = np.array(detect_money.get_sct().grab(region))[:, :, :3]
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        anchor = cv2.cvtColor(detect_location.get_template(), cv2.COLOR_BGR2GRAY)
+        found = layout.discover_layout((left, top, width, height), image, anchor)
+        if found is None:
+            # 未找到锚点时仅按客户区位置与尺寸估计
+            scale = min(width / layout.REFERENCE_WIDTH, height / layout.REFERENCE_HEIGHT)
+            print(f"未找到锚点，按客户区估计布局：偏移({left},{top}) 缩放{scale:.2f}")
+            return layout.Layout(left, top, scale)
+
+    layout.save_cached(geometry, found)
+    return found
+
+
+# 刷新流程每轮判断界面状态的探测点(标定坐标)，登记到截图计划的 refresh 分组
+REFRESH_PROBES = ((1236, 185), (180, 106), (238, 1060), (1656, 1041), (104, 330), (104, 540))
+
+
+def read_pixel(a, b):
     """
-    使用 mss 截取 1x1 区域获取像素颜色
-    读取失败返回 False。
+    使用 mss 截取 1x1 区域获取像素颜色(RGB)
+    读取失败返回 None。
     """
     try:
-        with mss.mss() as sct:
-            region = {"top": b, "left": a, "width": 1, "height": 1}
-            img = np.array(sct.grab(region))  # BGRA
-            bgr = img[0, 0, :3]
-            pixel_color = (int(bgr[2]), int(bgr[1]), int(bgr[0]))  # 转 RGB
+        a, b = screen_point(a, b)  # 标定坐标换算为屏幕坐标
+        region = {"top": b, "left": a, "width": 1, "height": 1}
+        img = np.array(detect_money.get_sct().grab(region))  # BGRA，复用当前线程的截图实例
+        bgr = img[0, 0, :3]
+        return int(bgr[2]), int(bgr[1]), int(bgr[0])  # 转 RGB
     except Exception:
-        return False
+        return None
 
+
+def color_distance(pixel_color, target_color):
     dr = pixel_color[0] - target_color[0]
     dg = pixel_color[1] - target_color[1]
     db = pixel_color[2] - target_color[2]
-    return (dr * dr + dg * dg + db * db) ** 0.5 < threshold
+    return (dr * dr + dg * dg + db * db) ** 0.5
+
+
+def is_color_similar(a, b, target_color, threshold=30, frame=None):
+    """
+    判断像素颜色与目标颜色的距离是否小于阈值
+    frame 为截图计划帧且登记了该点时从帧中读取，否则单独截取1x1区域；读取失败返回 False。
+    """
+    pixel_color = frame.pixel((a, b)) if frame is not None and (a, b) in frame else read_pixel(a, b)
+    if pixel_color is None:
+        return False
+    return color_distance(pixel_color, target_color) < threshold
+
+
+def check_probe(name, frame=None):
+    """
+    按模板包中记录的探测点参数(坐标、目标颜色、阈值)检测像素颜色，
+    启用录制时同时记录像素颜色，供 calibrate.py 校准阈值；
+    frame 为截图计划帧且登记了该探测点时从帧中读取
+    """
+    probe = detect_money.get_bundle().probe(name)
+    pixel_color = frame.pixel(name) if frame is not None and name in frame else read_pixel(*probe['point'])
+    if pixel_color is None:
+        return False
+    recorder = probe_recorders.get(name)
+    if recorder is not None:
+        recorder.write(np.array(pixel_color, dtype=np.uint8))
+    return color_distance(pixel_color, probe['color']) < probe['threshold']
 
 
 def check_chi(region, content):
@@ -555,8 +1058,8 @@ def check_chi(region, content):
     返回:
         bool: 匹配成功返回True，否则返回False
     """
-    # 截取指定区域
-    screenshot = pyautogui.screenshot(region=region)
+    # 截取指定区域（标定坐标换算为屏幕坐标）
+    screenshot = pyautogui.screenshot(region=layout.current().rect(*region))
 
     # 使用中文简体模型进行OCR识别
     check_result = pytesseract.image_to_string(screenshot, config='--psm 6', lang='chi_sim')
@@ -571,104 +1074,224 @@ def check_chi(region, content):
         return False
 
 
-def refresh_operation():
+def run_refresh_flow():
+    """
+    模式切换刷新流程：处理各种可能的界面状态，循环直到回到交易行界面
+
+    坐标按当前布局换算；调用方负责暂停连点并持有输入调度的独占区
+    """
+    # flag用于标记是否已经从全面战场切换回烽火地带模式
+    flag = False
+
+    # 处理各种可能的界面状态，循环直到成功回到交易行界面
+    while True:
+        time.sleep(0.5)
+        # 本轮各探测点按截图计划读取同一时刻的画面
+        frame = capture_planner.grab('refresh')
+        if check_chi((814, 477, 19, 21), '为'):
+            # 识别到"禁止使用市场..."界面提示，按ESC关闭
+            nav_input.key_press('esc')
+
+        elif is_color_similar(1236, 185, (129, 134, 137), frame=frame):
+            # 识别到交易行购买子弹的二级界面，按ESC返回一级界面
+            nav_input.key_press('esc')
+
+        elif (is_color_similar(180, 106, (191, 195, 195), frame=frame)
+              or is_color_similar(180, 106, (81, 84, 85), frame=frame)):
+            # 识别到交易行一级界面，按ESC关闭
+            nav_input.key_press('esc')
+
+        elif is_color_similar(238, 1060, (113, 107, 106), frame=frame):
+            # 识别到烽火地带开始游戏界面
+            if flag:
+                # 如果之前已执行过切换模式操作，返回交易行
+                menu_x, menu_y = screen_point(720, 80)
+                nav_input.mouse_moveTo(menu_x, menu_y)  # 移动到交易行按钮位置下方
+                if not is_color_similar(720, 77, (91, 197, 146)):
+                    nav_input.mouse_moveTo(menu_x, menu_y - screen_length(20))  # 上移选择菜单项
+                    time.sleep(0.3)  # 等待菜单项悬停高亮
+                    nav_input.mouse_click()
+                    time.sleep(0.1)
+                    nav_input.mouse_moveTo(menu_x, menu_y)  # 重置鼠标位置
+                time.sleep(0.5)
+
+                # 点击收藏一号位，避免界面位移问题
+                for _ in range(3):
+                    nav_input.mouse_click(*screen_point(660, 240))
+                    time.sleep(0.2)
+                nav_input.key_press('esc')
+                time.sleep(0.5)
+
+                break  # 成功返回交易行，退出循环
+            else:
+                # 否则先离开烽火地带
+                nav_input.key_press('esc')
+
+        elif is_color_similar(1656, 1041, (77, 77, 77), frame=frame):
+            # 识别到全面战场开始游戏界面，按ESC离开
+            nav_input.key_press('esc')
+
+        elif (is_color_similar(104, 330, (233, 234, 234), frame=frame)
+              and is_color_similar(104, 540, (99, 100, 99), frame=frame)):
+            # 识别切换模式界面（此时在烽火地带）
+            # 通过检查左侧菜单栏的颜色状态来判断当前游戏模式
+            menu_x, menu_y = screen_point(250, 380)
+            nav_input.mouse_moveTo(menu_x, menu_y)  # 移动到模式选择菜单
+            # 切换到全面战场模式
+            for _ in range(3):  # 通过多次点击确保成功选择
+                nav_input.mouse_moveTo(menu_x, menu_y + screen_length(20))  # 下移选择菜单项
+                time.sleep(0.3)  # 等待菜单项悬停高亮
+                nav_input.mouse_click()
+                time.sleep(0.1)
+                nav_input.mouse_moveTo(menu_x, menu_y)  # 重置鼠标位置
+                time.sleep(0.1)
+            time.sleep(0.5)
+            nav_input.key_press('space')  # 关闭活动广告
+
+        elif (is_color_similar(104, 330, (88, 88, 89), frame=frame)
+              and is_color_similar(104, 540, (234, 235, 235), frame=frame)):
+            # 识别切换模式界面（此时在全面战场）
+            menu_x, menu_y = screen_point(250, 380)
+            nav_input.mouse_moveTo(menu_x, menu_y)  # 移动到模式选择菜单
+            # 切换到烽火地带模式
+            for _ in range(3):  # 通过多次点击确保成功选择
+                nav_input.mouse_moveTo(menu_x, menu_y - screen_length(20))  # 上移选择菜单项
+                time.sleep(0.3)  # 等待菜单项悬停高亮
+                nav_input.mouse_click()
+                time.sleep(0.1)
+                nav_input.mouse_moveTo(menu_x, menu_y)  # 重置鼠标位置
+                time.sleep(0.1)
+            time.sleep(0.5)
+            nav_input.key_press('space')  # 关闭活动广告
+            flag = True  # 标记已经执行了从全面战场到烽火地带的切换操作
+
+
+def refresh_operation(monitor=None):
     """
     刷新交易行状态，防止界面卡顿
 
+    界面渲染延迟或卡帧比例超过阈值时提前刷新，否则最迟在 execution_time_single 秒后刷新。
+
+    参数:
+        monitor: PurchaseStateMonitor - 刷新流程期间挂起的监测器，None 表示不挂起
+
     返回:
         bool: 当且仅当本次确实执行了刷新流程时返回 True，否则 False。
     """
     global thread_pause_click, start_time_single
 
-    # 检查是否达到刷新时间间隔(配置文件默认180秒)
-    if time.time() - start_time_single > execution_time_single:
+    reason = refresh_policy.should_refresh(time.time() - start_time_single, execution_time_single)
+    if reason:
         # 暂停线程
         thread_pause_click = True
+        # 刷新流程自己截图识别，期间挂起监测线程，避免争用CPU与GIL及产生随后被丢弃的事件
+        if monitor is not None:
+            monitor.suspend('refresh')
+        try:
+            time.sleep(0.1)
+
+            # 刷新期间拒绝并丢弃连点手势，刷新流程的多步操作之间不会插入点击
+            with dispatcher.exclusive(PRIORITY_NAVIGATION):
+                print(f"刷新交易行状态({reason})")
+                metrics.refreshes.inc()
+                refresh_started = time.perf_counter()
+                run_refresh_flow()
+
+            start_time_single = time.time()
+            refresh_policy.reset()
+            metrics.refresh_seconds.observe(time.perf_counter() - refresh_started)
+        finally:
+            # 恢复线程：刷新流程抛出异常时也不能让监测线程停在挂起态、连点停在暂停态
+            if monitor is not None:
+                monitor.resume()
+            thread_pause_click = False
+        return True
 
-        time.sleep(0.1)
+    return False
 
-        # flag用于标记是否已经从全面战场切换回烽火地带模式
-        flag = False
 
-        print("刷新交易行状态")
-        # 处理各种可能的界面状态，循环直到成功回到交易行界面
-        while True:
-            time.sleep(0.5)
-            if check_chi((814, 477, 19, 21), '为'):
-                # 识别到"禁止使用市场..."界面提示，按ESC关闭
-                controller.key_press('esc')
-
-            elif is_color_similar(1236, 185, (129, 134, 137)):
-                # 识别到交易行购买子弹的二级界面，按ESC返回一级界面
-                controller.key_press('esc')
-
-            elif is_color_similar(180, 106, (191, 195, 195)) or is_color_similar(180, 106, (81, 84, 85)):
-                # 识别到交易行一级界面，按ESC关闭
-                controller.key_press('esc')
-
-            elif is_color_similar(238, 1060, (113, 107, 106)):
-                # 识别到烽火地带开始游戏界面
-                if flag:
-                    # 如果之前已执行过切换模式操作，返回交易行
-                    pyautogui.moveTo(720, 80)  # 移动到交易行按钮位置下方
-                    if not is_color_similar(720, 77, (91, 197, 146)):
-                        pyautogui.move(0, -20, 0.1)  # 上移选择菜单项
-                        time.sleep(0.2)
-                        pyautogui.click()
-                        time.sleep(0.1)
-                        pyautogui.move(0, 20, 0.1)  # 重置鼠标位置
-                    time.sleep(0.5)
-
-                    # 点击收藏一号位，避免界面位移问题
-                    for _ in range(3):
-                        controller.mouse_click(660, 240)
-                        time.sleep(0.2)
-                    controller.key_press('esc')
-                    time.sleep(0.5)
-
-                    break  # 成功返回交易行，退出循环
-                else:
-                    # 否则先离开烽火地带
-                    controller.key_press('esc')
-
-            elif is_color_similar(1656, 1041, (77, 77, 77)):
-                # 识别到全面战场开始游戏界面，按ESC离开
-                controller.key_press('esc')
-
-            elif is_color_similar(104, 330, (233, 234, 234)) and is_color_similar(104, 540, (99, 100, 99)):
-                # 识别切换模式界面（此时在烽火地带）
-                # 通过检查左侧菜单栏的颜色状态来判断当前游戏模式
-                pyautogui.moveTo(250, 380)  # 移动到模式选择菜单
-                # 切换到全面战场模式
-                for _ in range(3):  # 通过多次点击确保成功选择
-                    pyautogui.move(0, 20, 0.1)  # 下移选择菜单项
-                    time.sleep(0.2)
-                    pyautogui.click()
-                    time.sleep(0.1)
-                    pyautogui.move(0, -20, 0.1)  # 重置鼠标位置
-                time.sleep(0.5)
-                controller.key_press('space')  # 关闭活动广告
-
-            elif is_color_similar(104, 330, (88, 88, 89)) and is_color_similar(104, 540, (234, 235, 235)):
-                # 识别切换模式界面（此时在全面战场）
-                pyautogui.moveTo(250, 380)  # 移动到模式选择菜单
-                # 切换到烽火地带模式
-                for _ in range(3):  # 通过多次点击确保成功选择
-                    pyautogui.move(0, -20, 0.1)  # 上移选择菜单项
-                    time.sleep(0.2)
-                    pyautogui.click()
-                    time.sleep(0.1)
-                    pyautogui.move(0, 20, 0.1)  # 重置鼠标位置
-                time.sleep(0.5)
-                controller.key_press('space')  # 关闭活动广告
-                flag = True  # 标记已经执行了从全面战场到烽火地带的切换操作
-
-        start_time_single = time.time()
-        # 恢复线程
-        thread_pause_click = False
-        return True
+def join_coordinator():
+    """连接协调服务并应用分配到的槽位，失败或未分配槽位时使用本地监控列表"""
+    global watchlist
+    try:
+        coordinator_client.hello()
+    except (OSError, ValueError) as e:
+        print(f"连接协调服务失败，使用本地监控列表: {e}")
+        return
+    assigned = coordinator_client.watchlist()
+    if assigned is None:
+        print("协调服务未分配槽位，使用本地监控列表")
+        return
+    watchlist = assigned
+    print(f"协调服务分配槽位(版本{coordinator_client.epoch})："
+          + "，".join(f"{s.name}[{s.price_low},{s.price_high}]" for s in watchlist.slots))
+
+
+def coordinator_heartbeat_worker(stop):
+    """定期向协调服务发送统计与事件日志，并接收重新分配的槽位"""
+    while not stop.wait(coordinator_heartbeat):
+        minutes = max((time.time() - watchlist.started_at) / 60, 1e-9)
+        stats = {'checked': sum(watchlist.checked), 'hits': sum(watchlist.hits),
+                 'checked_per_minute': round(sum(watchlist.checked) / minutes, 1)}
+        try:
+            coordinator_client.heartbeat(stats)
+        except (OSError, ValueError) as e:
+            print(f"协调服务心跳失败: {e}")
+
+
+def control_status():
+    """控制接口 /status 的内容，由 HTTP 线程调用，只读取全局变量"""
+    current = watchlist
+    now = time.time()
+    return {
+        'config': {
+            'expected_price_1': expected_price_1,
+            'expected_price_2': expected_price_2,
+            'x': x,
+            'y': y,
+            'execution_time_single': execution_time_single,
+            'paused': paused,
+        },
+        'session': {
+            'active': session_start is not None,
+            'multi_client': multi_client_enabled,
+            'elapsed_seconds': round(now - session_start, 1) if session_start is not None else None,
+            'since_refresh_seconds': round(now - start_time_single, 1) if session_start is not None else None,
+            'initial_money': initial_money,
+        },
+        'slots': [{'name': s.name, 'x': s.x, 'y': s.y, 'price_low': s.price_low, 'price_high': s.price_high,
+                   'checked': checked, 'hits': hits}
+                  for s, checked, hits in zip(current.slots, current.checked, current.hits)],
+    }
+
+
+def apply_control_changes():
+    """
+    在主线程两次决策之间应用控制接口提交的修改
 
-    return False
+    同一批修改整体生效；价格区间或点击位置变化时按新值重建监控列表并替换全局引用，
+    连点线程下一次读取即使用新槽位，监测线程不受影响。
+    """
+    global expected_price_1, expected_price_2, x, y, execution_time_single, watchlist
+    if control_server is None:
+        return
+    changes = control_server.take()
+    if not changes:
+        return
+    expected_price_1 = changes.get('expected_price_1', expected_price_1)
+    expected_price_2 = changes.get('expected_price_2', expected_price_2)
+    x = changes.get('x', x)
+    y = changes.get('y', y)
+    execution_time_single = changes.get('execution_time_single', execution_time_single)
+    if changes.keys() & {'expected_price_1', 'expected_price_2', 'x', 'y'}:
+        if coordinator_client is not None and coordinator_client.slots:
+            print("监控列表由协调服务分配，价格区间与点击位置的修改在未分配槽位时生效")
+        else:
+            # [watchlist] 中写明价格区间的槽位不受 expected_price_1/2 影响，与读取配置文件时一致
+            watchlist = watchlist.with_slots(load_watchlist(config, x, y, expected_price_1, expected_price_2).slots)
+    if 'paused' in changes and changes['paused'] != paused:
+        toggle_pause()
+    print("已应用控制接口修改：" + "，".join(f"{key}={value}" for key, value in changes.items()))
 
 
 def continuous_click_worker():
@@ -676,30 +1299,122 @@ def continuous_click_worker():
     连续鼠标点击线程函数
     
     功能:
-        以高频率持续点击指定位置
+        以高频率持续点击监控列表的当前槽位
+        主线程处理完一个物品后切换槽位，实现多槽位轮询
         可通过全局变量暂停和恢复
         用于快速刷新交易行物品列表
     """
     global thread_running, thread_pause_click
 
+    thread_policy.apply('click')
+    next_tick = time.perf_counter()
     while thread_running:
         # 检查线程是否需要暂停
         if thread_pause_click:
             time.sleep(0.05)  # 暂停状态下降低CPU使用率
+            click_cadence.reset_tick()
+            next_tick = time.perf_counter()
             continue
 
-        controller.mouse_click(x, y)  # 点击当前目标位置
-        time.sleep(0.2)
+        slot = watchlist.current_slot()
+        click_cadence.tick()
+        # 以最低优先级提交点击当前目标槽位；已有待执行的点击或购买/刷新进行中时跳过
+        if dispatcher.submit_click(controller.mouse_click, *screen_point(slot.x, slot.y)):
+            metrics.clicks.inc()
+            refresh_policy.on_click()
+        # 按固定截止时间推进，提交耗时不累积为节奏漂移；落后时不追赶
+        next_tick = max(next_tick + CLICK_INTERVAL, time.perf_counter())
+        thread_policy.sleep_until(next_tick)
+
 
+def next_release(time_of_day):
+    """
+    返回下一次到达指定时刻的时间戳
+
+    参数:
+        time_of_day: str - 每日时刻，HH:MM 或 HH:MM:SS
+
+    返回:
+        float: time.time() 时间轴上的时间戳
+    """
+    hour, minute, *rest = (int(part) for part in time_of_day.split(':'))
+    now = datetime.datetime.now()
+    target = now.replace(hour=hour, minute=minute, second=rest[0] if rest else 0, microsecond=0)
+    if target <= now:
+        target += datetime.timedelta(days=1)
+    return target.timestamp()
+
+
+def wait_for_release(release_at):
+    """
+    预备完成后等待到开始时间，始终使用混合定时器（休眠后自旋），不受 [scheduling] precise_timer 影响
 
-def run_for_duration(duration_time):
+    参数:
+        release_at: float - 开始时间(time.time() 时间轴)
+
+    返回:
+        float: 实际开始时间与开始时间的偏差(秒)，正数表示晚于开始时间
+    """
+    remaining = release_at - time.time()
+    if remaining > 0:
+        print(f"预备完成，距开始时间{remaining:.2f}秒")
+        sleep_until(time.perf_counter() + remaining, thread_policy.spin_threshold)
+    else:
+        print(f"警告: 预备耗时超过 pre_arm_seconds，已晚于开始时间{-remaining:.2f}秒")
+    return time.time() - release_at
+
+
+def session_state(start_time, monitor, price_stats):
+    """
+    收集会话状态，供会话检查点写入快照
+
+    由主线程在两次决策之间调用(checkpointer.poll)：监控列表与价格统计只由主线程更新，此时不会读到更新到一半的统计；
+    识别先验与检测级联由监测线程更新，通过 monitor.state() 在两帧之间读取
+
+    参数:
+        start_time: float - 会话开始时间(time.time() 时间轴)，恢复的会话沿用最初的开始时间
+        monitor: PurchaseStateMonitor - 当前监测器，检测级联时保存各阶段统计
+        price_stats: PriceStats - 价格统计，未启用时为None
+    """
+    hwnd = game_window_hwnd
+    return {
+        'session': {'started_at': start_time, 'duration': duration_session,
+                    'since_refresh': time.time() - start_time_single},
+        # 消耗不写入快照：恢复后按最初的哈夫币数量与结束时的余额重新计算
+        'money': {'initial': initial_money},
+        'layout': {'geometry': window_geometry(hwnd) if hwnd else None, **asdict(layout.current())},
+        'capture_model': asdict(capture_planner.model()),
+        **monitor.state(),
+        'watchlist': watchlist.stats_state(),
+        'price_stats': price_stats.state() if price_stats is not None else None,
+    }
+
+
+def run_for_duration(duration_time, release_at=None, resume=None):
     """
     在指定时间内执行交易行监控与操作：
     - 采用并发状态监测 + 消抖（武装/失效/重武装）
     - 保留定期刷新交易行、暂停/恢复连点、界面状态检查、二次检查价格等逻辑
+
+    参数:
+        duration_time: int - 运行时长(秒)，从开始监测时计时
+        release_at: float - 预备模式下的开始时间(time.time() 时间轴)；此前完成全部准备并预热监测，
+            到点后才开始连点与决策，None 表示准备完成后立即开始
+        resume: dict - 会话检查点快照；沿用快照中的开始时间、资金、刷新计时、布局与识别统计，
+            跳过资金识别与槽位点击，None 表示开始新的会话
     """
     global paused, should_exit, thread_running, thread_pause_click, start_time_single, \
-        consumption, initial_money, end_money
+        consumption, initial_money, end_money, probe_recorders, watchlist, session_start, \
+        click_cadence, decision_latency, duration_session
+
+    duration_session = duration_time
+
+    if multi_client_enabled:
+        windows = find_game_windows()
+        if windows:
+            run_multi_client(duration_time, windows, release_at)
+            return
+        print("多客户端模式未找到窗口，按单客户端运行")
 
     # 置顶窗口
     hwnd = find_game_window()
@@ -708,88 +1423,229 @@ def run_for_duration(duration_time):
     else:
         print("警告: 定时执行开始时未找到游戏窗口，无法置顶")
 
-    # 初始资金与定位
-    location, region = detect_location.main()
-    initial_money = view_money(location, region)
-
-    start_time = start_time_single = time.time()
-
-    # 点击收藏一号位，避免界面位移
-    for _ in range(3):
-        controller.mouse_click(660, 240)
-        time.sleep(0.2)
-    controller.key_press('esc')
-    time.sleep(0.5)
+    # 识别窗口布局，之后所有截图区域、探测像素与点击坐标都按此布局换算；
+    # 恢复会话且窗口几何信息未变时直接使用快照中的布局
+    saved_layout = dict(resume['layout']) if resume is not None else None
+    if saved_layout is not None and hwnd and saved_layout.pop('geometry') == window_geometry(hwnd):
+        layout.set_current(layout.Layout(**saved_layout))
+    else:
+        apply_layout(hwnd)
+    if resume is not None:
+        capture_planner.set_model(capture_planner.CostModel(**resume['capture_model']))
+
+    # 启动资源采样（脚本进程与游戏进程）
+    sampler = load_resource_sampler(config)
+    if sampler is not None:
+        sampler.set_game_pid(game_window_pid if hwnd else None)
+        sampler.start()
+
+    # 初始资金（哈夫币位置按窗口几何信息缓存）；恢复会话时沿用最初的资金，结束时的消耗仍按最初的资金计算
+    if resume is not None:
+        initial_money = resume['money']['initial']
+    else:
+        initial_money = read_balance(hwnd)
+
+    first_decision_logged = False
+    coordinator_stop = threading.Event()
+    if coordinator_client is not None:
+        join_coordinator()
+        threading.Thread(target=coordinator_heartbeat_worker, args=(coordinator_stop,),
+                         name='coordinator_heartbeat', daemon=True).start()
+    watchlist_epoch = coordinator_client.epoch if coordinator_client is not None else None
+    watchlist.reset_stats()
+    refresh_policy.reset()
+    # 数字识别先验按会话统计
+    detect_money.reset_priors()
+    if resume is not None:
+        detect_money.restore_priors(resume['priors'])
+        watchlist.restore_stats(resume['watchlist'])
+    # 可选：录制价格数字区域截图，用于离线校验识别结果(python detect_money.py verify 文件)
+    roi_recorder = load_roi_recorder(config, layout.current().scale)
+    detect_money.recorder = roi_recorder
+    if roi_recorder is not None:
+        probe_recorders = {name: load_roi_recorder(config, layout.current().scale, f'probe_{name}')
+                           for name in template_bundle.PROBES}
+    # 按槽位流式统计识别到的价格分布
+    price_stats = load_price_stats(config, [s.name for s in watchlist.slots])
+    if price_stats is not None:
+        if resume is not None and resume['price_stats'] is not None:
+            price_stats.restore(resume['price_stats'])
+        price_stats.start()
+
+    # 连点节奏与决策延迟按会话统计，结束时与调度策略一并输出，便于启用前后对比
+    click_cadence = JitterStats(CLICK_INTERVAL)
+    decision_latency = JitterStats()
+
+    # 启动输入调度线程
+    dispatcher.start()
+    if profile_on_run:
+        profiler.start()
+
+    # 点击收藏一号位，避免界面位移（恢复会话时界面已在交易行，跳过）
+    if resume is None:
+        for _ in range(3):
+            nav_input.mouse_click(*screen_point(660, 240))
+            time.sleep(0.2)
+        nav_input.key_press('esc')
+        time.sleep(0.5)
 
-    # 启动线程
+    # 启动线程；预备模式下连点保持暂停，到开始时间才开始
     thread_running = True
-    thread_pause_click = False
+    thread_pause_click = release_at is not None
 
-    click_thread = threading.Thread(target=continuous_click_worker, daemon=True)
+    click_thread = threading.Thread(target=continuous_click_worker, name='click_worker', daemon=True)
     click_thread.start()
 
     # 启动并发状态监测（六位价/暂无/七位分隔符）
-    monitor = PurchaseStateMonitor(poll_interval=0, rearm_clear_consecutive=1)
+    if monitor_mode == 'cascade':
+        monitor = CascadeStateMonitor(poll_interval=0, rearm_clear_consecutive=1, thread_init=thread_policy.apply,
+                                      reorder_every=cascade_reorder_every)
+    else:
+        monitor = PurchaseStateMonitor(poll_interval=0, rearm_clear_consecutive=1, thread_init=thread_policy.apply)
+    if resume is not None and resume['cascade'] is not None and isinstance(monitor, CascadeStateMonitor):
+        monitor.cascade.restore(resume['cascade'])
     monitor.start()
 
+    # 预备模式：监测线程已在截图识别(预热)，到开始时间后丢弃此前的事件并开始连点
+    lateness = wait_for_release(release_at) if release_at is not None else None
+    if lateness is not None:
+        monitor.clear_pending()
+        thread_pause_click = False
+    start_time = start_time_single = session_start = time.time()
+    session_started = time.perf_counter()
+    if lateness is not None:
+        print(f"开始监测，与开始时间偏差{lateness * 1000:+.2f}ms")
+    if resume is not None:
+        # 运行时长与刷新计时从最初的开始时间连续计算
+        start_time = session_start = resume['session']['started_at']
+        start_time_single = time.time() - resume['session']['since_refresh']
+        print(f"已恢复会话：已运行{time.time() - start_time:.0f}秒，剩余{start_time + duration_time - time.time():.0f}秒，"
+              f"距进程启动{time.perf_counter() - PROCESS_START:.2f}秒")
+    # 定期写入会话快照，进程重启后可从快照恢复
+    checkpointer = load_checkpointer(config, lambda: session_state(start_time, monitor, price_stats))
+    if checkpointer is not None:
+        checkpointer.start()
+
+    user_exit = False
     try:
         while time.time() - start_time < duration_time:
+            # 控制接口提交的修改在两次决策之间应用
+            apply_control_changes()
+            # 会话快照在两次决策之间收集，由写入线程写入文件
+            if checkpointer is not None:
+                checkpointer.poll()
             # 暂停控制
             if paused:
                 thread_pause_click = True
+                monitor.suspend('pause')
                 while paused:
                     time.sleep(0.1)
+                    apply_control_changes()
+                    if checkpointer is not None:
+                        checkpointer.poll()
+                refresh_policy.discard_pending()
+                monitor.resume()
                 thread_pause_click = False
                 continue
 
             # 定期刷新交易行
             # print(1)
-            refreshed = refresh_operation()
-            if refreshed:
-                monitor.clear_pending() # 清空待处理事件，避免消费到上一次循环的残留事件
+            # 刷新期间监测线程挂起，恢复时已清空待处理事件
+            refresh_operation(monitor)
+            # 协调服务重新分配了槽位（节点加入/离线），在两次决策之间切换监控列表
+            if coordinator_client is not None and coordinator_client.epoch != watchlist_epoch:
+                watchlist_epoch = coordinator_client.epoch
+                assigned = coordinator_client.watchlist()
+                if assigned is not None:
+                    watchlist = assigned
+                    if price_stats is not None:
+                        price_stats.set_slots([s.name for s in watchlist.slots])
+                    print(f"协调服务重新分配槽位(版本{watchlist_epoch})："
+                          + "，".join(f"{s.name}[{s.price_low},{s.price_high}]" for s in watchlist.slots))
             # print(2)
             # 取事件（带短超时，便于循环做其它工作）
             try:
                 evt = monitor.get_event(timeout=0.2)
             except queue.Empty:
+                refresh_policy.check_stale()
                 continue
             # print(3)
+            refresh_policy.on_render(evt.ts)
+            if not first_decision_logged:
+                first_decision_logged = True
+                now = time.perf_counter()
+                print(f"首次决策：距开始监测{now - session_started:.2f}秒，距进程启动{now - PROCESS_START:.2f}秒"
+                      + (f"，距开始时间{time.time() - release_at:.3f}秒" if release_at is not None else ""))
+            # 事件属于连点线程当前点击的槽位；先切换槽位，让下一次连点与本次决策重叠
+            slot_index = watchlist.advance()
+            slot = watchlist.slots[slot_index]
+
             # 处理事件
             if evt.kind == 'six_digits':
                 # print(4)
                 price = evt.data
-                if expected_price_1 <= price <= expected_price_2:
+                hit = watchlist.should_buy(slot_index, price)
+                watchlist.record_check(slot_index, hit)
+                metrics.prices.inc('in_range' if hit else 'out_of_range')
+                if price_stats is not None:
+                    price_stats.observe(slot_index, price, hit, evt.ts)
+                metrics.decision_seconds.observe(time.perf_counter() - evt.ts)
+                decision_latency.observe(time.perf_counter() - evt.ts)
+                claimed_elsewhere = False
+                if coordinator_client is not None:
+                    coordinator_client.record({'kind': evt.kind, 'slot': slot.name, 'price': price, 'hit': hit})
+                    # 多个节点看到同一件物品时只有一个节点获准购买
+                    claimed_elsewhere = hit and not coordinator_client.request_intent(slot.name, price)
+                if claimed_elsewhere:
+                    print(f"{slot.name}识别到价格{price}，已由其他节点购买，跳过")
+                elif hit:
                     # print(5)
-                    print(f"识别到价格{price}")
-                    # 暂停连点，避免干扰购买操作
+                    metrics.purchases.inc()
+                    print(f"{slot.name}识别到价格{price}")
+                    # 暂停连点；购买期间调度器拒绝并丢弃连点手势，避免干扰购买操作
                     thread_pause_click = True
-                    controller.mouse_moveTo(1746, 900)
-                    controller.mouse_move(0, 10)
-                    controller.mouse_click()
-
-                    # take_screenshot(price)
-                    time.sleep(0.5)
+                    with dispatcher.exclusive(PRIORITY_PURCHASE):
+                        purchase_input.mouse_moveTo(*screen_point(1746, 900))
+                        purchase_input.mouse_move(0, screen_length(10))
+                        purchase_input.mouse_click()
+
+                        # take_screenshot(price)
+                        time.sleep(0.5)
+                    refresh_policy.discard_pending()
                     thread_pause_click = False
                 else:
-                    print(f"识别到价格{price}，不在范围内")
+                    print(f"{slot.name}识别到价格{price}，不在范围内")
                 # print(6)
-                controller.key_press('esc')
+                nav_input.key_press('esc')
 
             elif evt.kind in ('no_items', 'seven_sep'):
                 # print(7)
                 # 无货或七位分隔符，直接返回
-                controller.key_press('esc')
-
+                watchlist.record_check(slot_index)
+                metrics.decision_seconds.observe(time.perf_counter() - evt.ts)
+                decision_latency.observe(time.perf_counter() - evt.ts)
+                if coordinator_client is not None:
+                    coordinator_client.record({'kind': evt.kind, 'slot': slot.name})
+                nav_input.key_press('esc')
+
+    except (KeyboardInterrupt, SystemExit):
+        # 用户主动退出(Ctrl+C)，不是崩溃
+        user_exit = True
+        raise
     finally:
+        # 写入最终会话快照：运行满时长或用户主动退出的会话标记为已结束，
+        # 只有异常崩溃(未捕获的异常或来不及写入最终快照)的会话下次启动时恢复
+        if checkpointer is not None:
+            checkpointer.stop(finished=user_exit or time.time() - start_time >= duration_time)
         # 停止监测与线程
         monitor.stop()
         thread_running = False
         click_thread.join(timeout=1.0)
+        dispatcher.stop()
 
         # 统计最终消耗
         time.sleep(1)
-        location, region = detect_location.main()
-        end_money = view_money(location, region)
+        end_money = read_balance(hwnd)
         if end_money is not None:
             consumption_delta = initial_money - end_money if initial_money is not None else 0
             consumption_total = consumption + consumption_delta
@@ -799,6 +1655,202 @@ def run_for_duration(duration_time):
             consumption_str = "识别失败"
 
         print(f"时间到，总计消耗哈夫币：{consumption_str}")
+        print(watchlist.report())
+        watchlist.save_baseline()
+        print(monitor.report())
+        print(thread_policy.describe())
+        print(click_cadence.report("连点节奏"))
+        print(decision_latency.report("截图到决策延迟"))
+        if sampler is not None:
+            sampler.stop()
+            print(sampler.report())
+        if coordinator_client is not None:
+            coordinator_stop.set()
+            try:
+                coordinator_client.heartbeat({'checked': sum(watchlist.checked), 'hits': sum(watchlist.hits)})
+            except (OSError, ValueError) as e:
+                print(f"协调服务心跳失败: {e}")
+            coordinator_client.close()
+            print(coordinator_client.report())
+        if price_stats is not None:
+            price_stats.stop()
+            print(price_stats.report())
+        if roi_recorder is not None:
+            detect_money.recorder = None
+            roi_recorder.close()
+            print(roi_recorder.report())
+            recorders, probe_recorders = probe_recorders, {}
+            for recorder in recorders.values():
+                recorder.close()
+                print(recorder.report())
+        if isinstance(controller.backend, RecordingBackend):
+            print(f"输入记录：{controller.backend.summary()}")
+            controller.backend.close()
+        if checkpointer is not None:
+            print(checkpointer.report())
+        session_start = None
+        should_exit = True
+
+
+def load_clients(windows):
+    """
+    为每个窗口识别布局并读取各自的监控列表
+
+    每个客户端可在 [client_N] 中单独配置 expected_price_1/2 与 slots，未配置时使用全局设置
+    """
+    clients = []
+    for i, w in enumerate(windows):
+        section = f'client_{i + 1}'
+        low = config.getint(section, 'expected_price_1', fallback=expected_price_1)
+        high = config.getint(section, 'expected_price_2', fallback=expected_price_2)
+        slots_section = section if config.has_option(section, 'slots') else 'watchlist'
+        client_watchlist = load_watchlist(config, x, y, low, high, slots_section)
+        clients.append(multi_client.Client(i, w['hwnd'], resolve_layout(w['hwnd']), client_watchlist, w['title']))
+    return clients
+
+
+def run_multi_client(duration_time, windows, release_at=None):
+    """
+    多客户端模式：在指定时间内同时监控多个游戏窗口
+
+    - 每个节拍截取一次覆盖所有窗口识别区域的外接矩形，由各客户端识别线程切分识别并完成决策
+    - 只有一套鼠标键盘：所有输入经输入调度线程串行执行，多步操作(购买/返回/刷新)持有 gesture_lock
+    - 连点线程轮流点击各客户端当前槽位，各客户端到达 execution_time_single 后逐个刷新
+    - 指定 release_at 时与单客户端相同：识别线程提前预热，到开始时间才开始连点与决策
+    """
+    global should_exit, thread_running, session_start, click_cadence, decision_latency
+
+    clients = load_clients(windows)
+    capture = multi_client.SharedCapture(clients)
+    print(f"共享截图计划：{capture.plan.describe()}")
+    gesture_lock = threading.Lock()
+    released = threading.Event()
+    if release_at is None:
+        released.set()
+
+    def handle_event(client, kind, price, ts):
+        # 开始时间之前的事件只用于预热，不做决策
+        if not released.is_set():
+            return
+        # 事件属于连点线程当前点击的槽位；先切换槽位，与单客户端一致
+        slot_index = client.watchlist.advance()
+        slot = client.watchlist.slots[slot_index]
+        client.busy.set()
+        try:
+            with gesture_lock:
+                hit = kind == 'six_digits' and client.watchlist.should_buy(slot_index, price)
+                client.watchlist.record_check(slot_index, hit)
+                if kind == 'six_digits':
+                    metrics.prices.inc('in_range' if hit else 'out_of_range')
+                if hit:
+                    metrics.purchases.inc()
+                    print(f"{client.name} {slot.name}识别到价格{price}")
+                    with dispatcher.exclusive(PRIORITY_PURCHASE):
+                        purchase_input.mouse_moveTo(*client.point(1746, 900))
+                        purchase_input.mouse_move(0, client.layout.length(10))
+                        purchase_input.mouse_click()
+                        time.sleep(0.5)
+                elif kind == 'six_digits':
+                    print(f"{client.name} {slot.name}识别到价格{price}，不在范围内")
+                # 按键发送到前台窗口，先切换到该客户端
+                activate_window(client.hwnd)
+                nav_input.key_press('esc')
+            metrics.decision_seconds.observe(time.perf_counter() - ts)
+            decision_latency.observe(time.perf_counter() - ts)
+            client.decisions += 1
+            metrics.client_decisions.inc(client.name)
+        finally:
+            client.busy.clear()
+
+    def click_worker():
+        thread_policy.apply('click')
+        next_tick = time.perf_counter()
+        while thread_running:
+            if paused:
+                time.sleep(0.05)
+                click_cadence.reset_tick()
+                next_tick = time.perf_counter()
+                continue
+            click_cadence.tick()
+            for client in clients:
+                if client.busy.is_set():
+                    continue
+                slot = client.watchlist.current_slot()
+                # 按客户端合并待执行的连点，某个客户端的连点未执行完不影响其他客户端提交
+                if dispatcher.submit_click(controller.mouse_click, *client.point(slot.x, slot.y), key=client.index):
+                    client.clicks += 1
+                    metrics.clicks.inc()
+            next_tick = max(next_tick + CLICK_INTERVAL, time.perf_counter())
+            thread_policy.sleep_until(next_tick)
+
+    def refresh_client(client):
+        client.busy.set()
+        try:
+            with gesture_lock, dispatcher.exclusive(PRIORITY_NAVIGATION):
+                print(f"{client.name} 刷新交易行状态")
+                metrics.refreshes.inc()
+                refresh_started = time.perf_counter()
+                activate_window(client.hwnd)
+                # 刷新流程按当前布局换算坐标，期间切换为该客户端的布局
+                previous = layout.current()
+                layout.set_current(client.layout)
+                try:
+                    run_refresh_flow()
+                finally:
+                    layout.set_current(previous)
+                metrics.refresh_seconds.observe(time.perf_counter() - refresh_started)
+        finally:
+            client.last_refresh = time.time()
+            client.busy.clear()
+
+    for client in clients:
+        client.watchlist.reset_stats()
+    click_cadence = JitterStats(CLICK_INTERVAL)
+    decision_latency = JitterStats()
+    dispatcher.start()
+    monitor = multi_client.MultiClientMonitor(clients, capture, handle_event, thread_init=thread_policy.apply,
+                                              reorder_every=cascade_reorder_every)
+    monitor.start()
+    lateness = wait_for_release(release_at) if release_at is not None else None
+    released.set()
+    thread_running = True
+    click_thread = threading.Thread(target=click_worker, name='click_worker', daemon=True)
+    click_thread.start()
+    start_time = session_start = time.time()
+    for client in clients:
+        client.last_refresh = start_time
+    if lateness is not None:
+        print(f"开始监测，与开始时间偏差{lateness * 1000:+.2f}ms")
+
+    try:
+        while time.time() - start_time < duration_time:
+            # 各客户端的监控列表在任务开始时确定，此处只有刷新间隔与暂停状态的修改即时生效
+            apply_control_changes()
+            if paused:
+                # 暂停期间挂起截图与识别线程，不再识别与决策
+                monitor.suspend('pause')
+                while paused:
+                    time.sleep(0.1)
+                    apply_control_changes()
+                monitor.resume()
+                continue
+            for client in clients:
+                if time.time() - client.last_refresh >= execution_time_single:
+                    refresh_client(client)
+            time.sleep(0.2)
+    finally:
+        monitor.stop()
+        thread_running = False
+        click_thread.join(timeout=1.0)
+        dispatcher.stop()
+        print(multi_client.report(clients, time.time() - start_time))
+        print(monitor.lifecycle.report())
+        print(thread_policy.describe())
+        print(click_cadence.report("连点节奏"))
+        print(decision_latency.report("截图到决策延迟"))
+        for client in clients:
+            print(f"{client.name}：{client.watchlist.report()}")
+        session_start = None
         should_exit = True
 
 
@@ -811,25 +1863,83 @@ def main():
         2. 等待定时任务执行
         3. 处理退出信号
     """
-    global game_window_hwnd, should_exit
+    global game_window_hwnd, should_exit, control_server
+
+    load_config()
+    # 日志聚合：合并重复日志行，高频的"不在范围内"按周期汇总
+    log_aggregation = load_log_aggregation(config)
+    if log_aggregation is not None and isinstance(sys.stdout, Tee):
+        sys.stdout.enable_aggregation(*log_aggregation)
+    # 进程优先级与系统定时器精度(按 [scheduling] 配置)
+    thread_policy.apply_process()
+
+    # 监听快捷键 Ctrl+P
+    keyboard.add_hotkey('ctrl+p', toggle_pause)
+    # 采样分析热键（默认 Ctrl+Shift+P）：开始采样，运行中再按提前结束
+    if profiler_hotkey:
+        keyboard.add_hotkey(profiler_hotkey, profiler.toggle)
 
     # 查找游戏窗口（在定时执行时置顶）
     game_window_hwnd = find_game_window()
 
-    # 输出脚本即将执行的时间和持续时长
-    print(f"{execution_time}开始执行，执行{duration}秒")
-
-    # 设置定时任务，在指定时间执行run_for_duration函数
-    schedule.every().day.at(execution_time).do(run_for_duration, duration_time=duration)
+    # 启动本机指标接口/定期指标文件
+    metrics.start_from_config(config)
+    # 启动本机运行时控制接口：查询状态、热更新价格区间/点击位置/刷新间隔/暂停状态
+    control_server = load_control_server(config, control_status)
+    if control_server is not None:
+        try:
+            control_server.start()
+            print(f"控制接口已启动: http://127.0.0.1:{control_server.port}/status，"
+                  f"POST /config 须带请求头 X-Control-Token: {control_server.token}")
+        except OSError as e:
+            print(f"控制接口启动失败: {e}")
+            control_server = None
+
+    # 上次会话中途退出且快照未过期时，跳过预热与定时等待，立即按快照恢复（多客户端模式不写快照）
+    resume = load_resumable(config) if not multi_client_enabled else None
+    if resume is not None:
+        saved_at = datetime.datetime.fromtimestamp(resume['saved_at']).strftime('%H:%M:%S')
+        print(f"发现未结束的会话快照(保存于{saved_at})，立即恢复")
+        # 截图计划只登记区域，截图开销沿用快照中的实测值，不再测量
+        register_capture_regions()
+    else:
+        # 输出脚本即将执行的时间和持续时长
+        print(f"{execution_time}开始执行，执行{duration}秒")
+
+        # 在 execution_time 之前完成预热
+        warm_up()
+        print(f"启动就绪，距进程启动{time.perf_counter() - PROCESS_START:.2f}秒")
+
+        if pre_arm_seconds > 0:
+            # 预备模式：提前 pre_arm_seconds 秒开始准备，execution_time 到点时精确开始监测
+            release_at = next_release(execution_time)
+            arm_at = release_at - pre_arm_seconds
+            print(f"将于开始时间前{pre_arm_seconds:g}秒开始预备")
+        else:
+            # 设置定时任务，在指定时间执行run_for_duration函数
+            schedule.every().day.at(execution_time).do(run_for_duration, duration_time=duration)
 
     # 持续运行，直到收到退出信号
     try:
         while not should_exit:
-            # 检查并执行到期的定时任务
-            schedule.run_pending()
+            # 等待定时任务期间提交的修改在任务开始前生效
+            apply_control_changes()
+            if resume is not None:
+                # 运行时长按快照中最初的开始时间计算
+                run_for_duration(resume['session']['duration'], resume=resume)
+                continue
+            if pre_arm_seconds > 0:
+                # 已进入预备时段(含启动时已晚于预备时间但未到开始时间)时立即预备
+                if time.time() >= arm_at:
+                    run_for_duration(duration, release_at=release_at)
+                    continue
+            else:
+                # 检查并执行到期的定时任务
+                schedule.run_pending()
             # 每秒检查一次，降低CPU占用
             time.sleep(1)
     finally:
+        thread_policy.restore_process()
         # 脚本结束时，取消窗口置顶
         if game_window_hwnd:
             unset_window_topmost(game_window_hwnd)
@@ -853,6 +1963,8 @@ if __name__ == "__main__":
         # 给线程一点时间退出
         time.sleep(0.5)
 
+        # 输出尚未输出的重复计数与汇总
+        tee.close_aggregation()
         # 关闭日志文件并恢复标准输出
         sys.excepthook = tee.original_excepthook
         sys.stdout = tee.stdout
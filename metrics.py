@@ -0,0 +1,254 @@
+"""
+运行指标模块
+功能：统计各监测线程的截图帧数、识别事件、价格区间命中、购买、重武装、刷新、缓存命中与事件丢弃等计数，
+以及各阶段耗时直方图；通过本机 Prometheus 文本格式接口或定期写入文件的方式输出
+"""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 默认耗时直方图分桶(秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    """将标签格式化为 {name="value",...}"""
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    """指标基类，按标签值分组保存数据"""
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """只增计数器"""
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """可任意设置的瞬时值"""
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            data = self._values.get(labels)
+            if data is None:
+                # [各分桶计数..., +Inf计数, 总和]
+                data = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += 1
+            data[-1] += value
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        with self._lock:
+            items = [(labels, list(data)) for labels, data in self._values.items()]
+        for labels, data in items:
+            for bound, count in zip(self.buckets, data):
+                bucket_labels = _format_labels(self.label_names, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            bucket_labels = _format_labels(self.label_names, labels, 'le="+Inf"')
+            plain_labels = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_bucket{bucket_labels} {data[-2]}")
+            lines.append(f"{self.name}_sum{plain_labels} {data[-1]:.6f}")
+            lines.append(f"{self.name}_count{plain_labels} {data[-2]}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# --- 监测线程 ---
+frames_grabbed = REGISTRY.counter('deltaforce_frames_grabbed_total', '各监测线程截取的帧数', ('watcher',))
+watcher_seconds = REGISTRY.histogram('deltaforce_watcher_seconds', '各监测线程单帧截图+识别耗时', ('watcher',))
+detections = REGISTRY.counter('deltaforce_detections_total', '投递的界面事件数', ('kind',))
+queue_drops = REGISTRY.counter('deltaforce_event_queue_drops_total', '事件队列中被丢弃的事件数', ('reason',))
+rearms = REGISTRY.counter('deltaforce_rearm_total', '监测器重武装次数')
+armed = REGISTRY.gauge('deltaforce_monitor_armed', '监测器当前是否处于武装态')
+last_detection = REGISTRY.gauge('deltaforce_last_detection_timestamp_seconds', '最近一次投递事件的时间戳', ('kind',))
+cascade_resolved = REGISTRY.counter('deltaforce_cascade_resolved_total', '检测级联中给出本帧结论的阶段(none 表示均未命中)', ('stage',))
+monitor_suspended = REGISTRY.gauge('deltaforce_monitor_suspended', '监测线程当前是否挂起(暂停或刷新期间)')
+monitor_suspends = REGISTRY.counter('deltaforce_monitor_suspends_total', '监测线程挂起次数', ('reason',))
+
+# --- 主循环 ---
+prices = REGISTRY.counter('deltaforce_prices_total', '识别到的六位价格数', ('result',))
+purchases = REGISTRY.counter('deltaforce_purchases_attempted_total', '尝试购买次数')
+refreshes = REGISTRY.counter('deltaforce_refresh_total', '模式切换刷新次数')
+refresh_seconds = REGISTRY.histogram('deltaforce_refresh_seconds', '模式切换刷新耗时',
+                                     buckets=(1, 2, 5, 10, 20, 30, 60))
+decision_seconds = REGISTRY.histogram('deltaforce_decision_seconds', '截图开始到主线程完成决策的耗时')
+clicks = REGISTRY.counter('deltaforce_clicks_total', '连点线程点击次数')
+cache_hits = REGISTRY.counter('deltaforce_cache_hits_total', '各类缓存命中次数', ('cache',))
+cache_misses = REGISTRY.counter('deltaforce_cache_misses_total', '各类缓存未命中次数', ('cache',))
+digit_matches = REGISTRY.counter('deltaforce_digit_matches_total', '数位识别次数(提前结束/全量扫描)', ('mode',))
+digit_comparisons = REGISTRY.counter('deltaforce_digit_comparisons_total', '按先验顺序识别时实际比较的数字模板数')
+
+# --- 多客户端 ---
+client_decisions = REGISTRY.counter('deltaforce_client_decisions_total', '多客户端模式下各客户端完成的决策数', ('client',))
+
+# --- 输入调度 ---
+input_preempted = REGISTRY.counter('deltaforce_input_preempted_total', '被高优先级手势丢弃的待执行手势数', ('priority',))
+input_dispatch_seconds = REGISTRY.histogram('deltaforce_input_dispatch_seconds', '手势从提交到开始执行的等待时间',
+                                            ('priority',), buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 不把每次抓取写入日志
+        pass
+
+
+def start_http_server(port: int, host: str = '127.0.0.1', registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """在后台线程启动本机指标接口 http://host:port/metrics"""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_dump_thread(interval: float, path: str | None = None, registry: MetricsRegistry = REGISTRY) -> threading.Event:
+    """
+    在后台线程定期将指标写入文件（原子替换），返回用于停止的 Event
+
+    参数:
+        interval: float - 写入间隔(秒)
+        path: str - 输出文件路径，默认 logs/metrics.prom
+    """
+    if path is None:
+        path = os.path.join(BASE_DIR, 'logs', 'metrics.prom')
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(registry.render())
+            os.replace(tmp_path, path)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    threading.Thread(target=run, daemon=True).start()
+    return stop
+
+
+def start_from_config(config) -> None:
+    """根据配置文件 [metrics] 启动指标输出"""
+    if not config.getboolean('metrics', 'enabled', fallback=True):
+        return
+    port = config.getint('metrics', 'port', fallback=9108)
+    if port:
+        try:
+            start_http_server(port)
+            print(f"指标接口已启动: http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            print(f"指标接口启动失败: {e}")
+    dump_interval = config.getfloat('metrics', 'dump_interval', fallback=0)
+    if dump_interval > 0:
+        start_dump_thread(dump_interval)
+
+
+def timed(histogram: Histogram, *labels):
+    """计时上下文管理器：with timed(metrics.refresh_seconds): ..."""
+    return _Timer(histogram, labels)
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
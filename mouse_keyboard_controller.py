@@ -1,4 +1,17 @@
+"""
+鼠标键盘控制模块
+功能：将每个操作手势（移动+按下+松开、组合键等）整理为一组输入事件，交给输入后端执行
+
+输入后端：
+    SendInputBackend - 生产环境，每个手势的全部事件合并为一次 Win32 SendInput 调用
+    RecordingBackend - 记录带时间戳的输入事件流，不依赖 Win32，可在 Linux 上测量输入节奏与点击速率
+"""
 import ctypes
+import json
+import sys
+import threading
+import time
+from collections import deque
 from ctypes import wintypes
 
 # 定义鼠标事件常量
@@ -9,12 +22,27 @@ MOUSEEVENTF_RIGHTDOWN = 0x0008
 MOUSEEVENTF_RIGHTUP = 0x0010
 MOUSEEVENTF_WHEEL = 0x0800
 MOUSEEVENTF_HWHEEL = 0x01000
+MOUSEEVENTF_VIRTUALDESK = 0x4000
+MOUSEEVENTF_ABSOLUTE = 0x8000
 WHEEL_DELTA = 120
 
 # 定义键盘事件常量
 KEYEVENTF_KEYDOWN = 0x0000
 KEYEVENTF_KEYUP = 0x0002
 
+# SendInput 输入类型
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+
+# 虚拟桌面尺寸（多显示器时绝对坐标按虚拟桌面归一化）
+SM_XVIRTUALSCREEN = 76
+SM_YVIRTUALSCREEN = 77
+SM_CXVIRTUALSCREEN = 78
+SM_CYVIRTUALSCREEN = 79
+
+# 记录后端在内存中保留的最近手势数
+RECORD_LIMIT = 10000
+
 # 常用虚拟键代码
 VIRTUAL_KEYS = {
     "backspace": 0x08,
@@ -69,84 +97,261 @@ VIRTUAL_KEYS = {
     "win": 0x5B,
 }
 
-# 加载 user32.dll
-user32 = ctypes.WinDLL('user32', use_last_error=True)
+# 鼠标按键 -> (按下标志, 松开标志)
+BUTTON_FLAGS = {
+    "left": (MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP),
+    "right": (MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP),
+}
+
+ULONG_PTR = ctypes.c_size_t
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD), ("dwExtraInfo", ULONG_PTR)]
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                ("time", wintypes.DWORD), ("dwExtraInfo", ULONG_PTR)]
+
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [("uMsg", wintypes.DWORD), ("wParamL", wintypes.WORD), ("wParamH", wintypes.WORD)]
+
+
+class _INPUTUNION(ctypes.Union):
+    _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+
+class INPUT(ctypes.Structure):
+    _fields_ = [("type", wintypes.DWORD), ("union", _INPUTUNION)]
+
+
+class SendInputBackend:
+    """
+    Win32 SendInput 后端
+
+    一个手势的全部事件一次性提交，系统保证这些事件连续插入输入流，
+    按下与松开之间不会夹杂其他输入，也省去了逐个 mouse_event/keybd_event 的调用开销。
+    """
 
-class MouseKeyboardController:
     def __init__(self):
-        self.user32 = user32
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self.user32.SendInput.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+        self.user32.SendInput.restype = wintypes.UINT
+        self._refresh_virtual_screen()
+
+    def _refresh_virtual_screen(self):
+        metrics = self.user32.GetSystemMetrics
+        self._vx, self._vy = metrics(SM_XVIRTUALSCREEN), metrics(SM_YVIRTUALSCREEN)
+        self._vw, self._vh = max(1, metrics(SM_CXVIRTUALSCREEN)), max(1, metrics(SM_CYVIRTUALSCREEN))
+
+    @staticmethod
+    def _normalize(pixel: int, origin: int, size: int) -> int:
+        """
+        屏幕像素坐标归一化到 0~65535
+
+        系统按 像素 = n × 尺寸 / 65536 (向下取整) 换算回像素，取像素中心对应的值，
+        换算回来恰好是同一个像素(直接截断会使很多坐标落到左侧/上方相邻像素)
+        """
+        return ((2 * (pixel - origin) + 1) * 32768) // size
+
+    def _to_input(self, event) -> INPUT:
+        kind = event[0]
+        if kind == 'move':
+            # 绝对坐标归一化到 0~65535(像素中心)
+            dx = self._normalize(event[1], self._vx, self._vw)
+            dy = self._normalize(event[2], self._vy, self._vh)
+            flags = MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_VIRTUALDESK
+            return INPUT(INPUT_MOUSE, _INPUTUNION(mi=MOUSEINPUT(dx, dy, 0, flags, 0, 0)))
+        if kind == 'move_rel':
+            return INPUT(INPUT_MOUSE, _INPUTUNION(mi=MOUSEINPUT(event[1], event[2], 0, MOUSEEVENTF_MOVE, 0, 0)))
+        if kind == 'button':
+            down_flag, up_flag = BUTTON_FLAGS[event[1]]
+            flags = down_flag if event[2] else up_flag
+            return INPUT(INPUT_MOUSE, _INPUTUNION(mi=MOUSEINPUT(0, 0, 0, flags, 0, 0)))
+        if kind in ('wheel', 'hwheel'):
+            flags = MOUSEEVENTF_WHEEL if kind == 'wheel' else MOUSEEVENTF_HWHEEL
+            data = event[1] & 0xFFFFFFFF  # 负数按 DWORD 补码传递
+            return INPUT(INPUT_MOUSE, _INPUTUNION(mi=MOUSEINPUT(0, 0, data, flags, 0, 0)))
+        if kind == 'key':
+            flags = KEYEVENTF_KEYDOWN if event[2] else KEYEVENTF_KEYUP
+            return INPUT(INPUT_KEYBOARD, _INPUTUNION(ki=KEYBDINPUT(event[1], 0, flags, 0, 0)))
+        raise ValueError(f"未知输入事件: {event}")
+
+    def send(self, gesture: str, events: list) -> None:
+        """一次 SendInput 提交整个手势"""
+        inputs = (INPUT * len(events))(*(self._to_input(e) for e in events))
+        sent = self.user32.SendInput(len(events), inputs, ctypes.sizeof(INPUT))
+        if sent != len(events):
+            print(f"SendInput 仅提交了{sent}/{len(events)}个事件({gesture})，错误码{ctypes.get_last_error()}")
+
+
+class RecordingBackend:
+    """
+    记录后端：不产生真实输入，只记录 (时间戳, 手势, 事件列表)
+
+    内存中只保留最近 RECORD_LIMIT 个手势，长时间运行内存不增长；可选写入 JSON Lines 文件(完整记录)。
+    summary() 给出点击次数、点击速率与点击间隔抖动，按运行中累计的统计量计算，不受保留条数限制。
+    """
+
+    def __init__(self, path: str | None = None):
+        self.records: deque = deque(maxlen=RECORD_LIMIT)
+        self.cursor = (0, 0)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        # --- 点击统计(累计) ---
+        self.clicks = 0
+        self._first_click = self._last_click = 0.0
+        self._interval_mean = 0.0
+        self._interval_m2 = 0.0  # 点击间隔与均值之差的平方和(Welford)
+
+    def send(self, gesture: str, events: list) -> None:
+        ts = time.perf_counter()
+        with self._lock:
+            for event in events:
+                if event[0] == 'move':
+                    self.cursor = (event[1], event[2])
+                elif event[0] == 'move_rel':
+                    self.cursor = (self.cursor[0] + event[1], self.cursor[1] + event[2])
+            self.records.append((ts, gesture, list(events)))
+            if any(e[0] == 'button' and e[1] == 'left' and e[2] for e in events):
+                self._observe_click(ts)
+            if self.path:
+                # 关闭后再次记录时重新以追加方式打开
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(json.dumps({'ts': ts, 'gesture': gesture, 'events': events}) + "\n")
+
+    def _observe_click(self, ts: float) -> None:
+        self.clicks += 1
+        if self.clicks == 1:
+            self._first_click = ts
+        else:
+            interval = ts - self._last_click
+            n = self.clicks - 1
+            delta = interval - self._interval_mean
+            self._interval_mean += delta / n
+            self._interval_m2 += delta * (interval - self._interval_mean)
+        self._last_click = ts
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def click_times(self) -> list[float]:
+        """内存中保留的(最近 RECORD_LIMIT 个)手势里包含左键按下的时间戳"""
+        with self._lock:
+            return [ts for ts, _, events in self.records
+                    if any(e[0] == 'button' and e[1] == 'left' and e[2] for e in events)]
+
+    def summary(self) -> str:
+        with self._lock:
+            clicks, span = self.clicks, self._last_click - self._first_click
+            mean, m2 = self._interval_mean, self._interval_m2
+        if clicks < 2 or span <= 0:
+            return f"记录到{clicks}次点击"
+        jitter = (m2 / (clicks - 1)) ** 0.5
+        return (f"记录到{clicks}次点击，{clicks / span:.2f}次/秒，"
+                f"点击间隔均值{mean * 1000:.1f}ms，抖动(标准差){jitter * 1000:.1f}ms")
+
+
+def default_backend():
+    """Windows 上使用 SendInput，其他平台使用记录后端"""
+    if sys.platform == 'win32':
+        return SendInputBackend()
+    return RecordingBackend()
+
+
+def create_backend(name: str | None, record_path: str | None = None):
+    """
+    按名称创建输入后端
+
+    参数:
+        name: str - 'sendinput' | 'recording'，为空时按平台选择
+        record_path: str - 记录后端的输出文件
+    """
+    if name == 'recording':
+        return RecordingBackend(record_path)
+    if name == 'sendinput':
+        return SendInputBackend()
+    return default_backend()
+
+
+class MouseKeyboardController:
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else default_backend()
+
+    def _send(self, gesture, events):
+        self.backend.send(gesture, events)
+
+    @staticmethod
+    def _key_code(key_name):
+        key_code = VIRTUAL_KEYS.get(key_name.lower())
+        if key_code is None:
+            raise ValueError(f"未找到虚拟键名称: {key_name}")
+        return key_code
 
     # 鼠标操作
     def mouse_moveTo(self, x, y):
         """设置鼠标位置"""
-        self.user32.SetCursorPos(wintypes.INT(x), wintypes.INT(y))
+        self._send('move', [('move', int(x), int(y))])
 
     def mouse_click(self, x=None, y=None, button="left"):
-        """模拟鼠标点击，可指定位置"""
+        """模拟鼠标点击，可指定位置；移动、按下、松开作为一个手势提交"""
+        if button not in BUTTON_FLAGS:
+            return
+        events = []
         if x is not None and y is not None:
-            self.mouse_moveTo(x, y)  # 设置鼠标位置
-
-        if button == "left":
-            self.user32.mouse_event(MOUSEEVENTF_LEFTDOWN, 0, 0, 0, 0)  # 按下左键
-            self.user32.mouse_event(MOUSEEVENTF_LEFTUP, 0, 0, 0, 0)    # 松开左键
-        elif button == "right":
-            self.user32.mouse_event(MOUSEEVENTF_RIGHTDOWN, 0, 0, 0, 0)  # 按下右键
-            self.user32.mouse_event(MOUSEEVENTF_RIGHTUP, 0, 0, 0, 0)    # 松开右键
+            events.append(('move', int(x), int(y)))  # 设置鼠标位置
+        events.append(('button', button, True))   # 按下
+        events.append(('button', button, False))  # 松开
+        self._send('click', events)
 
     def mouse_move(self, dx, dy):
         """相对移动鼠标"""
-        self.user32.mouse_event(MOUSEEVENTF_MOVE, wintypes.INT(dx), wintypes.INT(dy), 0, 0)
+        self._send('move_rel', [('move_rel', int(dx), int(dy))])
 
     def mouse_scroll(self, lines, x=None, y=None):
         """垂直滚轮：正数向上，负数向下；可选先移动到 (x, y)"""
+        events = []
         if x is not None and y is not None:
-            self.mouse_moveTo(x, y)
-        delta = int(lines) * WHEEL_DELTA
-        self.user32.mouse_event(MOUSEEVENTF_WHEEL, 0, 0, wintypes.INT(delta), 0)
+            events.append(('move', int(x), int(y)))
+        events.append(('wheel', int(lines) * WHEEL_DELTA))
+        self._send('scroll', events)
 
     def mouse_hscroll(self, lines):
         """水平滚轮：正数向右，负数向左"""
-        delta = int(lines) * WHEEL_DELTA
-        self.user32.mouse_event(MOUSEEVENTF_HWHEEL, 0, 0, wintypes.INT(delta), 0)
+        self._send('hscroll', [('hwheel', int(lines) * WHEEL_DELTA)])
 
     # 键盘操作
     def key_down(self, key_name):
         """通过虚拟键名称按下按键"""
-        key_code = VIRTUAL_KEYS.get(key_name.lower())
-        if key_code is not None:
-            self.user32.keybd_event(wintypes.BYTE(key_code), 0, KEYEVENTF_KEYDOWN, 0)
-        else:
-            raise ValueError(f"未找到虚拟键名称: {key_name}")
+        self._send('key_down', [('key', self._key_code(key_name), True)])
 
     def key_up(self, key_name):
         """通过虚拟键名称释放按键"""
-        key_code = VIRTUAL_KEYS.get(key_name.lower())
-        if key_code is not None:
-            self.user32.keybd_event(wintypes.BYTE(key_code), 0, KEYEVENTF_KEYUP, 0)
-        else:
-            raise ValueError(f"未找到虚拟键名称: {key_name}")
+        self._send('key_up', [('key', self._key_code(key_name), False)])
 
     def key_press(self, key_name):
-        """通过虚拟键名称模拟按键"""
-        key_code = VIRTUAL_KEYS.get(key_name.lower())
-        if key_code is not None:
-            self.key_down(key_name)
-            self.key_up(key_name)
-        else:
-            raise ValueError(f"未找到虚拟键名称: {key_name}")
+        """通过虚拟键名称模拟按键，按下与释放作为一个手势提交"""
+        key_code = self._key_code(key_name)
+        self._send('key_press', [('key', key_code, True), ('key', key_code, False)])
 
     def press_combo(self, key_names):
         """
-        模拟组合键操作：按下所有按键，然后释放所有按键
+        模拟组合键操作：按下所有按键，然后释放所有按键，整个组合作为一个手势提交
         :param key_names: 按键名称列表，例如 ["ctrl", "alt", "del"]
         """
         try:
-            # 按下所有按键
-            for key_name in key_names:
-                self.key_down(key_name)
-
-            # 按相反顺序释放所有按键
-            for key_name in reversed(key_names):
-                self.key_up(key_name)
+            codes = [self._key_code(key_name) for key_name in key_names]
         except ValueError as e:
-            print(f"组合键操作失败: {e}")
\ No newline at end of file
+            print(f"组合键操作失败: {e}")
+            return
+        # 按下所有按键，再按相反顺序释放所有按键
+        events = [('key', code, True) for code in codes] + [('key', code, False) for code in reversed(codes)]
+        self._send('combo', events)
@@ -0,0 +1,233 @@
+"""
+多客户端模块
+功能：同一台机器上同时监控多个游戏窗口。每个窗口有独立的布局、监控列表(价格区间)与数字识别先验；
+每个节拍只截取一次覆盖所有窗口识别区域的外接矩形，再分发给各客户端的识别线程，
+识别线程命中后在本线程内完成该客户端的决策
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+from lazy_import import lazy_module
+from cascade import Cascade, Stage
+import capture_planner
+from lifecycle import Lifecycle
+import detect_money
+import layout
+import metrics
+import template_bundle
+from watchlist import Watchlist
+
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+
+
+@dataclass
+class Client:
+    """一个游戏窗口"""
+    index: int
+    hwnd: int
+    layout: layout.Layout
+    watchlist: Watchlist
+    title: str = ''
+    priors: tuple = field(default_factory=lambda: (detect_money.DigitPrior(), detect_money.DigitPrior()))
+    # 购买/刷新进行中：识别线程跳过该客户端的帧，连点线程跳过该客户端
+    busy: threading.Event = field(default_factory=threading.Event)
+    decisions: int = 0
+    clicks: int = 0
+    last_refresh: float = field(default_factory=time.time)
+    cascade: Cascade | None = None  # 该客户端识别线程的检测级联，启动监测后创建
+
+    @property
+    def name(self) -> str:
+        return f"客户端{self.index + 1}"
+
+    def point(self, x: int, y: int) -> tuple[int, int]:
+        """标定坐标换算为该窗口的屏幕坐标"""
+        return self.layout.point(x, y)
+
+
+class SharedCapture:
+    """
+    所有客户端共用的截图
+
+    各客户端的价格数字区域与探测点交给截图计划(capture_planner)划分为若干截图矩形，
+    布局不变时只需计算一次；每个节拍截取一次，各客户端从同一帧中读取自己的区域。
+    """
+
+    def __init__(self, clients: list[Client]):
+        bundle = detect_money.get_bundle()
+        self._probes = {name: bundle.probe(name) for name in template_bundle.PROBES}
+        rects = {}
+        for client in clients:
+            top, left, width, height = client.layout.region(*template_bundle.DIGIT_ROI)
+            rects[(client.index, 'digits')] = (left, top, left + width, top + height)
+            for name, probe in self._probes.items():
+                px, py = client.point(*probe['point'])
+                rects[(client.index, name)] = (px, py, px + 1, py + 1)
+        self.plan = capture_planner.plan_rects(rects)
+
+    def grab(self):
+        """截取本节拍的全部截图矩形，返回 capture_planner.PlannedFrame"""
+        return self.plan.grab(eager=True)
+
+    def digits(self, frame, client: Client):
+        """从共享帧中读取客户端的价格数字区域(灰度)，转换方式与 detect_money.capture_with_mss 一致"""
+        image = frame.region((client.index, 'digits'))
+        return cv2.cvtColor(np.ascontiguousarray(image[:, :, :3]), cv2.COLOR_RGB2GRAY)
+
+    def probe(self, frame, client: Client, name: str) -> bool:
+        """从共享帧中读取客户端探测点的像素颜色并与目标颜色比较"""
+        probe = self._probes[name]
+        r, g, b = frame.pixel((client.index, name))
+        tr, tg, tb = probe['color']
+        return ((r - tr) ** 2 + (g - tg) ** 2 + (b - tb) ** 2) ** 0.5 < probe['threshold']
+
+
+class MultiClientMonitor:
+    """
+    共享截图线程 + 每个客户端一个识别线程
+
+    识别线程沿用单客户端的武装/失效/重武装逻辑：武装态下任一状态命中即调用 on_event(client, kind, price, ts)，
+    之后进入失效态，待连续 rearm_clear_consecutive 帧三种状态均不命中再重武装。
+    每帧按检测级联识别：先读取两个探测点像素，均未命中才识别价格数字。
+    暂停期间通过 suspend()/resume() 挂起截图与识别线程，恢复后各客户端进入失效态，由首个清空帧重新武装。
+    """
+
+    def __init__(self, clients: list[Client], capture: SharedCapture, on_event,
+                 poll_interval: float = 0, rearm_clear_consecutive: int = 1, thread_init=None,
+                 reorder_every: int = 100):
+        self.clients = clients
+        self.capture = capture
+        self.on_event = on_event
+        self.poll_interval = poll_interval
+        self.rearm_clear_consecutive = rearm_clear_consecutive
+        self.thread_init = thread_init  # 截图与识别线程启动时调用 thread_init('capture')
+        self.reorder_every = reorder_every
+
+        self.lifecycle = Lifecycle()
+        self._cond = threading.Condition()
+        self._frame = (0, None, 0.0)  # (序号, 帧, 截图时间)
+        self._threads: list[threading.Thread] = []
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._capture_loop, name='shared_capture', daemon=True)]
+        self._threads += [threading.Thread(target=self._client_loop, args=(client,),
+                                           name=f'client_{client.index + 1}', daemon=True)
+                          for client in self.clients]
+        self.lifecycle.workers = len(self._threads)
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self.lifecycle.stop()
+        self._wake()
+        for t in self._threads:
+            t.join(timeout=1.0)
+
+    def suspend(self, reason: str) -> None:
+        """挂起截图与识别线程，等待新帧的识别线程立即被唤醒"""
+        self.lifecycle.suspend(reason, wake=self._wake)
+
+    def resume(self) -> None:
+        """恢复截图与识别线程，挂起前截取的帧不再识别"""
+        with self._cond:
+            self._frame = (self._frame[0], None, 0.0)
+        self.lifecycle.resume()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _capture_loop(self):
+        if self.thread_init is not None:
+            self.thread_init('capture')
+        seq = 0
+        while self.lifecycle.wait_running():
+            try:
+                captured = time.perf_counter()  # 截图开始的时间，作为本帧事件的时间戳
+                frame = self.capture.grab()
+            except Exception as e:
+                print(f"共享截图失败: {e}")
+                time.sleep(0.5)
+                continue
+            seq += 1
+            with self._cond:
+                self._frame = (seq, frame, captured)
+                self._cond.notify_all()
+            metrics.frames_grabbed.inc('shared')
+            time.sleep(self.poll_interval)
+
+    def _next_frame(self, last_seq: int):
+        with self._cond:
+            self._cond.wait_for(lambda: not self.lifecycle.running or self._frame[0] > last_seq, timeout=0.5)
+            return self._frame
+
+    def _read_price(self, frame, client: Client):
+        ht, tt = detect_money.match_digits(self.capture.digits(frame, client), client.layout.scale,
+                                           digit_priors=client.priors)
+        price = None if ht[0] is None or tt[0] is None else ht[0] * 100000 + tt[0] * 10000
+        return price is not None and 100000 <= price <= 999999, price
+
+    def _client_loop(self, client: Client):
+        if self.thread_init is not None:
+            self.thread_init('capture')
+        current = [None]  # 本帧，供各检测阶段读取
+        client.cascade = Cascade([
+            Stage('no_items', lambda: (self.capture.probe(current[0], client, 'no_items'), None)),
+            Stage('seven_sep', lambda: (self.capture.probe(current[0], client, 'seven_sep'), None)),
+            Stage('six_digits', lambda: self._read_price(current[0], client), last=True),
+        ], self.reorder_every)
+        last_seq = 0
+        armed = True
+        clear_cnt = 0
+        epoch = self.lifecycle.epoch
+        while self.lifecycle.wait_running():
+            if epoch != self.lifecycle.epoch:
+                # 恢复后挂起前的帧与计数作废，进入失效态等待清空帧
+                epoch, armed, clear_cnt = self.lifecycle.epoch, False, 0
+            seq, frame, ts = self._next_frame(last_seq)
+            if seq == last_seq:
+                continue
+            last_seq = seq
+            if frame is None or client.busy.is_set() or not self.lifecycle.running:
+                continue
+
+            current[0] = frame
+            with metrics.timed(metrics.watcher_seconds, client.name):
+                kind, price = client.cascade.evaluate()
+
+            if armed:
+                if kind is not None:
+                    armed = False
+                    clear_cnt = 0
+                    metrics.detections.inc(kind)
+                    self.on_event(client, kind, price, ts)
+            elif kind is None:
+                clear_cnt += 1
+                if clear_cnt >= self.rearm_clear_consecutive:
+                    armed = True
+                    metrics.rearms.inc()
+            else:
+                clear_cnt = 0
+
+
+def report(clients: list[Client], elapsed: float) -> str:
+    """生成各客户端每秒决策数与连点数报告，有客户端完全没有连点时给出警告"""
+    elapsed = max(elapsed, 1e-9)
+    total = sum(c.decisions for c in clients)
+    lines = [f"多客户端模式：{len(clients)}个客户端，总计决策{total}次，合计{total / elapsed:.2f}次/秒，"
+             f"平均每客户端{total / elapsed / max(1, len(clients)):.2f}次/秒"]
+    for c in clients:
+        lines.append(f"- {c.name} '{c.title}' 布局偏移({c.layout.offset_x},{c.layout.offset_y}) "
+                     f"缩放{c.layout.scale:.2f}：决策{c.decisions}次，{c.decisions / elapsed:.2f}次/秒，"
+                     f"连点{c.clicks}次")
+        if c.cascade is not None:
+            lines.append(c.cascade.report(f"  {c.name}检测级联"))
+    # 连点按客户端合并，各客户端都应有连点；为0说明该客户端的连点一直被其他客户端挡住
+    starved = [c.name for c in clients if c.clicks == 0]
+    if starved:
+        lines.append(f"警告：{'、'.join(starved)}本次没有任何连点")
+    return "\n".join(lines)
@@ -0,0 +1,232 @@
+"""
+价格统计模块
+功能：在整个会话中以固定内存流式统计每个槽位识别到的价格分布、分位数，
+以及价格区间内物品的出现间隔，定期写入JSON快照，用于合理设置 expected_price_1/2
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import math
+import os
+import threading
+import time
+
+from watchlist import PRICE_UNIT, PRICE_BUCKETS
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 区间内物品出现间隔的直方图上界(秒)，最后一档为超出上界
+GAP_BUCKETS = (1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)
+# 报告与快照中输出的分位数
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+class SlotPriceStats:
+    """
+    单个槽位的流式统计，内存大小固定
+
+    价格只识别到万位，0 ~ 990000 共 PRICE_BUCKETS 档，直方图即可精确给出分位数；
+    出现间隔用 Welford 算法累计均值与方差，另以固定分档直方图记录分布。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts = [0] * PRICE_BUCKETS
+        self.observations = 0
+        self.in_range = 0
+        self.last_hit_ts: float | None = None
+        self.gap_count = 0
+        self.gap_mean = 0.0
+        self.gap_m2 = 0.0
+        self.gap_min = math.inf
+        self.gap_max = 0.0
+        self.gap_bins = [0] * (len(GAP_BUCKETS) + 1)
+
+    def observe(self, price: int, hit: bool, ts: float) -> None:
+        bucket = price // PRICE_UNIT
+        if 0 <= bucket < PRICE_BUCKETS:
+            self.counts[bucket] += 1
+        self.observations += 1
+        if not hit:
+            return
+        self.in_range += 1
+        if self.last_hit_ts is not None:
+            self._observe_gap(ts - self.last_hit_ts)
+        self.last_hit_ts = ts
+
+    def _observe_gap(self, gap: float) -> None:
+        self.gap_count += 1
+        delta = gap - self.gap_mean
+        self.gap_mean += delta / self.gap_count
+        self.gap_m2 += delta * (gap - self.gap_mean)
+        self.gap_min = min(self.gap_min, gap)
+        self.gap_max = max(self.gap_max, gap)
+        for i, bound in enumerate(GAP_BUCKETS):
+            if gap <= bound:
+                self.gap_bins[i] += 1
+                break
+        else:
+            self.gap_bins[-1] += 1
+
+    def quantile(self, q: float, counts: list[int] | None = None) -> int | None:
+        """返回价格分位数，没有数据时返回None"""
+        counts = self.counts if counts is None else counts
+        total = sum(counts)
+        if total == 0:
+            return None
+        target = q * total
+        cumulative = 0
+        for bucket, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= target and count:
+                return bucket * PRICE_UNIT
+        return (PRICE_BUCKETS - 1) * PRICE_UNIT
+
+    def state(self) -> dict:
+        """原始累计量，供会话检查点保存；上次命中时间基于本进程的 perf_counter，不保存"""
+        return {
+            'counts': {str(bucket): count for bucket, count in enumerate(self.counts) if count},
+            'observations': self.observations,
+            'in_range': self.in_range,
+            'gap_count': self.gap_count,
+            'gap_mean': self.gap_mean,
+            'gap_m2': self.gap_m2,
+            'gap_min': self.gap_min if self.gap_count else None,
+            'gap_max': self.gap_max,
+            'gap_bins': list(self.gap_bins),
+        }
+
+    def restore(self, state: dict) -> None:
+        self.counts = [0] * PRICE_BUCKETS
+        for bucket, count in state['counts'].items():
+            self.counts[int(bucket)] = count
+        self.observations = state['observations']
+        self.in_range = state['in_range']
+        self.gap_count = state['gap_count']
+        self.gap_mean = state['gap_mean']
+        self.gap_m2 = state['gap_m2']
+        self.gap_min = math.inf if state['gap_min'] is None else state['gap_min']
+        self.gap_max = state['gap_max']
+        self.gap_bins = list(state['gap_bins'])
+
+    def snapshot(self) -> dict:
+        # 复制一份计数再计算，主线程可能同时在更新
+        counts = list(self.counts)
+        gap_std = math.sqrt(self.gap_m2 / (self.gap_count - 1)) if self.gap_count > 1 else 0.0
+        return {
+            'observations': self.observations,
+            'in_range': self.in_range,
+            'quantiles': {f'p{int(q * 100)}': self.quantile(q, counts) for q in QUANTILES},
+            'histogram': {str(bucket * PRICE_UNIT): count for bucket, count in enumerate(counts) if count},
+            'in_range_gap_seconds': {
+                'count': self.gap_count,
+                'mean': round(self.gap_mean, 3),
+                'std': round(gap_std, 3),
+                'min': round(self.gap_min, 3) if self.gap_count else None,
+                'max': round(self.gap_max, 3),
+                'histogram': {f'<={bound}': count for bound, count in zip(GAP_BUCKETS, self.gap_bins)}
+                             | {f'>{GAP_BUCKETS[-1]}': self.gap_bins[-1]},
+            },
+        }
+
+
+class PriceStats:
+    """
+    会话价格统计
+
+    只由主线程调用 observe() 更新，热路径上不加锁；后台线程定期读取并写入快照，
+    快照中各字段之间允许存在一次更新的偏差。
+    """
+
+    def __init__(self, slot_names: list[str], snapshot_interval: float = 60, path: str | None = None):
+        self._by_name: dict[str, SlotPriceStats] = {}  # 本次会话出现过的全部槽位，快照与报告包含已移出的槽位
+        self.slots: list[SlotPriceStats] = []
+        self.set_slots(slot_names)
+        self.snapshot_interval = snapshot_interval
+        if path is None:
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            path = os.path.join(BASE_DIR, 'logs', f"price_stats_{timestamp}.json")
+        self.path = path
+        self.started_at = time.time()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def set_slots(self, slot_names: list[str]) -> None:
+        """设置当前监控列表的槽位；监控列表变化(如协调服务重新分配槽位)时按槽位名保留已有统计，仅由主线程调用"""
+        self.slots = [self._by_name.setdefault(name, SlotPriceStats(name)) for name in slot_names]
+
+    def observe(self, index: int, price: int, hit: bool, ts: float | None = None) -> None:
+        """记录指定槽位识别到的一个价格"""
+        self.slots[index].observe(price, hit, time.perf_counter() if ts is None else ts)
+
+    def snapshot(self) -> dict:
+        return {
+            'started_at': datetime.datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'elapsed_seconds': round(time.time() - self.started_at, 1),
+            'slots': {s.name: s.snapshot() for s in list(self._by_name.values())},
+        }
+
+    def state(self) -> dict:
+        """全部槽位的原始累计量，供会话检查点保存"""
+        return {'path': self.path, 'started_at': self.started_at,
+                'slots': {s.name: s.state() for s in list(self._by_name.values())}}
+
+    def restore(self, state: dict) -> None:
+        """从会话检查点恢复统计，继续写入原快照文件；仅由主线程在会话开始时调用"""
+        self.path = state['path']
+        self.started_at = state['started_at']
+        for name, saved in state['slots'].items():
+            self._by_name.setdefault(name, SlotPriceStats(name)).restore(saved)
+
+    def write_snapshot(self) -> None:
+        """原子写入快照文件"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"价格统计快照写入失败: {e}")
+
+    def start(self) -> None:
+        if self.snapshot_interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止快照线程并写入最终快照"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.write_snapshot()
+
+    def _run(self):
+        while not self._stop.wait(self.snapshot_interval):
+            self.write_snapshot()
+
+    def report(self) -> str:
+        """生成各槽位价格分位数与区间内物品出现间隔报告"""
+        lines = [f"价格统计已保存到 {self.path}"]
+        for s in self._by_name.values():
+            if not s.observations:
+                lines.append(f"- {s.name}: 未识别到价格")
+                continue
+            quantiles = "，".join(f"p{int(q * 100)} {s.quantile(q)}" for q in QUANTILES)
+            line = f"- {s.name}: 识别{s.observations}次，区间内{s.in_range}次；价格 {quantiles}"
+            if s.gap_count:
+                line += f"；区间内物品平均间隔{s.gap_mean:.1f}秒"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def load_price_stats(config, slot_names: list[str]) -> PriceStats | None:
+    """从配置文件 [stats] 读取参数，未启用时返回None"""
+    if not config.getboolean('stats', 'enabled', fallback=True):
+        return None
+    return PriceStats(slot_names, snapshot_interval=config.getfloat('stats', 'snapshot_interval', fallback=60))
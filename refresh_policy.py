@@ -0,0 +1,103 @@
+"""
+自适应刷新策略模块
+功能：统计点击收藏槽位后物品界面的渲染延迟与卡帧比例，界面明显变慢时提前触发模式切换刷新
+"""
+import time
+from collections import deque
+from statistics import median
+
+
+class AdaptiveRefreshPolicy:
+    """
+    跟踪交易行界面的响应情况
+
+    - 渲染延迟：连点线程发出本轮第一次点击，到监测线程识别到物品界面的时间
+    - 卡帧：点击后超过 stale_timeout 秒仍未识别到任何界面状态
+
+    最近 window 次结果中，渲染延迟中位数或卡帧比例超过阈值时视为界面退化。
+    固定的 execution_time_single 仍作为刷新间隔上限。
+    """
+
+    def __init__(self, enabled: bool = True, latency_threshold: float = 0.8,
+                 stale_ratio_threshold: float = 0.3, stale_timeout: float = 1.5,
+                 min_interval: float = 20, window: int = 20, min_samples: int = 8):
+        self.enabled = enabled
+        self.latency_threshold = latency_threshold
+        self.stale_ratio_threshold = stale_ratio_threshold
+        self.stale_timeout = stale_timeout
+        self.min_interval = min_interval
+        self.min_samples = min_samples
+
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._stale: deque[bool] = deque(maxlen=window)
+        self._awaiting_since: float | None = None  # 本轮第一次点击的时间，由连点线程写入
+
+    def on_click(self) -> None:
+        """连点线程每次点击后调用，只记录本轮的第一次点击"""
+        if self._awaiting_since is None:
+            self._awaiting_since = time.perf_counter()
+
+    def on_render(self, event_ts: float) -> None:
+        """主线程取到界面事件时调用，event_ts 为监测线程截取该界面帧的开始时间"""
+        since = self._awaiting_since
+        self._awaiting_since = None
+        if since is not None and event_ts >= since:
+            self._latencies.append(event_ts - since)
+            self._stale.append(False)
+
+    def check_stale(self) -> None:
+        """主线程等待事件超时时调用，点击后长时间无界面变化则记为一次卡帧"""
+        since = self._awaiting_since
+        if since is not None and time.perf_counter() - since > self.stale_timeout:
+            self._stale.append(True)
+            self._awaiting_since = None
+
+    def discard_pending(self) -> None:
+        """暂停、购买等主动停止连点的场景下，丢弃未完成的本轮计时"""
+        self._awaiting_since = None
+
+    def reset(self) -> None:
+        """刷新完成后清空历史数据"""
+        self._latencies.clear()
+        self._stale.clear()
+        self._awaiting_since = None
+
+    def stats(self) -> tuple[float | None, float | None]:
+        """返回 (渲染延迟中位数, 卡帧比例)，样本不足时为None"""
+        latency = median(self._latencies) if self._latencies else None
+        stale_ratio = sum(self._stale) / len(self._stale) if self._stale else None
+        return latency, stale_ratio
+
+    def should_refresh(self, elapsed: float, max_interval: float) -> str | None:
+        """
+        判断是否需要刷新
+
+        参数:
+            elapsed: float - 距上次刷新的秒数
+            max_interval: float - 刷新间隔上限(execution_time_single)
+
+        返回:
+            str 或 None: 需要刷新时返回原因，否则返回None
+        """
+        if elapsed > max_interval:
+            return "达到刷新间隔上限"
+        if not self.enabled or elapsed < self.min_interval or len(self._stale) < self.min_samples:
+            return None
+
+        latency, stale_ratio = self.stats()
+        if latency is not None and latency > self.latency_threshold:
+            return f"渲染延迟中位数{latency:.2f}秒超过阈值"
+        if stale_ratio is not None and stale_ratio > self.stale_ratio_threshold:
+            return f"卡帧比例{stale_ratio:.0%}超过阈值"
+        return None
+
+
+def load_refresh_policy(config) -> AdaptiveRefreshPolicy:
+    """从配置文件 [schedule] 读取自适应刷新参数，未配置时使用默认值"""
+    return AdaptiveRefreshPolicy(
+        enabled=config.getboolean('schedule', 'adaptive_refresh', fallback=True),
+        latency_threshold=config.getfloat('schedule', 'render_latency_threshold', fallback=0.8),
+        stale_ratio_threshold=config.getfloat('schedule', 'stale_ratio_threshold', fallback=0.3),
+        stale_timeout=config.getfloat('schedule', 'stale_timeout', fallback=1.5),
+        min_interval=config.getfloat('schedule', 'min_refresh_interval', fallback=20),
+    )
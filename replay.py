@@ -0,0 +1,204 @@
+"""
+决策对比回放模块
+功能：将 roi_recorder 录制的价格数字截图分别交给两套识别配置(引擎、阈值、模板包)识别，
+按价格区间得出 购买/跳过/无价格 决策，逐帧对比并列出决策不同的全部帧，同时统计各配置的识别吞吐量；
+多个录制文件分配到多个进程并行回放，用于在上线新引擎或新阈值前确认其在真实数据上的决策变化
+
+识别配置写法：引擎[:阈值][@模板包路径]
+    引擎见 sweep.ENGINES；不写阈值时使用模板包中按数字给出的阈值；不写模板包时与运行时相同(存在校准模板包时优先使用)
+    例如 ordered(运行时配置)、vectorized:0.93、ordered@image/templates.bin
+
+用法：
+    python replay.py logs/roi_*.bin --b vectorized:0.93 [--a ordered] [--low 100000 --high 400000] [--workers N]
+    存在决策不同的帧时退出码为1，可直接用作上线前的回归检查
+"""
+from __future__ import annotations
+
+import argparse
+import configparser
+import datetime
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from lazy_import import lazy_module
+import calibrate
+import layout
+import roi_recorder
+import sweep
+import template_bundle
+
+np = lazy_module('numpy')
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 终端中最多列出的差异帧数，全部差异写入结果文件
+SHOW_DIFFS = 50
+
+
+@dataclass(frozen=True)
+class EngineConfig:
+    engine: str
+    threshold: float | None = None  # None 使用模板包中按数字给出的阈值
+    pack: str | None = None         # None 与运行时相同
+
+    @property
+    def label(self) -> str:
+        label = self.engine
+        if self.threshold is not None:
+            label += f":{self.threshold}"
+        if self.pack is not None:
+            label += f"@{self.pack}"
+        return label
+
+
+def parse_config(spec: str) -> EngineConfig:
+    """解析 引擎[:阈值][@模板包路径]"""
+    spec, _, pack = spec.partition('@')
+    engine, _, threshold = spec.partition(':')
+    if engine not in sweep.ENGINES:
+        raise ValueError(f"未知的引擎 {engine}，可选 {', '.join(sweep.ENGINES)}")
+    return EngineConfig(engine, float(threshold) if threshold else None, pack or None)
+
+
+class Decoder:
+    """
+    按一套识别配置识别价格，与运行时 detect_six_digits_hundred_thousands_and_ten_thousands 相同：
+    十万位与万位各自匹配，任一位低于阈值时无价格；十万位与万位各有一份识别函数(先验各自独立)
+    """
+
+    def __init__(self, config: EngineConfig, scale: float):
+        bundle = template_bundle.load_bundle() if config.pack is None else template_bundle.open_bundle(config.pack)
+        templates = bundle.digits
+        if scale != 1.0:
+            templates = {num: layout.scale_template(t, scale) for num, t in templates.items()}
+        self.width = templates[0].shape[1]
+        self.thresholds = {i: config.threshold if config.threshold is not None
+                           else bundle.threshold(f'digit_{i}', template_bundle.DIGIT_THRESHOLD) for i in range(10)}
+        self._hundred_thousands = sweep.ENGINES[config.engine](templates)
+        self._ten_thousands = sweep.ENGINES[config.engine](templates)
+        self.seconds = 0.0
+
+    def decode(self, frame) -> int | None:
+        started = time.perf_counter()
+        ht, ht_score = self._hundred_thousands(frame[:, :self.width])
+        tt, tt_score = self._ten_thousands(frame[:, -self.width:])
+        self.seconds += time.perf_counter() - started
+        if ht_score < self.thresholds[ht] or tt_score < self.thresholds[tt]:
+            return None
+        return ht * 100000 + tt * 10000
+
+
+def decide(price: int | None, low: int, high: int) -> str:
+    """与主循环一致：识别出六位价格且在区间内购买，六位价格不在区间内跳过，否则无价格"""
+    if price is None or not 100000 <= price <= 999999:
+        return 'none'
+    return 'buy' if low <= price <= high else 'skip'
+
+
+def replay_file(path: str, config_a: EngineConfig, config_b: EngineConfig, low: int, high: int) -> dict:
+    """进程池任务：回放一个录制文件"""
+    header, frames = roi_recorder.read_frames(path)
+    scale = header.get('scale', 1.0)
+    decoder_a, decoder_b = Decoder(config_a, scale), Decoder(config_b, scale)
+    total = price_diffs = 0
+    diffs = []
+    for index, (ts, frame) in enumerate(frames):
+        total += 1
+        price_a, price_b = decoder_a.decode(frame), decoder_b.decode(frame)
+        if price_a == price_b:
+            continue
+        price_diffs += 1
+        decision_a, decision_b = decide(price_a, low, high), decide(price_b, low, high)
+        if decision_a != decision_b:
+            diffs.append({'file': path, 'frame': index, 'ts': ts, 'a_price': price_a, 'b_price': price_b,
+                          'a_decision': decision_a, 'b_decision': decision_b,
+                          'buy_changed': 'buy' in (decision_a, decision_b)})
+    return {'file': path, 'frames': total, 'price_diffs': price_diffs, 'diffs': diffs,
+            'a_seconds': decoder_a.seconds, 'b_seconds': decoder_b.seconds}
+
+
+def default_price_range() -> tuple[int | None, int | None]:
+    """读取 config.ini 的价格区间，文件不存在时返回 (None, None)"""
+    config = configparser.ConfigParser()
+    path = os.path.join(BASE_DIR, 'config.ini')
+    if not os.path.exists(path):
+        return None, None
+    with open(path, encoding='utf-8') as f:
+        config.read_file(f)
+    return (config.getint('limit', 'expected_price_1', fallback=None),
+            config.getint('limit', 'expected_price_2', fallback=None))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="以两套识别配置回放录制截图并对比购买决策")
+    parser.add_argument('recordings', nargs='+', help="roi_recorder 录制文件，支持通配符")
+    parser.add_argument('--a', default='ordered', help="基准配置，默认与运行时相同")
+    parser.add_argument('--b', required=True, help="对比配置")
+    parser.add_argument('--low', type=int, default=None, help="价格下限，默认读取 config.ini")
+    parser.add_argument('--high', type=int, default=None, help="价格上限，默认读取 config.ini")
+    parser.add_argument('--workers', type=int, default=None, help="进程数，默认为CPU核数")
+    parser.add_argument('--output', default=None, help="结果JSON路径，默认 logs/replay_diff_时间戳.json")
+    args = parser.parse_args(argv)
+
+    config_a, config_b = parse_config(args.a), parse_config(args.b)
+    default_low, default_high = default_price_range()
+    low = args.low if args.low is not None else default_low
+    high = args.high if args.high is not None else default_high
+    if low is None or high is None:
+        parser.error("未找到 config.ini，需要通过 --low/--high 指定价格区间")
+    paths = calibrate.expand_paths(args.recordings)
+    if not paths:
+        print("没有匹配的录制文件")
+        return 1
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(replay_file, paths, [config_a] * len(paths), [config_b] * len(paths),
+                                    [low] * len(paths), [high] * len(paths)))
+    wall = time.perf_counter() - started
+
+    frames = sum(r['frames'] for r in results)
+    diffs = [d for r in results for d in r['diffs']]
+    a_seconds = sum(r['a_seconds'] for r in results)
+    b_seconds = sum(r['b_seconds'] for r in results)
+    throughput = {
+        config_a.label: frames / a_seconds if a_seconds else None,
+        config_b.label: frames / b_seconds if b_seconds else None,
+    }
+
+    print(f"回放{len(paths)}个文件共{frames}帧，价格区间[{low},{high}]，耗时{wall:.1f}秒"
+          f"(合计{frames / max(wall, 1e-9):.0f}帧/秒)")
+    print(f"A={config_a.label}：{throughput[config_a.label] or 0:.0f}帧/秒(单进程识别耗时)")
+    print(f"B={config_b.label}：{throughput[config_b.label] or 0:.0f}帧/秒(单进程识别耗时)")
+    print(f"价格不同{sum(r['price_diffs'] for r in results)}帧，其中决策不同{len(diffs)}帧，"
+          f"涉及购买{sum(1 for d in diffs if d['buy_changed'])}帧")
+    for d in diffs[:SHOW_DIFFS]:
+        print(f"- {os.path.basename(d['file'])} 第{d['frame']}帧 ts={d['ts']:.3f}：A {d['a_price']}({d['a_decision']})"
+              f" / B {d['b_price']}({d['b_decision']})")
+    if len(diffs) > SHOW_DIFFS:
+        print(f"... 其余{len(diffs) - SHOW_DIFFS}帧见结果文件")
+
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output = args.output or os.path.join(BASE_DIR, 'logs', f"replay_diff_{timestamp}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'a': config_a.label,
+            'b': config_b.label,
+            'price_range': [low, high],
+            'files': [{k: v for k, v in r.items() if k != 'diffs'} for r in results],
+            'frames': frames,
+            'wall_seconds': round(wall, 3),
+            'decode_frames_per_second': throughput,
+            'diffs': diffs,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {output}")
+    return 1 if diffs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
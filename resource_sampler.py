@@ -0,0 +1,162 @@
+"""
+资源采样模块
+功能：长时间运行时，后台周期性采集脚本进程与游戏进程的内存、句柄、线程数和CPU占用，
+写入CSV时间序列，并在指标持续单调增长时发出告警，用于排查泄漏和规划重启
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import datetime
+from collections import deque
+from typing import NamedTuple
+
+from lazy_import import lazy_module
+
+psutil = lazy_module('psutil')
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ResourceSample(NamedTuple):
+    ts: float
+    rss_mb: float
+    handles: int    # Windows为句柄数，其他系统为文件描述符数
+    threads: int
+    cpu: float      # 进程CPU占用百分比
+
+
+def sample_process(process: psutil.Process) -> ResourceSample:
+    """采集单个进程的资源占用"""
+    with process.oneshot():
+        rss_mb = process.memory_info().rss / (1024 * 1024)
+        handles = process.num_handles() if psutil.WINDOWS else process.num_fds()
+        threads = process.num_threads()
+        cpu = process.cpu_percent(interval=None)
+    return ResourceSample(time.time(), rss_mb, handles, threads, cpu)
+
+
+class ResourceSampler:
+    """
+    后台资源采样线程
+
+    每个进程保留最近 window 个样本；某项指标在这 window 个样本内单调不减，
+    且累计增长超过对应阈值时输出一次告警，指标回落后重新允许告警。
+    """
+
+    # 参与单调增长检测的指标
+    GROWTH_FIELDS = ('rss_mb', 'handles', 'threads')
+
+    def __init__(self, interval: float = 30, window: int = 20, rss_growth_mb: float = 300,
+                 handle_growth: int = 1000, thread_growth: int = 20, csv_path: str | None = None):
+        self.interval = interval
+        self.window = window
+        self.thresholds = {'rss_mb': rss_growth_mb, 'handles': handle_growth, 'threads': thread_growth}
+
+        if csv_path is None:
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            csv_path = os.path.join(BASE_DIR, 'logs', f"resource_{timestamp}.csv")
+        self.csv_path = csv_path
+
+        self._targets: dict[str, psutil.Process] = {'script': psutil.Process(os.getpid())}
+        self._history: dict[str, deque[ResourceSample]] = {}
+        self._first: dict[str, ResourceSample] = {}
+        self._alerted: set[tuple[str, str]] = set()
+        self._lock = threading.Lock()  # 保护 _targets，采样线程与主线程共享
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def set_game_pid(self, pid: int | None) -> None:
+        """设置或更新游戏进程PID（游戏重启后PID会变化）"""
+        with self._lock:
+            if pid:
+                try:
+                    self._targets['game'] = psutil.Process(pid)
+                except psutil.NoSuchProcess:
+                    self._targets.pop('game', None)
+            else:
+                self._targets.pop('game', None)
+            self._history.pop('game', None)
+            self._first.pop('game', None)
+
+    def start(self) -> None:
+        os.makedirs(os.path.dirname(self.csv_path), exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        with open(self.csv_path, "a", encoding="utf-8") as f:
+            if f.tell() == 0:
+                f.write("ts,target,pid,rss_mb,handles,threads,cpu\n")
+            while not self._stop.is_set():
+                for name, process, sample in self._sample_all():
+                    f.write(f"{sample.ts:.0f},{name},{process.pid},{sample.rss_mb:.1f},"
+                            f"{sample.handles},{sample.threads},{sample.cpu:.1f}\n")
+                    self._check_growth(name, sample)
+                f.flush()
+                self._stop.wait(self.interval)
+
+    def _sample_all(self):
+        with self._lock:
+            targets = list(self._targets.items())
+        for name, process in targets:
+            try:
+                sample = sample_process(process)
+            except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+                print(f"资源采样失败({name}): {e}")
+                if name == 'game':
+                    self.set_game_pid(None)
+                continue
+            yield name, process, sample
+
+    def _check_growth(self, name: str, sample: ResourceSample) -> None:
+        """单调增长检测"""
+        self._first.setdefault(name, sample)
+        history = self._history.setdefault(name, deque(maxlen=self.window))
+        history.append(sample)
+        if len(history) < self.window:
+            return
+
+        for field in self.GROWTH_FIELDS:
+            values = [getattr(s, field) for s in history]
+            monotonic = all(b >= a for a, b in zip(values, values[1:]))
+            growth = values[-1] - values[0]
+            key = (name, field)
+            if monotonic and growth > self.thresholds[field]:
+                if key not in self._alerted:
+                    self._alerted.add(key)
+                    minutes = (history[-1].ts - history[0].ts) / 60
+                    print(f"资源告警：{name}进程的{field}在{minutes:.0f}分钟内持续增长"
+                          f"{values[0]:.0f} -> {values[-1]:.0f}，可能存在泄漏，建议计划重启")
+            elif not monotonic:
+                self._alerted.discard(key)
+
+    def report(self) -> str:
+        """生成首末样本对比报告"""
+        lines = [f"资源采样记录已保存到 {self.csv_path}"]
+        for name, history in self._history.items():
+            first, last = self._first[name], history[-1]
+            lines.append(f"- {name}: 内存 {first.rss_mb:.0f}MB -> {last.rss_mb:.0f}MB，"
+                         f"句柄 {first.handles} -> {last.handles}，线程 {first.threads} -> {last.threads}")
+        return "\n".join(lines)
+
+
+def load_resource_sampler(config) -> ResourceSampler | None:
+    """从配置文件 [resource] 读取采样参数，未启用时返回None"""
+    if not config.getboolean('resource', 'enabled', fallback=True):
+        return None
+    return ResourceSampler(
+        interval=config.getfloat('resource', 'interval', fallback=30),
+        window=config.getint('resource', 'window', fallback=20),
+        rss_growth_mb=config.getfloat('resource', 'rss_growth_mb', fallback=300),
+        handle_growth=config.getint('resource', 'handle_growth', fallback=1000),
+        thread_growth=config.getint('resource', 'thread_growth', fallback=20),
+    )
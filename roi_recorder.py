@@ -0,0 +1,126 @@
+"""
+截图区域录制模块
+功能：把价格数字识别区域的灰度截图按帧追加到二进制文件，用于离线复现识别结果、
+对比不同匹配策略是否与全量扫描完全一致
+
+文件格式：
+    4字节魔数 b'DFRR' + 4字节小端头部长度 + UTF-8 JSON头部(帧尺寸、布局缩放比例)
+    + 若干定长帧：8字节小端 float64 时间戳 + 帧原始字节
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import struct
+import threading
+import time
+
+from lazy_import import lazy_module
+
+np = lazy_module('numpy')
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MAGIC = b'DFRR'
+TS_FORMAT = '<d'
+TS_SIZE = struct.calcsize(TS_FORMAT)
+
+
+class RoiRecorder:
+    """
+    定长帧录制器
+
+    帧尺寸在写入第一帧时确定；之后尺寸不同的帧（布局变化）不再写入并计入 skipped。
+    与上一帧完全相同的帧不重复写入，静止界面不会占用空间。
+    """
+
+    def __init__(self, path: str, scale: float = 1.0, max_frames: int = 200000):
+        self.path = path
+        self.scale = scale
+        self.max_frames = max_frames
+        self.frames = 0
+        self.skipped = 0
+        self._shape: tuple[int, ...] | None = None
+        self._last: bytes | None = None
+        self._file = None
+        self._lock = threading.Lock()  # 多个监测线程可能同时写入
+
+    def _open(self, frame) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        header = json.dumps({'shape': list(frame.shape), 'dtype': str(frame.dtype),
+                             'scale': self.scale}).encode('utf-8')
+        self._file = open(self.path, 'wb')
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self._shape = frame.shape
+
+    def write(self, frame, ts: float | None = None) -> bool:
+        """追加一帧，返回是否实际写入"""
+        with self._lock:
+            if self.frames >= self.max_frames:
+                return False
+            if self._file is None:
+                self._open(frame)
+            if frame.shape != self._shape:
+                self.skipped += 1
+                return False
+            data = np.ascontiguousarray(frame).tobytes()
+            if data == self._last:
+                return False
+            self._last = data
+            self._file.write(struct.pack(TS_FORMAT, time.time() if ts is None else ts) + data)
+            self.frames += 1
+            return True
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def report(self) -> str:
+        return f"截图区域录制已保存到 {self.path}：{self.frames}帧，尺寸不符跳过{self.skipped}帧"
+
+
+def read_header(path: str) -> tuple[dict, int]:
+    """读取头部，返回 (头部字典, 帧数据起始偏移)"""
+    with open(path, 'rb') as f:
+        if f.read(4) != MAGIC:
+            raise ValueError(f"不是截图区域录制文件: {path}")
+        (length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length).decode('utf-8'))
+    return header, 8 + length
+
+
+def read_frames(path: str):
+    """
+    逐帧读取录制文件
+
+    返回:
+        tuple: (头部字典, 生成器，依次产生 (时间戳, 帧))
+    """
+    header, start = read_header(path)
+    shape, dtype = tuple(header['shape']), np.dtype(header['dtype'])
+    frame_size = int(np.prod(shape)) * dtype.itemsize
+
+    def frames():
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while True:
+                record = f.read(TS_SIZE + frame_size)
+                if len(record) < TS_SIZE + frame_size:
+                    return
+                (ts,) = struct.unpack_from(TS_FORMAT, record)
+                yield ts, np.frombuffer(record, dtype=dtype, offset=TS_SIZE).reshape(shape)
+
+    return header, frames()
+
+
+def load_roi_recorder(config, scale: float = 1.0, prefix: str = 'roi') -> RoiRecorder | None:
+    """从配置文件 [record] 读取录制参数，未启用时返回None；文件保存为 logs/前缀_时间戳.bin"""
+    if not config.getboolean('record', 'roi_enabled', fallback=False):
+        return None
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    return RoiRecorder(os.path.join(BASE_DIR, 'logs', f"{prefix}_{timestamp}.bin"), scale,
+                       max_frames=config.getint('record', 'roi_max_frames', fallback=200000))
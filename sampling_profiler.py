@@ -0,0 +1,131 @@
+"""
+采样分析模块
+功能：运行中按需启动的低开销采样分析器，周期性读取所有线程的调用栈（sys._current_frames），
+在设定时长后写出折叠栈文件(collapsed stack)，可直接用 flamegraph.pl 或 speedscope 生成火焰图，
+用于在不重启、不丢失现场的情况下定位监测循环变慢的原因
+"""
+from __future__ import annotations
+
+import collections
+import datetime
+import os
+import sys
+import threading
+import time
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, max_depth: int = 64) -> tuple[str, ...]:
+    """由栈顶帧向下遍历，返回从最外层到最内层的函数标签"""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+class SamplingProfiler:
+    """
+    采样分析器
+
+    每 interval 秒采样一次全部线程（不含自身）的调用栈，按 "线程名;外层函数;...;内层函数" 聚合计数；
+    运行 duration 秒或调用 stop() 后写出折叠栈文件。采样期间只持有 GIL 很短时间，不影响被分析线程的逻辑。
+    """
+
+    def __init__(self, interval: float = 0.005, duration: float = 30, path: str | None = None):
+        self.interval = interval
+        self.duration = duration
+        self.path = path
+        self.samples = 0
+        self._stacks: collections.Counter[tuple[str, ...]] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()  # 保护启动/停止，热键回调与主线程可能同时调用
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """开始采样，已在运行时返回False"""
+        with self._lock:
+            if self.running:
+                return False
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            self._output = self.path or os.path.join(BASE_DIR, 'logs', f"profile_{timestamp}.folded")
+            self.samples = 0
+            self._stacks.clear()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling_profiler', daemon=True)
+            self._thread.start()
+        print(f"采样分析开始：{self.duration:.0f}秒，间隔{self.interval * 1000:.0f}毫秒")
+        return True
+
+    def stop(self) -> None:
+        """提前结束采样并写出结果"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5.0)
+
+    def toggle(self) -> None:
+        """热键回调：未运行时开始，运行中时提前结束"""
+        if not self.start():
+            self.stop()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        deadline = time.perf_counter() + self.duration
+        while not self._stop.is_set() and time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                self._stacks[(names.get(ident, str(ident)),) + collapse_stack(frame)] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+        self._write()
+
+    def _write(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self._output), exist_ok=True)
+            with open(self._output, 'w', encoding='utf-8') as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f"{';'.join(stack)} {count}\n")
+        except OSError as e:
+            print(f"采样分析结果写入失败: {e}")
+            return
+        print(self.report())
+
+    def report(self, top: int = 10) -> str:
+        """按函数自身耗时(栈顶出现次数)排序的摘要"""
+        own = collections.Counter()
+        for stack, count in self._stacks.items():
+            own[(stack[0], stack[-1])] += count
+        lines = [f"采样分析结果已保存到 {self._output}：共采样{self.samples}次"]
+        for (thread_name, label), count in own.most_common(top):
+            lines.append(f"- [{thread_name}] {label}: {count / max(1, self.samples):.1%}")
+        return "\n".join(lines)
+
+
+def load_profiler(config) -> tuple[SamplingProfiler, str, bool]:
+    """
+    从配置文件 [profiler] 读取参数
+
+    返回:
+        tuple: (分析器, 热键(空字符串表示不注册), 是否在每次任务开始时自动启动)
+    """
+    profiler = SamplingProfiler(
+        interval=config.getfloat('profiler', 'interval', fallback=0.005),
+        duration=config.getfloat('profiler', 'duration', fallback=30),
+    )
+    hotkey = config.get('profiler', 'hotkey', fallback='ctrl+shift+p').strip()
+    return profiler, hotkey, config.getboolean('profiler', 'start_on_run', fallback=False)
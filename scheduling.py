@@ -0,0 +1,335 @@
+"""
+调度策略模块
+功能：将截图/识别线程、输入调度线程与连点线程绑定到指定CPU核心并设置线程优先级，提高进程优先级与系统定时器精度，
+提供"先休眠再自旋"的混合定时器替代依赖系统定时器粒度的 time.sleep，并统计连点节奏抖动与截图到决策的延迟
+
+用法：
+    python scheduling.py bench [--interval 0.2] [--count 50]   对比 time.sleep 与混合定时器的定时误差
+"""
+from __future__ import annotations
+
+import argparse
+import ctypes
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from lazy_import import lazy_module
+
+psutil = lazy_module('psutil')
+
+# 混合定时器默认自旋时长(秒)：距截止时间不足此值时不再休眠
+SPIN_THRESHOLD = 0.002
+# 统计抖动时保留的最近样本数
+JITTER_SAMPLES = 20000
+
+# Windows 线程优先级（SetThreadPriority）
+THREAD_PRIORITIES = {
+    'idle': -15,
+    'below_normal': -1,
+    'normal': 0,
+    'above_normal': 1,
+    'highest': 2,
+    'time_critical': 15,
+}
+# 其他系统以 nice 值近似线程优先级，提高优先级通常需要管理员权限
+THREAD_NICE = {'idle': 19, 'below_normal': 5, 'normal': 0, 'above_normal': -5, 'highest': -10, 'time_critical': -20}
+# 进程优先级：psutil 在 Windows 上的优先级类名，其他系统的 nice 值
+PROCESS_PRIORITIES = {
+    'normal': ('NORMAL_PRIORITY_CLASS', 0),
+    'above_normal': ('ABOVE_NORMAL_PRIORITY_CLASS', -5),
+    'high': ('HIGH_PRIORITY_CLASS', -10),
+}
+# 可配置的线程角色
+ROLES = ('capture', 'input', 'click')
+
+
+def sleep_until(deadline: float, spin_threshold: float = SPIN_THRESHOLD) -> None:
+    """
+    混合定时：先休眠到截止时间前 spin_threshold 秒，剩余时间让出CPU自旋等待
+
+    参数:
+        deadline: float - time.perf_counter() 时间轴上的截止时间
+        spin_threshold: float - 自旋时长(秒)，应略大于系统休眠的典型超时
+    """
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return
+        if remaining > spin_threshold:
+            time.sleep(remaining - spin_threshold)
+        else:
+            # sleep(0) 释放 GIL 并让出时间片，自旋期间其他线程仍可运行
+            time.sleep(0)
+
+
+def precise_sleep(seconds: float, spin_threshold: float = SPIN_THRESHOLD) -> None:
+    """混合定时休眠指定秒数"""
+    sleep_until(time.perf_counter() + seconds, spin_threshold)
+
+
+def _kernel32():
+    return ctypes.WinDLL('kernel32', use_last_error=True)
+
+
+def set_thread_affinity(cores: list[int]) -> bool:
+    """将当前线程绑定到指定CPU核心，平台不支持时返回False"""
+    if sys.platform == 'win32':
+        kernel32 = _kernel32()
+        kernel32.GetCurrentThread.restype = ctypes.c_void_p
+        kernel32.SetThreadAffinityMask.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+        kernel32.SetThreadAffinityMask.restype = ctypes.c_size_t
+        mask = sum(1 << core for core in cores)
+        return kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), mask) != 0
+    if hasattr(os, 'sched_setaffinity'):
+        # Linux 上 pid 为0时只作用于调用线程
+        os.sched_setaffinity(0, cores)
+        return True
+    return False
+
+
+def set_thread_priority(name: str) -> bool:
+    """设置当前线程优先级，权限不足或平台不支持时返回False"""
+    if sys.platform == 'win32':
+        kernel32 = _kernel32()
+        kernel32.GetCurrentThread.restype = ctypes.c_void_p
+        kernel32.SetThreadPriority.argtypes = (ctypes.c_void_p, ctypes.c_int)
+        return bool(kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITIES[name]))
+    if hasattr(os, 'setpriority') and hasattr(threading, 'get_native_id'):
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), THREAD_NICE[name])
+        return True
+    return False
+
+
+def set_process_priority(name: str) -> None:
+    """设置脚本进程优先级"""
+    class_name, nice = PROCESS_PRIORITIES[name]
+    process = psutil.Process()
+    process.nice(getattr(psutil, class_name) if psutil.WINDOWS else nice)
+
+
+def set_timer_resolution(ms: int) -> bool:
+    """提高系统定时器精度(仅Windows)，需与 reset_timer_resolution 成对调用"""
+    if sys.platform != 'win32' or ms <= 0:
+        return False
+    return ctypes.WinDLL('winmm').timeBeginPeriod(ms) == 0
+
+
+def reset_timer_resolution(ms: int) -> None:
+    if sys.platform == 'win32' and ms > 0:
+        ctypes.WinDLL('winmm').timeEndPeriod(ms)
+
+
+class JitterStats:
+    """
+    保留最近 JITTER_SAMPLES 个样本的统计
+
+    tick() 记录相邻两次调用的间隔（节奏），observe() 直接记录一个值（延迟）；
+    reset_tick() 在暂停等中断后调用，下一次 tick() 不产生间隔样本。
+    """
+
+    def __init__(self, target: float | None = None):
+        self.target = target
+        self.count = 0
+        self._samples: deque[float] = deque(maxlen=JITTER_SAMPLES)
+        self._last: float | None = None
+
+    def observe(self, value: float) -> None:
+        self._samples.append(value)
+        self.count += 1
+
+    def tick(self, ts: float | None = None) -> None:
+        ts = time.perf_counter() if ts is None else ts
+        if self._last is not None:
+            self.observe(ts - self._last)
+        self._last = ts
+
+    def reset_tick(self) -> None:
+        self._last = None
+
+    def summary(self) -> dict | None:
+        samples = sorted(self._samples)
+        if not samples:
+            return None
+        n = len(samples)
+        mean = sum(samples) / n
+        result = {
+            'count': self.count,
+            'mean': mean,
+            'std': math.sqrt(sum((v - mean) ** 2 for v in samples) / n),
+            'p50': samples[n // 2],
+            'p99': samples[min(n - 1, int(n * 0.99))],
+            'max': samples[-1],
+        }
+        if self.target is not None:
+            result['mean_abs_error'] = sum(abs(v - self.target) for v in samples) / n
+        return result
+
+    def report(self, label: str) -> str:
+        s = self.summary()
+        if s is None:
+            return f"{label}：无样本"
+        line = (f"{label}：{s['count']}个样本，均值{s['mean'] * 1000:.2f}ms，抖动(标准差){s['std'] * 1000:.2f}ms，"
+                f"p50 {s['p50'] * 1000:.2f}ms，p99 {s['p99'] * 1000:.2f}ms，最大{s['max'] * 1000:.2f}ms")
+        if self.target is not None:
+            line += f"，与目标{self.target * 1000:.0f}ms的平均偏差{s['mean_abs_error'] * 1000:.2f}ms"
+        return line
+
+
+class ThreadPolicy:
+    """
+    调度策略
+
+    未启用时 apply() 不做任何修改、sleep_until() 退回 time.sleep，但仍统计抖动，
+    可在启用前后各运行一次对比报告。
+
+    参数:
+        enabled: bool - 是否启用
+        cores: dict - 线程角色 -> CPU核心列表
+        priorities: dict - 线程角色 -> 线程优先级名
+        process_priority: str - 进程优先级名，空字符串表示不修改
+        timer_resolution_ms: int - 系统定时器精度(毫秒)，0表示不修改
+        precise_timer: bool - 是否使用混合定时器
+        spin_threshold: float - 混合定时器自旋时长(秒)
+    """
+
+    def __init__(self, enabled: bool = False, cores: dict | None = None, priorities: dict | None = None,
+                 process_priority: str = '', timer_resolution_ms: int = 0, precise_timer: bool = True,
+                 spin_threshold: float = SPIN_THRESHOLD):
+        self.enabled = enabled
+        self.cores = cores or {}
+        self.priorities = priorities or {}
+        self.process_priority = process_priority
+        self.timer_resolution_ms = timer_resolution_ms
+        self.precise_timer = enabled and precise_timer
+        self.spin_threshold = spin_threshold
+        self._timer_raised = False
+        self._failures: set[str] = set()
+
+    def apply_process(self) -> None:
+        """进程启动时调用：设置进程优先级与系统定时器精度"""
+        if not self.enabled:
+            return
+        if self.process_priority:
+            try:
+                set_process_priority(self.process_priority)
+            except (psutil.Error, OSError) as e:
+                print(f"设置进程优先级失败: {e}")
+        self._timer_raised = set_timer_resolution(self.timer_resolution_ms)
+
+    def restore_process(self) -> None:
+        """进程退出时调用：恢复系统定时器精度"""
+        if self._timer_raised:
+            reset_timer_resolution(self.timer_resolution_ms)
+            self._timer_raised = False
+
+    def apply(self, role: str) -> None:
+        """线程启动时调用：按角色绑定核心并设置优先级，失败时每个角色只提示一次"""
+        if not self.enabled:
+            return
+        try:
+            if self.cores.get(role) and not set_thread_affinity(self.cores[role]):
+                raise OSError("当前平台不支持线程绑核")
+            if self.priorities.get(role) and not set_thread_priority(self.priorities[role]):
+                raise OSError(f"设置线程优先级失败，错误码{ctypes.get_last_error() if sys.platform == 'win32' else ''}")
+        except OSError as e:
+            if role not in self._failures:
+                self._failures.add(role)
+                print(f"调度策略应用失败({role}): {e}")
+
+    def sleep_until(self, deadline: float) -> None:
+        """按策略等待到截止时间：启用混合定时器时休眠后自旋，否则直接 time.sleep"""
+        if self.precise_timer:
+            sleep_until(deadline, self.spin_threshold)
+        else:
+            remaining = deadline - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def describe(self) -> str:
+        if not self.enabled:
+            return "调度策略未启用(默认核心与优先级，time.sleep 定时)"
+        parts = [f"{role}核心{self.cores[role]}" for role in ROLES if self.cores.get(role)]
+        parts += [f"{role}优先级{self.priorities[role]}" for role in ROLES if self.priorities.get(role)]
+        if self.process_priority:
+            parts.append(f"进程优先级{self.process_priority}")
+        if self._timer_raised:
+            parts.append(f"定时器精度{self.timer_resolution_ms}ms")
+        parts.append(f"混合定时器(自旋{self.spin_threshold * 1000:.1f}ms)" if self.precise_timer else "time.sleep 定时")
+        return "调度策略：" + "，".join(parts)
+
+
+def _parse_cores(raw: str) -> list[int]:
+    """解析核心列表，如 "2,3" 或 "2-5" """
+    cores = []
+    for part in (p.strip() for p in raw.split(',')):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = (int(v) for v in part.split('-', 1))
+            cores.extend(range(start, end + 1))
+        else:
+            cores.append(int(part))
+    return cores
+
+
+def load_thread_policy(config) -> ThreadPolicy:
+    """从配置文件 [scheduling] 读取调度策略"""
+    section = 'scheduling'
+    priorities = {}
+    for role in ROLES:
+        name = config.get(section, f'{role}_priority', fallback='').strip()
+        if name and name not in THREAD_PRIORITIES:
+            raise ValueError(f"未知的线程优先级 {role}_priority = {name}，可选 {', '.join(THREAD_PRIORITIES)}")
+        priorities[role] = name
+    process_priority = config.get(section, 'process_priority', fallback='').strip()
+    if process_priority and process_priority not in PROCESS_PRIORITIES:
+        raise ValueError(f"未知的进程优先级 {process_priority}，可选 {', '.join(PROCESS_PRIORITIES)}")
+    return ThreadPolicy(
+        enabled=config.getboolean(section, 'enabled', fallback=False),
+        cores={role: _parse_cores(config.get(section, f'{role}_cores', fallback='')) for role in ROLES},
+        priorities=priorities,
+        process_priority=process_priority,
+        timer_resolution_ms=config.getint(section, 'timer_resolution_ms', fallback=1),
+        precise_timer=config.getboolean(section, 'precise_timer', fallback=True),
+        spin_threshold=config.getfloat(section, 'spin_threshold', fallback=SPIN_THRESHOLD),
+    )
+
+
+def bench(interval: float, count: int, spin_threshold: float) -> None:
+    """按固定截止时间序列分别用 time.sleep 与混合定时器等待，输出实际间隔的抖动"""
+    for label, wait in (("time.sleep", lambda d: time.sleep(max(0.0, d - time.perf_counter()))),
+                        ("混合定时器", lambda d: sleep_until(d, spin_threshold))):
+        stats = JitterStats(interval)
+        deadline = time.perf_counter()
+        for _ in range(count):
+            deadline += interval
+            wait(deadline)
+            stats.tick()
+        print(stats.report(label))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="调度策略工具")
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench_parser = sub.add_parser('bench', help="对比 time.sleep 与混合定时器的定时误差")
+    bench_parser.add_argument('--interval', type=float, default=0.2)
+    bench_parser.add_argument('--count', type=int, default=50)
+    bench_parser.add_argument('--spin', type=float, default=SPIN_THRESHOLD)
+    bench_parser.add_argument('--timer-resolution', type=int, default=1, help="测量期间的系统定时器精度(毫秒，仅Windows)")
+    args = parser.parse_args(argv)
+
+    raised = set_timer_resolution(args.timer_resolution)
+    try:
+        bench(args.interval, args.count, args.spin)
+    finally:
+        if raised:
+            reset_timer_resolution(args.timer_resolution)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
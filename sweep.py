@@ -0,0 +1,424 @@
+"""
+识别扫描模块
+功能：对录制或合成的数字截图块施加参数化扰动（亮度偏移、伽马、缩放模糊、HDR色调映射、噪声），
+用每个已注册的识别引擎在多个匹配度阈值下识别，统计准确率、误识别率(误识别即可能误买)与识别耗时，
+输出 JSON 结果与准确率/误识别率-耗时的帕累托前沿(安装 matplotlib 时同时输出图表)，
+用于在特定显示设置下选出最快且安全的引擎与阈值；同时给出各探测点颜色在扰动下到目标颜色的距离
+
+用法：
+    python sweep.py [logs/roi_*.bin ...] [--thresholds 0.85 0.9 0.95] [--limit 500] [--engines ordered vectorized]
+                    [--perturbations gamma=0.8 hdr=1.5 blur]
+    不给出录制文件时使用由数字模板合成的截图块
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import math
+import os
+import sys
+import time
+
+from lazy_import import lazy_module
+import calibrate
+import detect_money
+import template_bundle
+
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 默认扫描的匹配度阈值
+DEFAULT_THRESHOLDS = (0.85, 0.9, 0.93, 0.95, 0.97)
+# 合成数据：每个数字的正样本数、负样本数
+SYNTHETIC_PER_DIGIT = 40
+SYNTHETIC_NEGATIVES = 200
+# 探测点颜色阈值的默认扫描值
+DEFAULT_PROBE_THRESHOLDS = (10, 20, 30)
+
+
+# --- 扰动 ---
+
+def perturb_brightness(img, delta: float):
+    """整体亮度偏移"""
+    return np.clip(img.astype(np.float32) + delta, 0, 255).astype(np.uint8)
+
+
+def perturb_gamma(img, gamma: float):
+    """伽马变化"""
+    return np.clip(255.0 * (img.astype(np.float32) / 255.0) ** gamma, 0, 255).astype(np.uint8)
+
+
+def perturb_blur(img, factor: float):
+    """缩小到 factor 倍再放大回原尺寸，模拟非整数缩放造成的模糊"""
+    height, width = img.shape[:2]
+    small = cv2.resize(img, (max(1, round(width * factor)), max(1, round(height * factor))),
+                       interpolation=cv2.INTER_AREA)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def perturb_hdr(img, exposure: float):
+    """HDR 色调映射差异：按曝光放大后做 Reinhard 色调映射，白点取曝光值"""
+    x = img.astype(np.float32) / 255.0 * exposure
+    mapped = x * (1 + x / (exposure * exposure)) / (1 + x)
+    return np.clip(mapped * 255.0, 0, 255).astype(np.uint8)
+
+
+def perturb_noise(img, sigma: float):
+    """高斯噪声，固定种子使各引擎看到相同的噪声"""
+    rng = np.random.default_rng(int(sigma * 1000))
+    return np.clip(img.astype(np.float32) + rng.normal(0, sigma, img.shape), 0, 255).astype(np.uint8)
+
+
+# 扰动名 -> (函数, 扫描的参数)
+PERTURBATIONS = {
+    'brightness': (perturb_brightness, (-40, -20, 20, 40)),
+    'gamma': (perturb_gamma, (0.6, 0.8, 1.25, 1.6)),
+    'blur': (perturb_blur, (0.8, 0.6, 0.5)),
+    'hdr': (perturb_hdr, (1.5, 2.5, 4.0)),
+    'noise': (perturb_noise, (4, 8, 16)),
+}
+
+
+def perturbation_grid(specs: list[str]) -> list[tuple[str, float | None]]:
+    """
+    无扰动 + 指定的扰动设置
+
+    参数:
+        specs: list - 扰动名(扫描其全部参数)或 名称=参数(只扫描该参数)，如 ["gamma", "blur=0.8"]
+    """
+    grid = [('none', None)]
+    for spec in specs:
+        name, _, level = spec.partition('=')
+        if name not in PERTURBATIONS:
+            raise ValueError(f"未知的扰动 {name}，可选 {', '.join(PERTURBATIONS)}")
+        levels = [float(level)] if level else PERTURBATIONS[name][1]
+        grid += [(name, value) for value in levels if (name, value) not in grid]
+    return grid
+
+
+def apply_perturbation(crops, name: str, level: float | None):
+    if name == 'none':
+        return crops
+    fn = PERTURBATIONS[name][0]
+    return np.stack([fn(crop, level) for crop in crops])
+
+
+# --- 识别引擎 ---
+# 每个引擎由数字模板构造识别函数 crop -> (最佳数字, 匹配度)，阈值在扫描结果上统一应用
+
+def engine_ordered(digit_templates: dict):
+    """
+    运行时默认引擎：按先验顺序匹配，超过下限提前结束
+
+    先验在整个扫描中跨截图块学习，耗时取决于截图块顺序(见 synthetic_crops)；识别以阈值-1.0进行，
+    先验也会学习负样本上的最佳数字，而运行时只学习达到阈值的数字
+    """
+    prior = detect_money.DigitPrior()
+    bound = detect_money.early_exit_bound(digit_templates)
+    return lambda crop: detect_money.find_best_match_ordered(crop, prior, bound, -1.0, digit_templates)
+
+
+def engine_full_scan(digit_templates: dict):
+    """全量扫描10个模板（线程池并行）"""
+    return lambda crop: detect_money.find_best_match(crop, -1.0, digit_templates)
+
+
+def engine_vectorized(digit_templates: dict):
+    """截图块与模板同尺寸时，归一化相关系数等于零均值单位向量的点积，一次矩阵乘法得到10个匹配度"""
+    norm = np.stack([template_bundle.normalize(digit_templates[i]).ravel() for i in range(10)])
+    shape = digit_templates[0].shape
+
+    def recognize(crop):
+        if crop.shape != shape:
+            # 尺寸不同(缩放布局下取整误差)时只能滑动匹配
+            return detect_money.find_best_match(crop, -1.0, digit_templates)
+        scores = norm @ template_bundle.normalize(crop).ravel()
+        best = int(scores.argmax())
+        return best, float(scores[best])
+    return recognize
+
+
+ENGINES = {
+    'ordered': engine_ordered,
+    'full_scan': engine_full_scan,
+    'vectorized': engine_vectorized,
+}
+
+
+# --- 数据 ---
+
+def synthetic_crops(digit_templates: dict, seed: int = 0):
+    """
+    由数字模板合成截图块
+
+    正样本为模板加轻微噪声；负样本为纯背景与两个数字的混合（数字切换时的过渡帧），
+    识别出任何数字都算误识别。生成后按同一随机种子打乱顺序：按数字成批排列时 ordered 引擎的先验
+    几乎每次第一个模板就命中，耗时被严重低估。
+
+    返回:
+        tuple: (截图块 (N, h, w) uint8, 标签列表，负样本为None)
+    """
+    rng = np.random.default_rng(seed)
+    crops, labels = [], []
+    for digit in range(10):
+        template = digit_templates[digit].astype(np.float32)
+        for _ in range(SYNTHETIC_PER_DIGIT):
+            crops.append(np.clip(template + rng.normal(0, 2, template.shape), 0, 255))
+            labels.append(digit)
+    shape = digit_templates[0].shape
+    background = float(np.median(np.concatenate([digit_templates[d].ravel() for d in range(10)])))
+    for i in range(SYNTHETIC_NEGATIVES):
+        if i % 2 == 0:
+            crop = np.full(shape, background, np.float32) + rng.normal(0, 3, shape)
+        else:
+            a, b = rng.choice(10, size=2, replace=False)
+            alpha = rng.uniform(0.45, 0.55)
+            crop = alpha * digit_templates[a].astype(np.float32) + (1 - alpha) * digit_templates[b]
+        crops.append(np.clip(crop, 0, 255))
+        labels.append(None)
+    order = rng.permutation(len(crops))
+    return np.stack(crops)[order].astype(np.uint8), [labels[i] for i in order]
+
+
+def recorded_crops(paths: list[str], digit_templates: dict):
+    """
+    读取录制文件并以无扰动时的全量扫描结果(按当前模板包的阈值)作为标签，未识别的截图块作为负样本
+
+    标签来自现有识别结果，扫描衡量的是扰动造成的退化，而不是现有识别本身的正确性。
+    """
+    crops = calibrate.load_crops(paths)
+    thresholds = detect_money.get_digit_thresholds()
+    labels = [detect_money.find_best_match(crop, digit_templates=digit_templates, thresholds=thresholds)[0]
+              for crop in crops]
+    return crops, labels
+
+
+# --- 扫描 ---
+
+def run_engine(recognize, crops) -> tuple[list, list, list]:
+    """逐个识别截图块，返回 (数字列表, 匹配度列表, 每块耗时列表)"""
+    digits, scores, latencies = [], [], []
+    for crop in crops:
+        started = time.perf_counter()
+        digit, score = recognize(crop)
+        latencies.append(time.perf_counter() - started)
+        digits.append(digit)
+        scores.append(score)
+    return digits, scores, latencies
+
+
+def score_threshold(labels, digits, scores, threshold: float) -> dict:
+    """
+    按阈值统计
+
+    accuracy: 正样本识别正确的比例
+    false_buy_rate: 全部样本中识别出错误数字(含负样本识别出数字)的比例，错误价格可能落入购买区间
+    rejected_rate: 正样本低于阈值未识别的比例
+    """
+    positives = sum(1 for label in labels if label is not None)
+    correct = wrong = rejected = 0
+    for label, digit, score in zip(labels, digits, scores):
+        accepted = score >= threshold
+        if label is not None and not accepted:
+            rejected += 1
+        elif accepted and digit == label:
+            correct += 1
+        elif accepted:
+            wrong += 1
+    return {
+        'accuracy': correct / positives if positives else None,
+        'false_buy_rate': wrong / len(labels) if labels else None,
+        'rejected_rate': rejected / positives if positives else None,
+    }
+
+
+def latency_summary(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    n = len(ordered)
+    return {
+        'mean': round(sum(ordered) / n * 1000, 4),
+        'p50': round(ordered[n // 2] * 1000, 4),
+        'p99': round(ordered[min(n - 1, int(n * 0.99))] * 1000, 4),
+    }
+
+
+def pareto_front(points: list[dict]) -> list[dict]:
+    """耗时更低、准确率更高、误识别率更低三者均不劣且至少一项更优即为支配"""
+    def dominates(a, b):
+        no_worse = (a['latency_ms']['mean'] <= b['latency_ms']['mean'] and a['accuracy'] >= b['accuracy']
+                    and a['false_buy_rate'] <= b['false_buy_rate'])
+        better = (a['latency_ms']['mean'] < b['latency_ms']['mean'] or a['accuracy'] > b['accuracy']
+                  or a['false_buy_rate'] < b['false_buy_rate'])
+        return no_worse and better
+    front = [p for p in points if not any(dominates(q, p) for q in points if q is not p)]
+    return sorted(front, key=lambda p: p['latency_ms']['mean'])
+
+
+def sweep(crops, labels, digit_templates: dict, engines: list[str], thresholds: list[float],
+          perturbations: list[str]) -> list[dict]:
+    """对每个扰动设置运行每个引擎一次，再按各阈值统计"""
+    results = []
+    for name, level in perturbation_grid(perturbations):
+        perturbed = apply_perturbation(crops, name, level)
+        for engine in engines:
+            digits, scores, latencies = run_engine(ENGINES[engine](digit_templates), perturbed)
+            latency = latency_summary(latencies)
+            for threshold in thresholds:
+                results.append({'engine': engine, 'threshold': threshold, 'perturbation': name, 'level': level,
+                                **score_threshold(labels, digits, scores, threshold), 'latency_ms': latency})
+        print(f"扰动 {name}={level} 完成")
+    return results
+
+
+def worst_case(results: list[dict]) -> list[dict]:
+    """每个(引擎, 阈值)在全部扰动下的最差准确率、最差误识别率与平均耗时"""
+    grouped: dict[tuple, list[dict]] = {}
+    for r in results:
+        grouped.setdefault((r['engine'], r['threshold']), []).append(r)
+    summary = []
+    for (engine, threshold), rows in grouped.items():
+        summary.append({
+            'engine': engine,
+            'threshold': threshold,
+            'accuracy': min(r['accuracy'] for r in rows),
+            'false_buy_rate': max(r['false_buy_rate'] for r in rows),
+            'latency_ms': {'mean': round(sum(r['latency_ms']['mean'] for r in rows) / len(rows), 4)},
+        })
+    return summary
+
+
+def recommend(summary: list[dict], min_accuracy: float, max_false_buy: float) -> dict | None:
+    """最差情况下满足准确率与误识别率要求的组合中耗时最低者"""
+    safe = [s for s in summary if s['accuracy'] >= min_accuracy and s['false_buy_rate'] <= max_false_buy]
+    return min(safe, key=lambda s: (s['latency_ms']['mean'], -s['accuracy'])) if safe else None
+
+
+def probe_distances(perturbations: list[str], probe_thresholds: list[float]) -> dict:
+    """各探测点目标颜色经扰动后到原目标颜色的距离，以及各阈值下是否仍能检测到"""
+    result = {}
+    for probe_name, probe in template_bundle.PROBES.items():
+        pixel = np.array([[probe['color']]], dtype=np.uint8)
+        entries = []
+        for name, level in perturbation_grid(perturbations):
+            perturbed = apply_perturbation(pixel[None], name, level)[0, 0, 0]
+            distance = math.dist([float(v) for v in perturbed], probe['color'])
+            entries.append({'perturbation': name, 'level': level, 'distance': round(distance, 2),
+                            'detected': {str(t): distance < t for t in probe_thresholds}})
+        result[probe_name] = entries
+    return result
+
+
+def plot(summary: list[dict], results: list[dict], path: str) -> bool:
+    """绘制最差情况下的准确率/误识别率-耗时图，未安装 matplotlib 时返回False"""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+    fig, (ax_acc, ax_false) = plt.subplots(1, 2, figsize=(12, 5))
+    for engine in sorted({s['engine'] for s in summary}):
+        rows = sorted((s for s in summary if s['engine'] == engine), key=lambda s: s['threshold'])
+        latency = [s['latency_ms']['mean'] for s in rows]
+        ax_acc.plot(latency, [s['accuracy'] for s in rows], 'o-', label=engine)
+        ax_false.plot(latency, [s['false_buy_rate'] for s in rows], 'o-', label=engine)
+        for s, x in zip(rows, latency):
+            ax_acc.annotate(str(s['threshold']), (x, s['accuracy']), fontsize=7)
+            ax_false.annotate(str(s['threshold']), (x, s['false_buy_rate']), fontsize=7)
+    baseline = pareto_front([r for r in results if r['perturbation'] == 'none'])
+    ax_acc.plot([p['latency_ms']['mean'] for p in baseline], [p['accuracy'] for p in baseline],
+                'k--', alpha=0.4, label='pareto (no perturbation)')
+    ax_acc.set(xlabel='latency per digit (ms)', ylabel='worst-case accuracy', title='accuracy vs latency')
+    ax_false.set(xlabel='latency per digit (ms)', ylabel='worst-case false-buy rate', title='false-buy rate vs latency')
+    for ax in (ax_acc, ax_false):
+        ax.grid(alpha=0.3)
+        ax.legend()
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+    return True
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="数字识别引擎在扰动下的准确率-耗时扫描")
+    parser.add_argument('recordings', nargs='*', help="roi_recorder 录制文件，支持通配符；不给出时使用合成数据")
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=list(ENGINES))
+    parser.add_argument('--thresholds', nargs='+', type=float, default=list(DEFAULT_THRESHOLDS))
+    parser.add_argument('--perturbations', nargs='+', default=list(PERTURBATIONS),
+                        help="扰动名或 名称=参数，如 gamma blur=0.8；推荐组合按所给扰动的最差情况选择，"
+                             "应只给出目标显示设置可能出现的扰动")
+    parser.add_argument('--probe-thresholds', nargs='+', type=float, default=list(DEFAULT_PROBE_THRESHOLDS))
+    parser.add_argument('--limit', type=int, default=500, help="最多使用的截图块数(随机抽取)，0表示全部")
+    parser.add_argument('--min-accuracy', type=float, default=0.99, help="推荐组合的最差准确率下限")
+    parser.add_argument('--max-false-buy', type=float, default=0.0, help="推荐组合的最差误识别率上限")
+    parser.add_argument('--output', default=None, help="结果JSON路径，默认 logs/sweep_时间戳.json")
+    args = parser.parse_args(argv)
+
+    digit_templates = detect_money.get_templates()
+    paths = calibrate.expand_paths(args.recordings)
+    if paths:
+        crops, labels = recorded_crops(paths, digit_templates)
+        source = 'recorded'
+    else:
+        crops, labels = synthetic_crops(digit_templates)
+        source = 'synthetic'
+    if not len(crops):
+        print("没有可用的截图")
+        return 1
+    if args.limit and len(crops) > args.limit:
+        # 保持原有顺序：录制数据按录制时的先后顺序识别，与运行时先验看到的序列一致
+        keep = np.sort(np.random.default_rng(0).choice(len(crops), args.limit, replace=False))
+        crops, labels = crops[keep], [labels[i] for i in keep]
+    positives = sum(1 for label in labels if label is not None)
+    print(f"{source}数据：{len(crops)}个截图块，正样本{positives}个，负样本{len(crops) - positives}个")
+
+    started = time.perf_counter()
+    results = sweep(crops, labels, digit_templates, args.engines, args.thresholds, args.perturbations)
+    summary = worst_case(results)
+    chosen = recommend(summary, args.min_accuracy, args.max_false_buy)
+
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output = args.output or os.path.join(BASE_DIR, 'logs', f"sweep_{timestamp}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    notes = [f"ordered 引擎的先验跨截图块学习，耗时取决于截图块顺序({'合成数据已按固定种子打乱' if source == 'synthetic' else '录制数据按录制顺序'})",
+             "各引擎以阈值-1.0识别后再按各阈值统计，ordered 引擎的先验也学习负样本上的最佳数字(运行时只学习达到阈值的数字)"]
+    report = {
+        'source': source,
+        'notes': notes,
+        'samples': {'total': int(len(crops)), 'positive': positives, 'negative': int(len(crops)) - positives},
+        'engines': args.engines,
+        'thresholds': args.thresholds,
+        'results': results,
+        'pareto': {f"{name}={level}": pareto_front([r for r in results
+                                                    if r['perturbation'] == name and r['level'] == level])
+                   for name, level in perturbation_grid(args.perturbations)},
+        'worst_case': summary,
+        'recommended': chosen,
+        'probes': probe_distances(args.perturbations, args.probe_thresholds),
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"扫描完成，耗时{time.perf_counter() - started:.1f}秒，结果已保存到 {output}")
+    for note in notes:
+        print(f"注：{note}")
+    for s in sorted(summary, key=lambda s: (s['engine'], s['threshold'])):
+        print(f"- {s['engine']} 阈值{s['threshold']}：最差准确率{s['accuracy']:.3f}，"
+              f"最差误识别率{s['false_buy_rate']:.4f}，平均{s['latency_ms']['mean']:.3f}ms/数位")
+    if chosen is None:
+        print(f"没有组合在全部扰动下满足 准确率>={args.min_accuracy} 且 误识别率<={args.max_false_buy}")
+    else:
+        print(f"推荐：{chosen['engine']} 阈值{chosen['threshold']}")
+    plot_path = os.path.splitext(output)[0] + '.png'
+    if plot(summary, results, plot_path):
+        print(f"图表已保存到 {plot_path}")
+    else:
+        print("未安装 matplotlib，跳过图表")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
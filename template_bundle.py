@@ -0,0 +1,222 @@
+"""
+模板包模块
+功能：将 image/ 下的数字模板与哈夫币图标模板预先解码、归一化并打包为单个可内存映射的二进制文件，
+连同各模板的截图区域(ROI)与匹配阈值等元数据一起保存，启动时无需逐个解码PNG
+
+文件格式：
+    4字节魔数 b'DFTB' + 4字节小端头部长度 + UTF-8 JSON头部 + 按64字节对齐的原始数组数据
+"""
+import json
+import os
+import struct
+import sys
+import time
+
+from lazy_import import lazy_module
+
+np = lazy_module('numpy')
+cv2 = lazy_module('cv2')
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.join(BASE_DIR, 'image')
+BUNDLE_PATH = os.path.join(IMAGE_DIR, 'templates.bin')
+# calibrate.py 由录制截图生成的校准模板包，存在时优先使用
+CALIBRATED_PATH = os.path.join(IMAGE_DIR, 'templates_calibrated.bin')
+
+MAGIC = b'DFTB'
+BUNDLE_VERSION = 1
+ALIGN = 64
+
+# 数字模板元数据：截图区域为 (top, left, width, height)，与 detect_money 一致
+DIGIT_ROI = (176, 299, 24, 17)
+DIGIT_THRESHOLD = 0.95
+# 哈夫币图标元数据：两个搜索区域为 (x, y, width, height)，与 detect_location 一致
+COIN_ROIS = ((1450, 44, 300, 17), (1400, 249, 240, 17))
+# 监测线程的像素颜色探测点：标定坐标、目标颜色(RGB)与颜色距离阈值，校准模板包中可覆盖阈值
+PROBES = {
+    'no_items': {'point': (1630, 889), 'color': (75, 79, 82), 'threshold': 10},
+    'seven_sep': {'point': (313, 193), 'color': (179, 181, 183), 'threshold': 10},
+}
+
+
+def _source_files() -> dict[str, str]:
+    """模板名 -> PNG路径"""
+    sources = {f'digit_{i}': os.path.join(IMAGE_DIR, f'{i}_gray_image.png') for i in range(10)}
+    sources['coin'] = os.path.join(IMAGE_DIR, 'coin_template.png')
+    return sources
+
+
+def _source_mtimes() -> dict[str, float]:
+    return {name: os.path.getmtime(path) for name, path in _source_files().items() if os.path.exists(path)}
+
+
+def normalize(template):
+    """零均值、单位范数的 float32 模板，便于直接计算归一化相关系数"""
+    t = template.astype(np.float32)
+    t -= t.mean()
+    norm = float(np.linalg.norm(t))
+    return t / norm if norm > 0 else t
+
+
+def decode_sources() -> tuple[dict, dict]:
+    """
+    解码PNG模板
+
+    返回:
+        tuple: (模板名 -> np.ndarray, 模板名 -> 元数据)
+    """
+    arrays, meta = {}, {}
+    for name, path in _source_files().items():
+        if name == 'coin':
+            arrays[name] = np.ascontiguousarray(cv2.imread(path))  # BGR
+            meta[name] = {'rois': COIN_ROIS, 'threshold': None}
+        else:
+            gray = np.ascontiguousarray(cv2.imread(path, cv2.IMREAD_GRAYSCALE))
+            arrays[name] = gray
+            arrays[f'{name}_norm'] = normalize(gray)
+            meta[name] = meta[f'{name}_norm'] = {'roi': DIGIT_ROI, 'threshold': DIGIT_THRESHOLD}
+    return arrays, meta
+
+
+def write_bundle(arrays: dict, meta: dict, path: str = BUNDLE_PATH, extra: dict | None = None) -> None:
+    """
+    将数组与元数据写入模板包（先写临时文件再原子替换）
+
+    参数:
+        arrays: dict - 模板名 -> np.ndarray
+        meta: dict - 模板名 -> 元数据(roi/threshold等)
+        extra: dict - 写入头部的附加字段
+    """
+    entries = {}
+    offset = 0
+    for name, arr in arrays.items():
+        offset = (offset + ALIGN - 1) // ALIGN * ALIGN
+        entries[name] = {'offset': offset, 'shape': list(arr.shape), 'dtype': arr.dtype.str, **meta.get(name, {})}
+        offset += arr.nbytes
+
+    header = {
+        'version': BUNDLE_VERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'sources': _source_mtimes(),
+        'templates': entries,
+        **(extra or {}),
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = (8 + len(header_bytes) + ALIGN - 1) // ALIGN * ALIGN
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+        for name, arr in arrays.items():
+            f.seek(data_start + entries[name]['offset'])
+            f.write(np.ascontiguousarray(arr).tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_header(path: str = BUNDLE_PATH) -> tuple[dict, int]:
+    """读取模板包头部，返回 (头部, 数据区起始偏移)"""
+    with open(path, 'rb') as f:
+        magic, length = f.read(4), struct.unpack('<I', f.read(4))[0]
+        if magic != MAGIC:
+            raise ValueError(f"不是有效的模板包: {path}")
+        header = json.loads(f.read(length).decode('utf-8'))
+    return header, (8 + length + ALIGN - 1) // ALIGN * ALIGN
+
+
+class TemplateBundle:
+    """
+    已加载的模板包
+
+    数组是对内存映射文件的只读视图，多次启动之间由操作系统页缓存共享。
+    """
+
+    def __init__(self, arrays: dict, meta: dict, header: dict | None = None):
+        self.arrays = arrays
+        self.meta = meta
+        self.header = header or {}
+
+    @property
+    def digits(self) -> dict:
+        """数字 -> 灰度模板"""
+        return {i: self.arrays[f'digit_{i}'] for i in range(10)}
+
+    @property
+    def digits_norm(self) -> dict:
+        """数字 -> 零均值单位范数的 float32 模板"""
+        return {i: self.arrays[f'digit_{i}_norm'] for i in range(10)}
+
+    @property
+    def coin(self):
+        return self.arrays['coin']
+
+    @property
+    def pack_version(self) -> int | None:
+        """校准模板包的版本号，由PNG生成的模板包为None"""
+        return self.header.get('pack_version')
+
+    def threshold(self, name: str, default: float | None = None) -> float | None:
+        value = self.meta.get(name, {}).get('threshold')
+        return default if value is None else value
+
+    def probe(self, name: str) -> dict:
+        """像素探测点参数 {'point', 'color', 'threshold'}，模板包中未记录时使用 PROBES 默认值"""
+        return {**PROBES[name], **self.header.get('probes', {}).get(name, {})}
+
+
+def open_bundle(path: str = BUNDLE_PATH) -> TemplateBundle:
+    """以内存映射方式打开模板包"""
+    header, data_start = read_header(path)
+    mm = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, entry in header['templates'].items():
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape']))
+        start = data_start + entry['offset']
+        arrays[name] = np.frombuffer(mm, dtype=dtype, count=count, offset=start).reshape(entry['shape'])
+    return TemplateBundle(arrays, header['templates'], header)
+
+
+def build_bundle(path: str = BUNDLE_PATH) -> TemplateBundle:
+    """从PNG重新生成模板包"""
+    arrays, meta = decode_sources()
+    write_bundle(arrays, meta, path)
+    return open_bundle(path)
+
+
+def load_bundle(path: str = BUNDLE_PATH) -> TemplateBundle:
+    """
+    加载模板包；不存在或PNG比模板包新时自动重新生成
+
+    生成失败（如目录只读）时退回直接使用解码后的PNG。
+    加载默认模板包时，若存在有效的校准模板包则优先使用。
+    """
+    if path == BUNDLE_PATH and os.path.exists(CALIBRATED_PATH):
+        try:
+            header, _ = read_header(CALIBRATED_PATH)
+            if header.get('version') == BUNDLE_VERSION and header.get('pack_version') is not None:
+                return open_bundle(CALIBRATED_PATH)
+            print(f"校准模板包版本不符，忽略: {CALIBRATED_PATH}")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"校准模板包读取失败，忽略: {e}")
+    if os.path.exists(path):
+        try:
+            header, _ = read_header(path)
+            stale = header.get('sources') != _source_mtimes()
+            if header.get('version') == BUNDLE_VERSION and not stale:
+                return open_bundle(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"模板包读取失败，重新生成: {e}")
+    try:
+        return build_bundle(path)
+    except OSError as e:
+        print(f"模板包写入失败，直接使用PNG模板: {e}")
+        arrays, meta = decode_sources()
+        return TemplateBundle(arrays, meta)
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else BUNDLE_PATH
+    started = time.perf_counter()
+    bundle = build_bundle(target)
+    print(f"模板包已生成: {target}，共{len(bundle.arrays)}个模板，耗时{time.perf_counter() - started:.3f}秒")
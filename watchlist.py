@@ -0,0 +1,228 @@
+"""
+收藏槽位监控列表模块
+功能：管理多个收藏槽位及各自的价格区间，预编译"价格 -> 购买/跳过"查找表，并按轮询顺序切换槽位
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import time
+from dataclasses import dataclass
+
+# 获取脚本所在目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 单槽位运行实测的检查速率，多槽位报告以此作为对比基线
+BASELINE_PATH = os.path.join(BASE_DIR, 'cache', 'watchlist_baseline.json')
+# 单槽位运行满此时长(分钟)才记录为基线，过短的运行速率不稳定
+MIN_BASELINE_MINUTES = 1.0
+# 识别精度：只识别十万位与万位，价格一定是10000的整数倍
+PRICE_UNIT = 10000
+# 查找表大小：0 ~ 990000 共100档
+PRICE_BUCKETS = 100
+
+
+@dataclass(frozen=True)
+class WatchSlot:
+    name: str
+    x: int
+    y: int
+    price_low: int    # 价格下限(含)
+    price_high: int   # 价格上限(含)
+
+
+def compile_price_table(price_low: int, price_high: int) -> bytes:
+    """
+    将价格区间预编译为查找表
+
+    参数:
+        price_low: int - 价格下限(含)
+        price_high: int - 价格上限(含)
+
+    返回:
+        bytes: 长度为PRICE_BUCKETS的表，下标为 价格//PRICE_UNIT，值为1表示购买
+    """
+    return bytes(
+        1 if price_low <= bucket * PRICE_UNIT <= price_high else 0
+        for bucket in range(PRICE_BUCKETS)
+    )
+
+
+class Watchlist:
+    """
+    多槽位监控列表
+
+    连点线程始终点击 current_slot()；主线程每消费一个界面事件就调用 advance()，
+    使连点线程在当前槽位的决策与ESC返回尚未完成时就已对准下一个槽位。
+    """
+
+    def __init__(self, slots: list[WatchSlot]):
+        if not slots:
+            raise ValueError("监控列表至少需要一个槽位")
+        self.slots = list(slots)
+        self._tables = [compile_price_table(s.price_low, s.price_high) for s in self.slots]
+        self._index = 0  # 仅主线程写入，连点线程只读
+
+        # --- 统计数据 ---
+        self.checked = [0] * len(self.slots)  # 每个槽位检查过的物品数
+        self.hits = [0] * len(self.slots)     # 每个槽位命中价格区间的次数
+        self.started_at = time.time()
+
+    def __len__(self):
+        return len(self.slots)
+
+    def current(self) -> int:
+        """返回当前槽位下标"""
+        return self._index
+
+    def current_slot(self) -> WatchSlot:
+        """返回当前槽位"""
+        return self.slots[self._index]
+
+    def advance(self) -> int:
+        """切换到下一个槽位，返回切换前的槽位下标"""
+        index = self._index
+        self._index = (index + 1) % len(self.slots)
+        return index
+
+    def should_buy(self, index: int, price: int) -> bool:
+        """
+        查表判断指定槽位的价格是否应购买
+
+        参数:
+            index: int - 槽位下标
+            price: int - 识别到的价格
+
+        返回:
+            bool: 应购买返回True
+        """
+        bucket, remainder = divmod(price, PRICE_UNIT)
+        if remainder == 0 and 0 <= bucket < PRICE_BUCKETS:
+            return self._tables[index][bucket] == 1
+        # 非标准价格（理论上不会出现）退回区间比较
+        slot = self.slots[index]
+        return slot.price_low <= price <= slot.price_high
+
+    def record_check(self, index: int, hit: bool = False) -> None:
+        """记录一次槽位检查"""
+        self.checked[index] += 1
+        if hit:
+            self.hits[index] += 1
+
+    def reset_stats(self) -> None:
+        """清空统计数据并重新计时"""
+        self.checked = [0] * len(self.slots)
+        self.hits = [0] * len(self.slots)
+        self.started_at = time.time()
+
+    def stats_state(self) -> dict:
+        """统计数据快照，供会话检查点保存"""
+        return {'slots': [s.name for s in self.slots], 'checked': list(self.checked), 'hits': list(self.hits),
+                'started_at': self.started_at}
+
+    def restore_stats(self, state: dict) -> bool:
+        """从会话检查点恢复统计数据，槽位与保存时不同则不恢复"""
+        if state.get('slots') != [s.name for s in self.slots]:
+            return False
+        self.checked = list(state['checked'])
+        self.hits = list(state['hits'])
+        self.started_at = state['started_at']
+        return True
+
+    def with_slots(self, slots: list[WatchSlot]) -> "Watchlist":
+        """
+        返回使用新槽位的监控列表（运行中修改价格区间或点击位置时使用）
+
+        槽位数不变时保留统计数据与当前槽位下标，连点线程在替换后继续按原顺序轮询
+        """
+        replaced = Watchlist(slots)
+        if len(replaced) == len(self):
+            replaced._index = self._index
+            replaced.checked = list(self.checked)
+            replaced.hits = list(self.hits)
+            replaced.started_at = self.started_at
+        return replaced
+
+    def report(self) -> str:
+        """
+        生成每分钟检查物品数报告
+
+        多槽位时与 BASELINE_PATH 中记录的单槽位运行实测速率对比；尚未记录过单槽位运行时不给出对比
+        """
+        minutes = max((time.time() - self.started_at) / 60, 1e-9)
+        total = sum(self.checked)
+        lines = [f"监控列表共{len(self.slots)}个槽位，总计检查{total}次，"
+                 f"合计{total / minutes:.1f}次/分钟"]
+        for slot, checked, hits in zip(self.slots, self.checked, self.hits):
+            lines.append(f"- {slot.name}({slot.x},{slot.y}) 区间[{slot.price_low},{slot.price_high}]："
+                         f"检查{checked}次，{checked / minutes:.1f}次/分钟，命中{hits}次")
+        if len(self.slots) > 1:
+            lines.append(f"轮询{len(self.slots)}个槽位，每槽位平均{total / minutes / len(self.slots):.1f}次/分钟")
+            baseline = load_baseline()
+            if baseline is None:
+                lines.append(f"尚无单槽位运行的实测检查速率，不给出对比(单槽位运行满{MIN_BASELINE_MINUTES:g}分钟后自动记录)")
+            else:
+                rate = baseline['checked_per_minute']
+                lines.append(f"对比单槽位运行({baseline['recorded']}实测，运行{baseline['minutes']:.1f}分钟)："
+                             f"{rate:.1f}次/分钟且只覆盖1个槽位；本次合计为其{total / minutes / max(rate, 1e-9):.2f}倍，"
+                             f"同时覆盖{len(self.slots)}个槽位")
+        return "\n".join(lines)
+
+
+    def save_baseline(self) -> None:
+        """单槽位运行满 MIN_BASELINE_MINUTES 时把本次检查速率记录为多槽位报告的对比基线"""
+        minutes = (time.time() - self.started_at) / 60
+        if len(self.slots) != 1 or minutes < MIN_BASELINE_MINUTES:
+            return
+        baseline = {'checked_per_minute': round(self.checked[0] / minutes, 1), 'minutes': round(minutes, 1),
+                    'recorded': datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}
+        try:
+            os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+            tmp_path = BASELINE_PATH + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(baseline, f, ensure_ascii=False)
+            os.replace(tmp_path, BASELINE_PATH)
+        except OSError as e:
+            print(f"单槽位检查速率写入失败: {e}")
+
+
+def load_baseline() -> dict | None:
+    """读取单槽位运行实测的检查速率，未记录过时返回None"""
+    try:
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_watchlist(config, default_x: int, default_y: int, default_low: int, default_high: int,
+                   section: str = 'watchlist') -> Watchlist:
+    """
+    从配置文件读取监控列表
+
+    参数:
+        config: configparser.ConfigParser - 已读取的配置
+        default_x, default_y: int - [click_location] 中的单槽位坐标
+        default_low, default_high: int - [limit] 中的价格区间
+        section: str - 读取 slots 的配置节，多客户端模式下为各客户端的 [client_N]
+
+    返回:
+        Watchlist: 未配置 [watchlist] 时退回单槽位
+    """
+    slots = []
+    raw = config.get(section, 'slots', fallback='')
+    for line in (l.strip() for l in raw.splitlines()):
+        if not line or line.startswith('#'):
+            continue
+        parts = [p.strip() for p in line.split(',')]
+        if len(parts) == 2:
+            # 只给坐标时使用全局价格区间
+            parts += [str(default_low), str(default_high)]
+        if len(parts) != 4:
+            raise ValueError(f"监控列表槽位配置格式错误: {line}")
+        sx, sy, low, high = (int(p) for p in parts)
+        slots.append(WatchSlot(f"槽位{len(slots) + 1}", sx, sy, low, high))
+
+    if not slots:
+        slots.append(WatchSlot("槽位1", default_x, default_y, default_low, default_high))
+    return Watchlist(slots)